@@ -11,11 +11,32 @@ from playwright.async_api import async_playwright, TimeoutError as PlaywrightTim
 from typing import Optional, Dict, List
 import re
 
+import config
+from strategy_planner import Strategy, StrategyPlanner
+from debug_artifacts import ArtifactStore, shared_store
+from lot_fields import lot_id_from_url
+from circuit_breaker import Breakers, detect_block, host_key, CLOSED
+from readiness import wait_lot_ready
+
 
 class AdvancedCatawikiScraper:
-    def __init__(self, headless: bool = True, proxy: Optional[str] = None):
+    def __init__(self, headless: bool = True, proxy: Optional[str] = None,
+                 job_id: Optional[str] = None, artifacts: Optional[ArtifactStore] = None):
         self.headless = headless
         self.proxy = proxy
+        self.job_id = job_id
+        self.artifacts = artifacts or shared_store()
+        self.breakers = Breakers.shared()
+        self.planner = StrategyPlanner([
+            Strategy('structured_data', self._extract_structured_data,
+                     ['title', 'images', 'current_price'], config.STRATEGY_PRIOR_MS['structured_data']),
+            Strategy('data_attributes', self._extract_with_data_attributes,
+                     ['title', 'seller', 'current_price'], config.STRATEGY_PRIOR_MS['data_attributes']),
+            Strategy('regex', self._extract_with_page_text,
+                     ['bottles_count', 'current_price'], config.STRATEGY_PRIOR_MS['regex']),
+            Strategy('selectors', self._extract_with_selectors,
+                     ['title', 'images', 'seller', 'current_price'], config.STRATEGY_PRIOR_MS['selectors']),
+        ])
 
     async def scrape_listing(self, url: str) -> Optional[Dict]:
         """
@@ -27,6 +48,15 @@ class AdvancedCatawikiScraper:
         Returns:
             Dictionary with scraped data or None if failed
         """
+        # Don't launch browsers while the host is blocking us
+        await self.breakers.admit(url)
+        outcome = {'status': 'error', 'reason': None}
+        try:
+            return await self._scrape_listing(url, outcome)
+        finally:
+            self.breakers.record(host_key(url), outcome['status'], outcome['reason'])
+
+    async def _scrape_listing(self, url: str, outcome: Dict) -> Optional[Dict]:
         async with async_playwright() as p:
             # Browser launch arguments for stealth
             launch_args = {
@@ -128,9 +158,17 @@ class AdvancedCatawikiScraper:
                     try:
                         response = await page.goto(url, wait_until='domcontentloaded', timeout=60000)
 
-                        if response and response.status == 403:
-                            print(f"⚠️  Got 403, attempt {attempt + 1}/{max_retries}")
+                        block = detect_block(response.status if response else None)
+                        if block:
+                            print(f"⚠️  Got {response.status}, attempt {attempt + 1}/{max_retries}")
+                            outcome.update(status='blocked', reason=block)
                             if attempt < max_retries - 1:
+                                # Each attempt counts towards the breaker threshold
+                                self.breakers.record(host_key(url), 'blocked', block)
+                                outcome['status'] = 'error'  # Already counted
+                                if self.breakers.get(host_key(url)).state != CLOSED:
+                                    print("❌ Host circuit breaker is open, not retrying")
+                                    return None
                                 await asyncio.sleep(random.uniform(3, 6))
                                 continue
                             else:
@@ -144,33 +182,33 @@ class AdvancedCatawikiScraper:
                         else:
                             raise
 
-                # Wait for main content
+                # Wait for main content (price and bidding counter, not networkidle - trackers never go idle)
                 print("⏳ Waiting for content...")
-                await page.wait_for_load_state('networkidle', timeout=30000)
-
-                # Random human-like delay
-                await asyncio.sleep(random.uniform(2, 4))
-
-                # Scroll to simulate human behavior
-                await self._human_like_scroll(page)
+                await wait_lot_ready(page)
 
-                # Extract data
+                # Extract data (scrolling happens only if the selector strategy is needed)
                 print("📊 Extracting data...")
                 data = await self._extract_data(page)
 
-                # Screenshot for debugging
-                await page.screenshot(path='debug_screenshot.png')
-                print("📸 Screenshot saved to debug_screenshot.png")
+                # Debug artifacts - always when required fields are missing, sampled otherwise
+                failed = bool(self.planner.missing(data))
+                outcome['status'] = 'ok'
+                if not data.get('title'):
+                    # Challenge page or empty h1 (the breaker only counts repeated empty h1s)
+                    outcome.update(status='blocked', reason=detect_block(html=await page.content(), h1_text=''))
+                if self.artifacts.should_capture(failed):
+                    await self.artifacts.capture(page, lot_id_from_url(url), self.job_id,
+                                                 'failed' if failed else 'sample')
 
                 return data
 
             except PlaywrightTimeout as e:
                 print(f"❌ Timeout error: {e}")
-                await page.screenshot(path='error_screenshot.png')
+                await self.artifacts.capture(page, lot_id_from_url(url), self.job_id, 'timeout')
                 return None
             except Exception as e:
                 print(f"❌ Error scraping page: {e}")
-                await page.screenshot(path='error_screenshot.png')
+                await self.artifacts.capture(page, lot_id_from_url(url), self.job_id, 'error')
                 return None
             finally:
                 await browser.close()
@@ -201,7 +239,13 @@ class AdvancedCatawikiScraper:
             print(f"⚠️  Scroll simulation failed: {e}")
 
     async def _extract_data(self, page) -> Dict:
-        """Extract listing data from the page using multiple strategies"""
+        """
+        Extract listing data from the page using multiple strategies
+
+        Strategies run cheapest-first (see strategy_planner.py) and stop
+        once config.STRATEGY_REQUIRED_FIELDS are all filled; cheap ones also
+        fill empty config.STRATEGY_OPTIONAL_FIELDS (seller, bottles count).
+        """
 
         data = {
             'title': None,
@@ -212,33 +256,30 @@ class AdvancedCatawikiScraper:
             'url': page.url,
         }
 
-        # Get page content for text analysis
-        page_content = await page.content()
-        page_text = await page.inner_text('body')
-
-        # Strategy 1: Try structured selectors
-        await self._extract_with_selectors(page, data)
+        log = await self.planner.run(page, data)
+        self.planner.save()
+        print("🧭 Strategies: " + ', '.join(
+            f"{entry['strategy']} (skipped)" if entry.get('skipped')
+            else f"{entry['strategy']} {entry['ms']:.0f}ms +{len(entry['filled'])}"
+            for entry in log
+        ))
 
-        # Strategy 2: Try data attributes
-        await self._extract_with_data_attributes(page, data)
-
-        # Strategy 3: Regex patterns from text
-        self._extract_with_regex(page_text, data)
-
-        # Strategy 4: Try to find in JSON-LD or structured data
-        await self._extract_structured_data(page, data)
-
-        # Save debug info if extraction failed
         if not data['title']:
-            with open('debug_page.html', 'w', encoding='utf-8') as f:
-                f.write(page_content)
-            print("⚠️  Could not extract title. Saved HTML to debug_page.html")
+            print("⚠️  Could not extract title")
 
         return data
 
+    async def _extract_with_page_text(self, page, data: Dict):
+        """Regex strategy - the body text is only fetched when this strategy runs"""
+        page_text = await page.inner_text('body')
+        self._extract_with_regex(page_text, data)
+
     async def _extract_with_selectors(self, page, data: Dict):
         """Extract data using CSS selectors"""
 
+        # Scroll to simulate human behavior (also loads lazy gallery images)
+        await self._human_like_scroll(page)
+
         # Title selectors
         title_selectors = [
             'h1',
@@ -249,6 +290,8 @@ class AdvancedCatawikiScraper:
         ]
 
         for selector in title_selectors:
+            if data['title']:
+                break
             try:
                 element = await page.query_selector(selector)
                 if element:
@@ -271,6 +314,8 @@ class AdvancedCatawikiScraper:
         ]
 
         for selector in image_selectors:
+            if data['images']:
+                break
             try:
                 images = await page.query_selector_all(selector)
                 for img in images:
@@ -305,6 +350,8 @@ class AdvancedCatawikiScraper:
         ]
 
         for selector in seller_selectors:
+            if data['seller']:
+                break
             try:
                 element = await page.query_selector(selector)
                 if element:
@@ -327,6 +374,8 @@ class AdvancedCatawikiScraper:
         ]
 
         for selector in price_selectors:
+            if data['current_price']:
+                break
             try:
                 element = await page.query_selector(selector)
                 if element:
@@ -363,6 +412,20 @@ class AdvancedCatawikiScraper:
             if result:
                 print(f"📋 Found data attributes: {list(result.keys())}")
 
+                for test_id, text in result.items():
+                    text = (text or '').strip()
+                    if not text:
+                        continue
+                    test_id = test_id.lower()
+                    if not data['title'] and 'title' in test_id and len(text) > 5:
+                        data['title'] = text.split('\n')[0].strip()
+                    elif not data['seller'] and 'seller' in test_id and 2 < len(text) < 100:
+                        data['seller'] = text.split('\n')[0].strip()
+                    elif not data['current_price'] and ('price' in test_id or 'bid' in test_id):
+                        price = re.search(r'[€$£]\s*[\d,]+(?:\.\d{2})?', text)
+                        if price:
+                            data['current_price'] = price.group(0).strip()
+
         except Exception as e:
             print(f"⚠️  Data attribute extraction failed: {e}")
 
@@ -428,6 +491,14 @@ class AdvancedCatawikiScraper:
                                 data['images'].extend(item['image'])
                             else:
                                 data['images'].append(item['image'])
+                        if not data['current_price'] and item.get('offers'):
+                            offers = item['offers']
+                            offer = offers[0] if isinstance(offers, list) and offers else offers
+                            if isinstance(offer, dict) and offer.get('price') is not None:
+                                symbol = {'EUR': '€', 'USD': '$', 'GBP': '£'}.get(
+                                    offer.get('priceCurrency'), offer.get('priceCurrency', '')
+                                )
+                                data['current_price'] = f"{symbol} {offer['price']}".strip()
 
         except Exception as e:
             print(f"⚠️  Structured data extraction failed: {e}")
@@ -3,10 +3,11 @@
 FastAPI server for Catawiki scraper - n8n integration
 """
 
-from fastapi import FastAPI, BackgroundTasks, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, HttpUrl, field_validator
-from typing import Optional, List, Union
+from typing import Optional, Dict, List, Union
+from contextlib import asynccontextmanager
 import asyncio
 import json
 from datetime import datetime
@@ -19,11 +20,49 @@ import csv
 sys.path.append('/root/cataparser')
 from scraper_pro import CatawikiScraperPro
 from category_scraper import CatawikiCategoryScraper
+from wine_rating import RatingBuffer
+from lot_store import LotStore, record_lots, parse_since
+from debug_artifacts import shared_store as artifact_store
+from sinks import RunSinks, ListSink, CSV_FIELDNAMES, format_csv_row, format_sheets_result, read_ndjson
+from checkpoint import Checkpoint
+from work_queue import WorkQueue
+from lot import Lot
+from watcher import WatchSink, allowed_webhook_url
+from seen_index import SeenIndex, SEEN_POLICIES, mark_seen
+from proxy_pool import ProxyPool
+from session_pool import SessionPool
+from circuit_breaker import Breakers
+from deadline import DeadlineStats
+from readiness import ReadinessStats
+from memory_governor import MemoryGovernor
+from browser_pool import BrowserPool
+from remote_browsers import RemoteBrowsers
+from tracing import span, traced
+import config
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup: resume interrupted jobs, warm up browsers. Shutdown: stop job tasks, close browsers"""
+    await resume_unfinished_jobs()
+    # External browsers (config.BROWSER_ENDPOINTS) replace the local pool
+    if config.BROWSER_POOL_SIZE > 0 and not RemoteBrowsers.shared():
+        await BrowserPool.start_shared()
+    yield
+    # Interrupted jobs keep their checkpoints as running - the next start picks them up again
+    for task in list(job_tasks.values()):
+        task.cancel()
+    if job_tasks:
+        await asyncio.gather(*job_tasks.values(), return_exceptions=True)
+    await BrowserPool.close_shared()
+    await RemoteBrowsers.close_shared()
+
 
 app = FastAPI(
     title="Catawiki Scraper API",
     description="API for scraping Catawiki listings with n8n integration",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Enable CORS for n8n
@@ -38,22 +77,133 @@ app.add_middleware(
 # In-memory job storage (for production use Redis/Database)
 jobs = {}
 
+OUTPUT_DIR = Path("/root/cataparser/output")
+
+# Running background jobs by job_id (cancel endpoint; references keep the tasks from being garbage collected)
+job_tasks: Dict[str, asyncio.Task] = {}
+
+
+def start_job(job_id: str, coro) -> asyncio.Task:
+    """Run a job in the background as a task that POST /job/{job_id}/cancel can stop"""
+    task = asyncio.create_task(coro)
+    job_tasks[job_id] = task
+    task.add_done_callback(lambda _: job_tasks.pop(job_id, None))
+    return task
+
+
+class ClientDisconnected(Exception):
+    """The HTTP client went away before the response was ready"""
+
+
+async def until_disconnect(http_request: Request, coro):
+    """Await coro; once the client has disconnected, cancel it and raise ClientDisconnected"""
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=config.DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                break
+    finally:
+        if not task.done():
+            # Scraper's cleanup runs here: browser closed, slot and pooled browser given back
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+    raise ClientDisconnected()
+
 # Request models
 class ScrapeRequest(BaseModel):
     url: HttpUrl
     headless: bool = True
     save_csv: bool = False
+    budget_seconds: Optional[float] = None  # Total time for the lot (default config.LOT_BUDGET_SECONDS)
 
 class BatchScrapeRequest(BaseModel):
     urls: List[HttpUrl]
     headless: bool = True
     save_csv: bool = True
+    ai_rating: bool = False
+    include_results: bool = True  # False: results only in output_files (constant memory)
+    export_format: Optional[str] = None  # 'parquet' or 'arrow' for typed columnar output
+    seen_policy: Optional[str] = None  # Recently scraped lots: 'skip', 'defer' or 'off' (default: config)
+    watch: bool = False  # Only changed lots in results, plus change events (see watcher.py)
+    webhook_url: Optional[str] = None  # Watch mode: event batches go here (default: WATCH_WEBHOOK_URL)
+    distributed: bool = False  # Lots are scraped by worker nodes (see work_queue.py)
+
+    @field_validator('export_format', mode='before')
+    @classmethod
+    def parse_export_format(cls, v):
+        """Accept 'parquet'/'arrow', treat empty/'null' as no columnar export"""
+        if v is None or v == '' or v == 'null' or v == 'None':
+            return None
+        v = str(v).lower()
+        if v not in ('parquet', 'arrow'):
+            raise ValueError("export_format must be 'parquet' or 'arrow'")
+        return v
+
+    @field_validator('seen_policy', mode='before')
+    @classmethod
+    def parse_seen_policy(cls, v):
+        """Accept 'skip'/'defer'/'off', treat empty/'null' as the configured default"""
+        if v is None or v == '' or v == 'null' or v == 'None':
+            return None
+        v = str(v).lower()
+        if v not in SEEN_POLICIES:
+            raise ValueError("seen_policy must be 'skip', 'defer' or 'off'")
+        return v
+
+    @field_validator('webhook_url', mode='before')
+    @classmethod
+    def parse_webhook_url(cls, v):
+        """Only http(s) hosts from the allow-list (WATCH_WEBHOOK_HOSTS), empty/'null' = configured default"""
+        if v is None or v == '' or v == 'null' or v == 'None':
+            return None
+        return allowed_webhook_url(str(v))
 
 class CategoryScrapeRequest(BaseModel):
     category_url: HttpUrl
     max_pages: Optional[Union[int, str]] = None
     headless: bool = True
     save_csv: bool = True
+    ai_rating: bool = False
+    include_results: bool = True  # False: results only in output_files (constant memory)
+    export_format: Optional[str] = None  # 'parquet' or 'arrow' for typed columnar output
+    seen_policy: Optional[str] = None  # Recently scraped lots: 'skip', 'defer' or 'off' (default: config)
+    watch: bool = False  # Only changed lots in results, plus change events (see watcher.py)
+    webhook_url: Optional[str] = None  # Watch mode: event batches go here (default: WATCH_WEBHOOK_URL)
+    distributed: bool = False  # Lots are scraped by worker nodes (see work_queue.py)
+    incremental: bool = False  # Newest first, stop at the first fully known page, scrape new + due lots
+
+    @field_validator('export_format', mode='before')
+    @classmethod
+    def parse_export_format(cls, v):
+        """Accept 'parquet'/'arrow', treat empty/'null' as no columnar export"""
+        if v is None or v == '' or v == 'null' or v == 'None':
+            return None
+        v = str(v).lower()
+        if v not in ('parquet', 'arrow'):
+            raise ValueError("export_format must be 'parquet' or 'arrow'")
+        return v
+
+    @field_validator('seen_policy', mode='before')
+    @classmethod
+    def parse_seen_policy(cls, v):
+        """Accept 'skip'/'defer'/'off', treat empty/'null' as the configured default"""
+        if v is None or v == '' or v == 'null' or v == 'None':
+            return None
+        v = str(v).lower()
+        if v not in SEEN_POLICIES:
+            raise ValueError("seen_policy must be 'skip', 'defer' or 'off'")
+        return v
+
+    @field_validator('webhook_url', mode='before')
+    @classmethod
+    def parse_webhook_url(cls, v):
+        """Only http(s) hosts from the allow-list (WATCH_WEBHOOK_HOSTS), empty/'null' = configured default"""
+        if v is None or v == '' or v == 'null' or v == 'None':
+            return None
+        return allowed_webhook_url(str(v))
 
     @field_validator('max_pages', mode='before')
     @classmethod
@@ -68,7 +218,7 @@ class CategoryScrapeRequest(BaseModel):
                 return None
         return v
 
-    @field_validator('headless', 'save_csv', mode='before')
+    @field_validator('headless', 'save_csv', 'ai_rating', 'include_results', mode='before')
     @classmethod
     def parse_bool(cls, v):
         """Convert string 'true'/'false' to boolean"""
@@ -87,13 +237,43 @@ class ScrapeResponse(BaseModel):
 
 class JobStatus(BaseModel):
     job_id: str
-    status: str  # pending, running, completed, failed
+    status: str  # pending, running, completed, failed, cancelled
     result: Optional[dict] = None
     error: Optional[str] = None
     created_at: str
     completed_at: Optional[str] = None
 
 
+async def resume_unfinished_jobs():
+    """Continue batch/category jobs that were running when the server stopped (see checkpoint.py)"""
+    # Load the seen-lot index once, before any job consults it
+    seen = SeenIndex.shared()
+    print(f"👁️  Seen-lot index: {len(seen)} lots")
+
+    for checkpoint in Checkpoint.unfinished(origin='api'):
+        job_id = checkpoint.job_id
+        params = checkpoint.params
+        jobs[job_id] = {
+            "job_id": job_id,
+            "status": "pending",
+            "result": None,
+            "error": None,
+            "created_at": checkpoint.state['created_at'],
+            "completed_at": None,
+            "processed": checkpoint.processed,
+            "resumed": True
+        }
+        if checkpoint.kind == 'batch':
+            jobs[job_id]["total_urls"] = len(checkpoint.state['frontier'])
+            coro = run_batch_scrape_job(job_id, checkpoint.state['frontier'], checkpoint=checkpoint, **params)
+        else:
+            jobs[job_id].update(category_url=params['category_url'], max_pages=params['max_pages'])
+            coro = run_category_scrape_job(job_id, checkpoint=checkpoint, **params)
+
+        print(f"♻️  Resuming {checkpoint.kind} job {job_id} ({checkpoint.processed} lots already processed)")
+        start_job(job_id, coro)
+
+
 @app.get("/")
 async def root():
     """API health check"""
@@ -107,6 +287,9 @@ async def root():
             "batch": "/scrape-batch",
             "category": "/scrape-category",
             "job_status": "/job/{job_id}",
+            "lot_changes": "/lots/changes?since=24h",
+            "lot_history": "/lots/{lot_id}/history",
+            "artifacts": "/job/{job_id}/artifacts",
             "health": "/health"
         }
     }
@@ -118,23 +301,38 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "active_jobs": len([j for j in jobs.values() if j["status"] == "running"])
+        "active_jobs": len([j for j in jobs.values() if j["status"] == "running"]),
+        "seen_lots": len(SeenIndex.shared()),
+        "proxies": ProxyPool.shared().stats(),
+        "sessions": SessionPool.shared().stats() if SessionPool.shared() else [],
+        "circuits": Breakers.shared().stats(),
+        "deadlines": DeadlineStats.shared().summary(),
+        "readiness": ReadinessStats.shared().summary(),
+        "memory": MemoryGovernor.shared().summary(),
+        "browser_pool": BrowserPool.shared().summary() if BrowserPool.shared() else {"state": "off"},
+        "browser_endpoints": RemoteBrowsers.shared().summary() if RemoteBrowsers.shared() else []
     }
 
 
 @app.post("/scrape", response_model=ScrapeResponse)
-async def scrape_url(request: ScrapeRequest):
+async def scrape_url(request: ScrapeRequest, http_request: Request):
     """
     Scrape a single Catawiki URL (synchronous)
 
     This endpoint will wait for scraping to complete before returning.
     For long-running tasks, use /scrape-async instead.
+    If the client disconnects first (n8n timeout), the scrape is cancelled.
     """
+    scraper = None
     try:
-        scraper = CatawikiScraperPro(headless=request.headless)
-        result = await scraper.scrape_listing(str(request.url))
+        scraper = CatawikiScraperPro(headless=request.headless,
+                                     lot_budget=request.budget_seconds or config.LOT_BUDGET_SECONDS)
+        with span('api.scrape', url=str(request.url)):
+            result = await until_disconnect(http_request, scraper.scrape_listing(str(request.url)))
 
         if result and result.get('title'):
+            record_lots([result])
+            mark_seen([result])
             return ScrapeResponse(
                 success=True,
                 data=result
@@ -145,12 +343,22 @@ async def scrape_url(request: ScrapeRequest):
                 error="Failed to scrape data from URL"
             )
 
+    except ClientDisconnected:
+        # Data extracted before the client left still goes to the lot history and seen index
+        partial = scraper.partial if scraper else None
+        cached = bool(config.CACHE_CANCELLED_RESULTS and partial and partial.get('title'))
+        if cached:
+            record_lots([partial])
+            mark_seen([partial])
+        print(f"🔌 Client disconnected, cancelled scrape of {request.url}" + (" (extracted data kept)" if cached else ""))
+        return Response(status_code=499)  # Nobody reads it; nginx's "client closed request"
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/scrape-async", response_model=ScrapeResponse)
-async def scrape_url_async(request: ScrapeRequest, background_tasks: BackgroundTasks):
+async def scrape_url_async(request: ScrapeRequest):
     """
     Scrape a single URL asynchronously
 
@@ -167,12 +375,11 @@ async def scrape_url_async(request: ScrapeRequest, background_tasks: BackgroundT
         "completed_at": None
     }
 
-    background_tasks.add_task(
-        run_scrape_job,
+    start_job(job_id, run_scrape_job(
         job_id,
         str(request.url),
         request.headless
-    )
+    ))
 
     return ScrapeResponse(
         success=True,
@@ -182,7 +389,7 @@ async def scrape_url_async(request: ScrapeRequest, background_tasks: BackgroundT
 
 
 @app.post("/scrape-batch", response_model=ScrapeResponse)
-async def scrape_batch(request: BatchScrapeRequest, background_tasks: BackgroundTasks):
+async def scrape_batch(request: BatchScrapeRequest):
     """
     Scrape multiple URLs (asynchronous)
 
@@ -201,13 +408,19 @@ async def scrape_batch(request: BatchScrapeRequest, background_tasks: Background
         "processed": 0
     }
 
-    background_tasks.add_task(
-        run_batch_scrape_job,
+    start_job(job_id, run_batch_scrape_job(
         job_id,
         [str(url) for url in request.urls],
         request.headless,
-        request.save_csv
-    )
+        request.save_csv,
+        request.ai_rating,
+        request.include_results,
+        request.export_format,
+        request.seen_policy,
+        watch=request.watch,
+        webhook_url=request.webhook_url,
+        distributed=request.distributed
+    ))
 
     return ScrapeResponse(
         success=True,
@@ -221,7 +434,7 @@ async def scrape_batch(request: BatchScrapeRequest, background_tasks: Background
 
 
 @app.post("/scrape-category", response_model=ScrapeResponse)
-async def scrape_category(request: CategoryScrapeRequest, background_tasks: BackgroundTasks):
+async def scrape_category(request: CategoryScrapeRequest):
     """
     Scrape entire Catawiki category with pagination (asynchronous)
 
@@ -237,17 +450,25 @@ async def scrape_category(request: CategoryScrapeRequest, background_tasks: Back
         "created_at": datetime.now().isoformat(),
         "completed_at": None,
         "category_url": str(request.category_url),
-        "max_pages": request.max_pages
+        "max_pages": request.max_pages,
+        "processed": 0
     }
 
-    background_tasks.add_task(
-        run_category_scrape_job,
+    start_job(job_id, run_category_scrape_job(
         job_id,
         str(request.category_url),
         request.max_pages,
         request.headless,
-        request.save_csv
-    )
+        request.save_csv,
+        request.ai_rating,
+        request.include_results,
+        request.export_format,
+        request.seen_policy,
+        watch=request.watch,
+        webhook_url=request.webhook_url,
+        incremental=request.incremental,
+        distributed=request.distributed
+    ))
 
     return ScrapeResponse(
         success=True,
@@ -298,34 +519,143 @@ async def list_jobs(
     }
 
 
+async def _cancel_job(job_id: str) -> bool:
+    """Cancel a running job and wait for it to close its browser; False if it wasn't running"""
+    task = job_tasks.get(job_id)
+    if task is None or task.done():
+        return False
+    jobs[job_id]["cancel_requested"] = True  # Final: the checkpoint is not resumed at the next start
+    task.cancel()
+    await asyncio.wait({task}, timeout=config.JOB_CANCEL_TIMEOUT)
+    return True
+
+
+@app.post("/job/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """
+    Cancel a running job
+
+    The lot in progress is stopped and its browser closed; lots finished so far
+    stay in the job's output files.
+    """
+    if job_id not in jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if not await _cancel_job(job_id):
+        return {"success": False, "message": f"Job {job_id} is not running ({jobs[job_id]['status']})"}
+    return {"success": True, "message": f"Job {job_id} cancelled", "status": jobs[job_id]["status"],
+            "processed": jobs[job_id].get("processed")}
+
+
 @app.delete("/job/{job_id}")
 async def delete_job(job_id: str):
     """
-    Delete a job from history
+    Delete a job from history (a running job is cancelled first)
     """
     if job_id not in jobs:
         raise HTTPException(status_code=404, detail="Job not found")
 
+    cancelled = await _cancel_job(job_id)
+    task = job_tasks.get(job_id)
+    if task is not None and not task.done():
+        # Still closing its browser: the job's own cleanup needs its jobs entry
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is still stopping, retry the delete shortly")
     del jobs[job_id]
-    return {"success": True, "message": f"Job {job_id} deleted"}
+    return {"success": True, "message": f"Job {job_id} {'cancelled and ' if cancelled else ''}deleted"}
+
+
+@app.get("/lots/changes")
+async def lot_changes(
+    since: str = Query("24h", description="Window: 30m, 24h, 7d or ISO timestamp"),
+    limit: int = Query(500, ge=1, le=10000)
+):
+    """
+    Lots that are new or changed price/end date since the given time (from the lot store)
+    """
+    try:
+        since_iso = parse_since(since)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    store = LotStore()
+    try:
+        changes = store.changes_since(since_iso, limit=limit)
+    finally:
+        store.close()
+    return {"since": since_iso, "total": len(changes), "lots": changes}
+
+
+@app.get("/lots/{lot_id}/history")
+async def lot_history(lot_id: int):
+    """
+    Latest snapshot and price/end date time series of one lot
+    """
+    store = LotStore()
+    try:
+        lot = store.get(lot_id)
+        history = store.history(lot_id)
+    finally:
+        store.close()
+    if not lot:
+        raise HTTPException(status_code=404, detail="Lot not found")
+    return {"lot": lot, "history": history}
+
+
+@app.get("/job/{job_id}/artifacts")
+async def list_artifacts(job_id: str):
+    """
+    Debug artifacts (screenshots, page HTML) captured for a job, per lot
+    """
+    return {"job_id": job_id, "lots": artifact_store().list(job_id)}
+
+
+@app.get("/job/{job_id}/artifacts/{lot_id}")
+async def list_lot_artifacts(job_id: str, lot_id: str):
+    """
+    Debug artifacts captured for one lot of a job
+    """
+    lots = artifact_store().list(job_id, lot_id)
+    if not lots:
+        raise HTTPException(status_code=404, detail="No artifacts for this lot")
+    return {"job_id": job_id, "lot_id": lot_id, "artifacts": next(iter(lots.values()))}
+
+
+@app.get("/job/{job_id}/artifacts/{lot_id}/{name}")
+async def get_artifact(job_id: str, lot_id: str, name: str):
+    """
+    One debug artifact, decompressed (JPEG screenshot or page HTML)
+    """
+    store = artifact_store()
+    path = store.path(job_id, lot_id, name)
+    if not path:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    media_type = "image/jpeg" if name.endswith('.jpg') else "text/html; charset=utf-8"
+    return Response(content=store.read(path), media_type=media_type)
 
 
 # Background task functions
+@traced('api.scrape_job', 'job_id', 'url')
 async def run_scrape_job(job_id: str, url: str, headless: bool):
     """Run scraping job in background"""
     try:
         jobs[job_id]["status"] = "running"
 
-        scraper = CatawikiScraperPro(headless=headless)
+        scraper = CatawikiScraperPro(headless=headless, job_id=job_id)
         result = await scraper.scrape_listing(url)
 
         if result and result.get('title'):
+            record_lots([result], job_id=job_id)
+            mark_seen([result])
             jobs[job_id]["status"] = "completed"
             jobs[job_id]["result"] = result
         else:
             jobs[job_id]["status"] = "failed"
             jobs[job_id]["error"] = "No data extracted"
 
+    except asyncio.CancelledError:
+        jobs[job_id]["status"] = "cancelled"
+        raise
+
     except Exception as e:
         jobs[job_id]["status"] = "failed"
         jobs[job_id]["error"] = str(e)
@@ -334,83 +664,134 @@ async def run_scrape_job(job_id: str, url: str, headless: bool):
         jobs[job_id]["completed_at"] = datetime.now().isoformat()
 
 
-async def run_batch_scrape_job(job_id: str, urls: List[str], headless: bool, save_csv: bool):
-    """Run batch scraping job in background"""
+@traced('api.batch_job', 'job_id', 'distributed')
+async def run_batch_scrape_job(job_id: str, urls: List[str], headless: bool, save_csv: bool, ai_rating: bool = False,
+                               include_results: bool = True, export_format: Optional[str] = None,
+                               seen_policy: Optional[str] = None, watch: bool = False, webhook_url: Optional[str] = None,
+                               distributed: bool = False, checkpoint: Optional[Checkpoint] = None):
+    """Run batch scraping job in background (checkpoint: resume an interrupted job)"""
+    sinks = rated = None
     try:
         jobs[job_id]["status"] = "running"
-        results = []
 
-        for i, url in enumerate(urls, 1):
-            try:
-                scraper = CatawikiScraperPro(headless=headless)
-                result = await scraper.scrape_listing(url)
-
-                if result and result.get('title'):
-                    # Add first_image as Google Sheets formula for 100x100px preview
-                    images = result.get('images', [])
-                    if images:
-                        result['first_image'] = f'=IMAGE("{images[0]}"; 4; 100; 100)'
-                    else:
-                        result['first_image'] = ''
+        resumed = checkpoint is not None
+        if not resumed:
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            checkpoint = Checkpoint(job_id, 'batch', origin='api', run_name=f"batch_{job_id}_{timestamp}", params={
+                "headless": headless, "save_csv": save_csv, "ai_rating": ai_rating,
+                "include_results": include_results, "export_format": export_format, "seen_policy": seen_policy,
+                "watch": watch, "webhook_url": webhook_url, "distributed": distributed
+            })
+            checkpoint.add_urls(urls)
+            checkpoint.save()
+        else:
+            checkpoint.reconcile(str(OUTPUT_DIR / f"{checkpoint.run_name}.ndjson"))
+        urls = checkpoint.state['frontier']
+
+        # Stream results to disk as each lot completes; the in-memory copy is kept
+        # as compact Lot records and only formatted for Sheets in the job response
+        job_results = _job_results_sink(checkpoint.run_name, resumed and not watch) if include_results else None
+        # Watch mode: results only get the lots that changed since their previous snapshot
+        watcher = WatchSink(webhook_url or config.WATCH_WEBHOOK_URL, changed=job_results, keep_events=True) if watch else None
+        sinks = RunSinks(OUTPUT_DIR, checkpoint.run_name, save_csv=save_csv, total=len(urls),
+                         meta={"job_id": job_id}, extra_sinks=[job_results] if job_results and not watcher else None,
+                         columnar=export_format, resume=resumed, watch=watcher)
+        # AI ratings (cached per wine, only new wines go to the model);
+        # buffered lots only count as done for the checkpoint once written
+        if ai_rating:
+            checkpoint.defer()
+            rated = RatingBuffer(sinks, on_flush=checkpoint.release)
+
+        # Lots scraped recently (any run) are skipped or moved to the end; watch mode re-checks every lot
+        queue, skipped = SeenIndex.shared().plan(checkpoint.pending(), 'off' if watch else seen_policy or config.SEEN_POLICY)
+        jobs[job_id]["skipped"] = len(skipped)
+        if skipped:
+            sinks.summary.update(skipped=len(skipped))
+        processed = checkpoint.processed
+
+        async def record(url, result):
+            if rated:
+                checkpoint.done(url)
+                await rated.write(result)
+            else:
+                sinks.write(result)
+                checkpoint.done(url)
 
-                    # Format URL as clickable icon with HYPERLINK formula
-                    url = result.get('url', '')
-                    if url:
-                        result['url'] = f'=HYPERLINK("{url}"; "🔗 View")'
+        def record_failure(url, error):
+            sinks.fail(url, error)
+            checkpoint.fail(url, error)
 
-                    # Format end_date as live countdown formula
-                    end_date = result.get('end_date', '')
-                    if end_date and len(end_date) == 19:  # Format: "2025-11-17 21:00:00"
-                        date_part = end_date[:10]  # "2025-11-17"
-                        time_part = end_date[11:]  # "21:00:00"
-                        result['end_date'] = f'=DAYS(DATEVALUE("{date_part}") + TIMEVALUE("{time_part}"); NOW()) & "d " & HOUR(DATEVALUE("{date_part}") + TIMEVALUE("{time_part}") - NOW()) & "h " & MINUTE(DATEVALUE("{date_part}") + TIMEVALUE("{time_part}") - NOW()) & "m"'
+        if distributed:
+            # Worker nodes scrape (python work_queue.py work), results come back here
+            work = WorkQueue.shared()
+            work.put(job_id, queue)
 
-                    results.append(result)
+            async def on_remote(url, result):
+                await record(url, result)
+                jobs[job_id]["processed"] = sinks.successful + sinks.failed
 
-                jobs[job_id]["processed"] = i
+            def on_remote_failure(url, error):
+                record_failure(url, error)
+                jobs[job_id]["processed"] = sinks.successful + sinks.failed
 
-                # Delay between requests
-                if i < len(urls):
-                    await asyncio.sleep(5)
+            await work.wait_for(job_id, queue, on_remote, on_remote_failure)
+        else:
+            for i, url in enumerate(queue, processed + 1):
+                try:
+                    scraper = CatawikiScraperPro(headless=headless, job_id=job_id)
+                    result = await scraper.scrape_listing(url)
 
-            except Exception as e:
-                print(f"Error scraping {url}: {e}")
-                continue
+                    if result and result.get('title'):
+                        await record(url, result)
+                    else:
+                        record_failure(url, "No data extracted")
 
-        # Save results
-        if results:
-            # Save JSON
-            output_dir = Path("/root/cataparser/output")
-            output_dir.mkdir(exist_ok=True)
+                    jobs[job_id]["processed"] = i
 
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            json_path = output_dir / f"batch_{job_id}_{timestamp}.json"
+                    # Delay between requests
+                    if i < processed + len(queue):
+                        await asyncio.sleep(5)
 
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(results, f, indent=2, ensure_ascii=False)
+                except Exception as e:
+                    record_failure(url, str(e))
+                    print(f"Error scraping {url}: {e}")
+                    continue
 
-            # Save CSV if requested
-            if save_csv:
-                csv_path = output_dir / f"batch_{job_id}_{timestamp}.csv"
-                # Use imported save_to_csv function
-                save_to_csv(results, str(csv_path))
+        if rated:
+            await rated.close()
 
+        # Save results
+        if sinks.successful or skipped:  # All-fresh batches are not a failure
+            sinks.close('completed')
+            checkpoint.finish('completed')
             jobs[job_id]["status"] = "completed"
             jobs[job_id]["result"] = {
                 "total_urls": len(urls),
-                "successful": len(results),
-                "failed": len(urls) - len(results),
-                "results": results,
-                "output_files": {
-                    "json": str(json_path),
-                    "csv": str(csv_path) if save_csv else None
-                }
+                "successful": sinks.successful,
+                "failed": sinks.failed,
+                "skipped": len(skipped),
+                "results": _sheets_results(job_results),
+                "output_files": sinks.paths
             }
+            if watcher:
+                jobs[job_id]["result"].update(changes=watcher.events, change_counts=watcher.counts)
         else:
+            sinks.close('failed')
+            checkpoint.finish('failed')
             jobs[job_id]["status"] = "failed"
             jobs[job_id]["error"] = "No successful scrapes"
 
+    except asyncio.CancelledError:
+        _job_cancelled(job_id, sinks, checkpoint, rated)
+        raise
+
     except Exception as e:
+        if rated:
+            rated.abort()  # Lots waiting for a rating are written unrated, not dropped
+        if sinks:
+            sinks.close('failed')
+        if checkpoint:
+            checkpoint.finish('failed')
         jobs[job_id]["status"] = "failed"
         jobs[job_id]["error"] = str(e)
 
@@ -418,74 +799,103 @@ async def run_batch_scrape_job(job_id: str, urls: List[str], headless: bool, sav
         jobs[job_id]["completed_at"] = datetime.now().isoformat()
 
 
-async def run_category_scrape_job(job_id: str, category_url: str, max_pages: Optional[int], headless: bool, save_csv: bool):
-    """Run category scraping job in background"""
+@traced('api.category_job', 'job_id', 'category_url', 'incremental', 'distributed')
+async def run_category_scrape_job(job_id: str, category_url: str, max_pages: Optional[int], headless: bool, save_csv: bool,
+                                  ai_rating: bool = False, include_results: bool = True,
+                                  export_format: Optional[str] = None, seen_policy: Optional[str] = None,
+                                  watch: bool = False, webhook_url: Optional[str] = None, incremental: bool = False,
+                                  distributed: bool = False, checkpoint: Optional[Checkpoint] = None):
+    """Run category scraping job in background (checkpoint: resume an interrupted job)"""
+    sinks = rated = None
     try:
         jobs[job_id]["status"] = "running"
 
-        # Create category scraper
-        scraper = CatawikiCategoryScraper(headless=headless)
-
-        # Scrape the category
-        results = await scraper.scrape_category(category_url, max_pages=max_pages)
-
-        # Format results with Google Sheets formulas
-        formatted_results = []
-        for result in results:
-            # Add first_image as Google Sheets formula for 100x100px preview
-            images = result.get('images', [])
-            if images:
-                result['first_image'] = f'=IMAGE("{images[0]}"; 4; 100; 100)'
-            else:
-                result['first_image'] = ''
-
-            # Format URL as clickable icon with HYPERLINK formula
-            url = result.get('url', '')
-            if url:
-                result['url'] = f'=HYPERLINK("{url}"; "🔗 View")'
-
-            # Format end_date as live countdown formula
-            end_date = result.get('end_date', '')
-            if end_date and len(end_date) == 19:  # Format: "2025-11-17 21:00:00"
-                date_part = end_date[:10]  # "2025-11-17"
-                time_part = end_date[11:]  # "21:00:00"
-                result['end_date'] = f'=DAYS(DATEVALUE("{date_part}") + TIMEVALUE("{time_part}"); NOW()) & "d " & HOUR(DATEVALUE("{date_part}") + TIMEVALUE("{time_part}") - NOW()) & "h " & MINUTE(DATEVALUE("{date_part}") + TIMEVALUE("{time_part}") - NOW()) & "m"'
-
-            formatted_results.append(result)
-
-        # Save results
-        if formatted_results:
-            # Save JSON
-            output_dir = Path("/root/cataparser/output")
-            output_dir.mkdir(exist_ok=True)
-
+        resumed = checkpoint is not None
+        if not resumed:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            json_path = output_dir / f"category_{job_id}_{timestamp}.json"
-
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(formatted_results, f, indent=2, ensure_ascii=False)
+            checkpoint = Checkpoint(job_id, 'category', origin='api', run_name=f"category_{job_id}_{timestamp}", params={
+                "category_url": category_url, "max_pages": max_pages, "headless": headless, "save_csv": save_csv,
+                "ai_rating": ai_rating, "include_results": include_results, "export_format": export_format,
+                "seen_policy": seen_policy, "watch": watch, "webhook_url": webhook_url, "incremental": incremental,
+                "distributed": distributed
+            })
+            checkpoint.save()
+        else:
+            checkpoint.reconcile(str(OUTPUT_DIR / f"{checkpoint.run_name}.ndjson"))
+
+        # Stream results to disk as each lot completes; the in-memory copy is kept
+        # as compact Lot records and only formatted for Sheets in the job response
+        job_results = _job_results_sink(checkpoint.run_name, resumed and not watch) if include_results else None
+        # Watch mode: results only get the lots that changed since their previous snapshot
+        watcher = WatchSink(webhook_url or config.WATCH_WEBHOOK_URL, changed=job_results, keep_events=True) if watch else None
+        sinks = RunSinks(OUTPUT_DIR, checkpoint.run_name, save_csv=save_csv,
+                         meta={"job_id": job_id, "category_url": category_url, "max_pages": max_pages},
+                         extra_sinks=[job_results] if job_results and not watcher else None,
+                         columnar=export_format, resume=resumed, watch=watcher)
+        # AI ratings (cached per wine, only new wines go to the model);
+        # buffered lots only count as done for the checkpoint once written
+        if ai_rating:
+            checkpoint.defer()
+            rated = RatingBuffer(sinks, on_flush=checkpoint.release)
+
+        async def on_result(result):
+            if rated:
+                await rated.write(result)
+            else:
+                sinks.write(result)
+            jobs[job_id]["processed"] = sinks.successful + sinks.failed
 
-            # Save CSV if requested
-            if save_csv:
-                csv_path = output_dir / f"category_{job_id}_{timestamp}.csv"
-                save_to_csv(formatted_results, str(csv_path))
+        # Create category scraper
+        scraper = CatawikiCategoryScraper(headless=headless, job_id=job_id,
+                                          work_queue=WorkQueue.shared() if distributed else None)
 
+        # Scrape the category
+        await scraper.scrape_category(category_url, max_pages=max_pages, on_result=on_result,
+                                      on_failure=sinks.fail, collect=False, checkpoint=checkpoint,
+                                      seen_policy='off' if watch else seen_policy or config.SEEN_POLICY,
+                                      incremental=incremental)
+        jobs[job_id]["skipped"] = scraper.skipped
+        if scraper.skipped:
+            sinks.summary.update(skipped=scraper.skipped)
+
+        if rated:
+            await rated.close()
+
+        # Save results (an incremental run with nothing new is not a failure)
+        if sinks.successful or scraper.skipped or incremental:
+            sinks.close('completed')
+            # Pagination stopped by a block: the checkpoint keeps the last collected page
+            checkpoint.finish('completed' if checkpoint.listing_done else 'incomplete')
             jobs[job_id]["status"] = "completed"
             jobs[job_id]["result"] = {
                 "category_url": category_url,
                 "max_pages": max_pages,
-                "total_lots": len(formatted_results),
-                "results": formatted_results,
-                "output_files": {
-                    "json": str(json_path),
-                    "csv": str(csv_path) if save_csv else None
-                }
+                "incremental": incremental,
+                "total_lots": sinks.successful,
+                "skipped": scraper.skipped,
+                "listing_complete": checkpoint.listing_done,
+                "results": _sheets_results(job_results),
+                "output_files": sinks.paths
             }
+            if watcher:
+                jobs[job_id]["result"].update(changes=watcher.events, change_counts=watcher.counts)
         else:
+            sinks.close('failed')
+            checkpoint.finish('failed')
             jobs[job_id]["status"] = "failed"
             jobs[job_id]["error"] = "No lots scraped from category"
 
+    except asyncio.CancelledError:
+        _job_cancelled(job_id, sinks, checkpoint, rated)
+        raise
+
     except Exception as e:
+        if rated:
+            rated.abort()  # Lots waiting for a rating are written unrated, not dropped
+        if sinks:
+            sinks.close('failed')
+        if checkpoint:
+            checkpoint.finish('failed')
         jobs[job_id]["status"] = "failed"
         jobs[job_id]["error"] = str(e)
 
@@ -493,72 +903,59 @@ async def run_category_scrape_job(job_id: str, category_url: str, max_pages: Opt
         jobs[job_id]["completed_at"] = datetime.now().isoformat()
 
 
+def _job_cancelled(job_id: str, sinks: Optional[RunSinks], checkpoint: Optional[Checkpoint],
+                   rated: Optional[RatingBuffer] = None):
+    """
+    Job task cancelled: by the cancel endpoint (final, partial results kept in
+    the output files, lots still waiting for a rating written unrated) or by
+    server shutdown (checkpoint stays running, resumed at startup)
+    """
+    jobs[job_id]["status"] = "cancelled"
+    if not jobs[job_id].get("cancel_requested"):
+        if sinks:
+            sinks.suspend()  # Columnar writers get their footer, lot store upserts are flushed
+        return
+    if rated:
+        rated.abort()
+    if sinks:
+        sinks.close('cancelled')
+        jobs[job_id]["result"] = {"successful": sinks.successful, "failed": sinks.failed,
+                                  "output_files": sinks.paths}
+    if checkpoint:
+        checkpoint.finish('cancelled')
+        if checkpoint.params.get("distributed"):
+            WorkQueue.shared().purge(job_id)  # Workers don't pick up the rest
+
+
+def _job_results_sink(run_name: str, resumed: bool) -> ListSink:
+    """In-memory job results as Lot records; a resumed job starts with the lots written before the restart"""
+    job_results = ListSink(transform=Lot.from_scraped)
+    ndjson_path = OUTPUT_DIR / f"{run_name}.ndjson"
+    if resumed and ndjson_path.exists():
+        for record in read_ndjson(str(ndjson_path)):
+            job_results.write(record)
+    return job_results
+
+
+def _sheets_results(job_results: Optional[ListSink]) -> Optional[List[dict]]:
+    """Job response rows with Google Sheets formulas (n8n reads result.results)"""
+    if job_results is None:
+        return None
+    return [format_sheets_result(lot.to_dict()) for lot in job_results.records]
+
+
 def save_to_csv(data_list: list, filename: str):
     """Save scraped data to CSV file"""
     if not data_list:
         print("No data to save to CSV")
         return
 
-    # CSV columns
-    fieldnames = [
-        'title',
-        'bottles_count',
-        'seller_name',
-        'current_price',
-        'shipping_cost',
-        'end_date',
-        'images_count',
-        'first_image',
-        'url',
-        'scraped_at',
-        'producer_rating',
-        'vintage_rating',
-        'region_rating',
-        'overall_appeal',
-        'investment_potential',
-    ]
-
     with open(filename, 'w', newline='', encoding='utf-8-sig') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames, extrasaction='ignore')
+        writer = csv.DictWriter(csvfile, fieldnames=CSV_FIELDNAMES, extrasaction='ignore')
         writer.writeheader()
 
         for item in data_list:
-            # Get first image URL
-            first_img_url = item.get('images', [''])[0] if item.get('images') else ''
-            # Create Google Sheets IMAGE formula for 100x100px preview
-            first_image_formula = f'=IMAGE("{first_img_url}"; 4; 100; 100)' if first_img_url else ''
-
-            # Get URL and format as clickable icon if not already formatted
-            url = item.get('url', '')
-            if url and not url.startswith('=HYPERLINK'):
-                url = f'=HYPERLINK("{url}"; "🔗 View")'
-
-            # Format end_date as live countdown formula if not already formatted
-            end_date = item.get('end_date', '')
-            if end_date and not end_date.startswith('=') and len(end_date) == 19:
-                date_part = end_date[:10]
-                time_part = end_date[11:]
-                end_date = f'=DAYS(DATEVALUE("{date_part}") + TIMEVALUE("{time_part}"); NOW()) & "d " & HOUR(DATEVALUE("{date_part}") + TIMEVALUE("{time_part}") - NOW()) & "h " & MINUTE(DATEVALUE("{date_part}") + TIMEVALUE("{time_part}") - NOW()) & "m"'
-
-            # Prepare row data
-            row = {
-                'title': item.get('title', ''),
-                'bottles_count': item.get('bottles_count', ''),
-                'seller_name': item.get('seller_name', ''),
-                'current_price': item.get('current_price', ''),
-                'shipping_cost': item.get('shipping_cost', ''),
-                'end_date': end_date,
-                'images_count': len(item.get('images', [])),
-                'first_image': first_image_formula,
-                'url': url,
-                'scraped_at': item.get('scraped_at', ''),
-                'producer_rating': item.get('producer_rating', ''),
-                'vintage_rating': item.get('vintage_rating', ''),
-                'region_rating': item.get('region_rating', ''),
-                'overall_appeal': item.get('overall_appeal', ''),
-                'investment_potential': item.get('investment_potential', ''),
-            }
-            writer.writerow(row)
+            writer.writerow(format_csv_row(item))
 
     print(f"💾 CSV saved to: {filename}")
 
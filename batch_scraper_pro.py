@@ -7,100 +7,197 @@ import sys
 import json
 import asyncio
 import csv
+import secrets
 from pathlib import Path
 from datetime import datetime
-from scraper_pro import CatawikiScraperPro
-
+from typing import Optional
 
-async def scrape_multiple_urls(urls: list, output_dir: str = 'output', headless: bool = True, save_csv: bool = True):
+import config
+from scraper_pro import CatawikiScraperPro
+from sinks import RunSinks, ListSink, FlushPolicy, CSV_FIELDNAMES, format_csv_row, read_ndjson
+from lot_fields import lot_id_from_url
+from wine_rating import RatingBuffer
+from checkpoint import Checkpoint
+from seen_index import SeenIndex
+from remote_browsers import RemoteBrowsers
+
+
+async def scrape_multiple_urls(urls: list, output_dir: str = 'output', headless: bool = True, save_csv: bool = True,
+                               ai_rating: bool = False, flush_policy: Optional[FlushPolicy] = None,
+                               columnar: Optional[str] = None, resume_job: Optional[str] = None,
+                               seen_policy: str = config.SEEN_POLICY, distributed: bool = False,
+                               collect_results: bool = True):
     """
     Scrape multiple Catawiki URLs and save results
 
+    Results are streamed to disk as each lot completes (see sinks.py), so a
+    crash keeps everything scraped so far and memory stays flat. Progress is
+    checkpointed (see checkpoint.py); resume_job continues an interrupted run.
+
     Args:
         urls: List of URLs to scrape
         output_dir: Directory to save results
         headless: Run browser in headless mode
         save_csv: Export to CSV
+        ai_rating: Fill AI wine rating columns (see wine_rating.py)
+        flush_policy: When appended results are flushed/fsynced
+        columnar: Also write typed 'parquet' or 'arrow' output
+        resume_job: Run name of an interrupted batch (urls and options come from its checkpoint)
+        seen_policy: Lots scraped within config.SEEN_FRESHNESS_HOURS are 'skip'ped,
+                     'defer'red to the end or scraped as usual ('off'), see seen_index.py
+        distributed: Put the lots on the shared work queue and let worker nodes scrape
+                     them (see work_queue.py); results are still written here
+        collect_results: Also keep every result in memory for the returned summary's
+                         'results' (False: results only on disk, constant memory)
+
+    Returns:
+        Summary counters, plus 'results' (list of result dicts) when collect_results
     """
 
     # Create output directory
     output_path = Path(output_dir)
     output_path.mkdir(exist_ok=True)
 
-    scraper = CatawikiScraperPro(headless=headless)
-
-    results = []
-    successful = 0
-    failed = 0
+    if resume_job:
+        checkpoint = Checkpoint.load(resume_job)
+        if not checkpoint or checkpoint.kind != 'batch':
+            raise ValueError(f"No batch checkpoint for '{resume_job}' (see: python checkpoint.py)")
+        urls = checkpoint.state['frontier']
+        save_csv = checkpoint.params.get('save_csv', save_csv)
+        ai_rating = checkpoint.params.get('ai_rating', ai_rating)
+        columnar = checkpoint.params.get('columnar', columnar)
+        distributed = checkpoint.params.get('distributed', distributed)
+        timestamp = checkpoint.run_name[len('batch_'):]
+        checkpoint.reconcile(str(output_path / f'{checkpoint.run_name}.ndjson'))
+        print(f"♻️  Resuming {checkpoint.run_name}: {checkpoint.processed} done, {len(checkpoint.pending())} pending")
+    else:
+        # Random suffix: runs started in the same second get their own checkpoint and files
+        timestamp = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{secrets.token_hex(3)}"
+        checkpoint = Checkpoint(f'batch_{timestamp}', 'batch',
+                                params={'save_csv': save_csv, 'ai_rating': ai_rating, 'columnar': columnar,
+                                        'distributed': distributed})
+        checkpoint.add_urls(urls)
+        urls = checkpoint.state['frontier']
+        checkpoint.save()
+
+    listings_path = output_path / f'listings_{timestamp}'
+    listings_path.mkdir(exist_ok=True)
+
+    # Debug artifacts of this run go to output/artifacts/batch_{timestamp}/
+    scraper = CatawikiScraperPro(headless=headless, job_id=f'batch_{timestamp}')
+
+    results = None
+    if collect_results:
+        results = ListSink()
+        ndjson_path = output_path / f'batch_{timestamp}.ndjson'
+        if resume_job and ndjson_path.exists():
+            for record in read_ndjson(str(ndjson_path)):  # Lots written before the interruption
+                results.write(record)
+    sinks = RunSinks(output_dir, f'batch_{timestamp}', save_csv=save_csv, total=len(urls), policy=flush_policy,
+                     columnar=columnar, resume=bool(resume_job), extra_sinks=[results] if results is not None else None)
+    # AI ratings (cached per wine, only new wines go to the model, several per request);
+    # buffered lots only count as done for the checkpoint once they are written
+    rated = None
+    if ai_rating:
+        checkpoint.defer()
+        rated = RatingBuffer(sinks, on_flush=checkpoint.release)
+
+    # Lots scraped recently (any run) are skipped or moved to the end
+    queue, skipped = SeenIndex.shared().plan(checkpoint.pending(), seen_policy)
+    if skipped:
+        sinks.summary.update(skipped=len(skipped))
+        print(f"⏭️  Skipping {len(skipped)} lots scraped in the last {config.SEEN_FRESHNESS_HOURS}h")
+    position = {url: n for n, url in enumerate(urls, 1)}
 
     print(f"\n{'='*70}")
     print(f"🔍 Batch Scraping {len(urls)} URLs")
     print(f"{'='*70}\n")
 
-    for i, url in enumerate(urls, 1):
-        print(f"\n[{i}/{len(urls)}] Processing: {url}")
-        print("-" * 70)
-
-        try:
-            data = await scraper.scrape_listing(url)
-
-            if data and data.get('title'):
-                successful += 1
-                results.append(data)
-
-                # Save individual JSON
-                safe_filename = f"listing_{i:03d}.json"
-                individual_path = output_path / safe_filename
-
-                with open(individual_path, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, indent=2, ensure_ascii=False)
-
-                print(f"✅ Success! Saved to {individual_path}")
-
-            else:
-                failed += 1
-                print(f"❌ Failed to scrape")
-
-        except Exception as e:
-            failed += 1
-            print(f"❌ Error: {e}")
-
-        # Delay between requests
-        if i < len(urls):
-            delay = 5
-            print(f"⏳ Waiting {delay}s before next request...")
-            await asyncio.sleep(delay)
-
-    # Save summary JSON
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    summary_path = output_path / f'summary_{timestamp}.json'
-
-    summary = {
-        'total': len(urls),
-        'successful': successful,
-        'failed': failed,
-        'results': results,
-        'timestamp': datetime.now().isoformat()
-    }
-
-    with open(summary_path, 'w', encoding='utf-8') as f:
-        json.dump(summary, f, indent=2, ensure_ascii=False)
-
-    # Save CSV
-    if save_csv and results:
-        csv_path = output_path / f'catawiki_export_{timestamp}.csv'
-        save_to_csv(results, str(csv_path))
+    async def record(url: str, data: dict):
+        # Save individual JSON (per-run directory, named by lot id)
+        i = position[url]
+        lot_id = lot_id_from_url(url) or 'unknown'
+        individual_path = listings_path / f"listing_{i:03d}_{lot_id}.json"
+
+        with open(individual_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+        if rated:
+            checkpoint.done(url)
+            await rated.write(data)
+        else:
+            sinks.write(data)
+            checkpoint.done(url)
+
+        print(f"✅ Success! Saved to {individual_path}")
+
+    def record_failure(url: str, error: str):
+        sinks.fail(url, error)
+        checkpoint.fail(url, error)
+        print(f"❌ Failed: {url} ({error})")
+
+    try:
+        if distributed:
+            from work_queue import WorkQueue
+            work = WorkQueue.shared()
+            print(f"📤 {work.put(checkpoint.job_id, queue)} lots queued for workers (queue '{checkpoint.job_id}')")
+            await work.wait_for(checkpoint.job_id, queue, record, record_failure)
+        else:
+            for n, url in enumerate(queue, 1):
+                i = position[url]
+                print(f"\n[{i}/{len(urls)}] Processing: {url}")
+                print("-" * 70)
+
+                try:
+                    data = await scraper.scrape_listing(url)
+
+                    if data and data.get('title'):
+                        await record(url, data)
+                    else:
+                        record_failure(url, "No data extracted")
+
+                except Exception as e:
+                    record_failure(url, str(e))
+
+                # Delay between requests
+                if n < len(queue):
+                    delay = 5
+                    print(f"⏳ Waiting {delay}s before next request...")
+                    await asyncio.sleep(delay)
+
+        if rated:
+            await rated.close()
+        sinks.close('completed')
+        checkpoint.finish('completed')
+    except BaseException:
+        # Checkpoint stays 'running' - continue with --resume
+        if rated:
+            rated.abort()  # Lots waiting for a rating are written unrated, not dropped
+        sinks.close('failed')
+        print(f"\n♻️  Resume with: python batch_scraper_pro.py --resume batch_{timestamp}")
+        raise
+    finally:
+        await RemoteBrowsers.close_shared()  # Disconnect only - external browsers keep running
+
+    summary = dict(sinks.summary.summary)
+    if results is not None:
+        summary['results'] = results.records
 
     # Print summary
     print(f"\n{'='*70}")
     print(f"📊 SUMMARY")
     print(f"{'='*70}")
     print(f"Total URLs: {len(urls)}")
-    print(f"✅ Successful: {successful}")
-    print(f"❌ Failed: {failed}")
-    print(f"💾 Summary JSON: {summary_path}")
-    if save_csv and results:
-        print(f"📊 CSV Export: {csv_path}")
+    print(f"✅ Successful: {summary['successful']}")
+    print(f"❌ Failed: {summary['failed']}")
+    if skipped:
+        print(f"⏭️  Skipped (fresh): {len(skipped)}")
+    print(f"💾 Summary JSON: {sinks.paths['summary']}")
+    print(f"📄 Results NDJSON: {sinks.paths['ndjson']}")
+    if save_csv:
+        print(f"📊 CSV Export: {sinks.paths['csv']}")
+    if columnar:
+        print(f"🧱 {columnar.capitalize()} Export: {sinks.paths[columnar]}")
     print(f"{'='*70}\n")
 
     return summary
@@ -113,68 +210,13 @@ def save_to_csv(data_list: list, filename: str):
         print("No data to save to CSV")
         return
 
-    # CSV columns
-    fieldnames = [
-        'title',
-        'bottles_count',
-        'seller_name',
-        'current_price',
-        'shipping_cost',
-        'end_date',
-        'images_count',
-        'first_image',
-        'url',
-        'scraped_at',
-        'producer_rating',
-        'vintage_rating',
-        'region_rating',
-        'overall_appeal',
-        'investment_potential',
-    ]
-
     with open(filename, 'w', newline='', encoding='utf-8-sig') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames, extrasaction='ignore')
+        writer = csv.DictWriter(csvfile, fieldnames=CSV_FIELDNAMES, extrasaction='ignore')
 
         writer.writeheader()
 
         for item in data_list:
-            # Get first image URL
-            first_img_url = item.get('images', [''])[0] if item.get('images') else ''
-            # Create Google Sheets IMAGE formula for 100x100px preview
-            first_image_formula = f'=IMAGE("{first_img_url}"; 4; 100; 100)' if first_img_url else ''
-
-            # Get URL and format as clickable icon
-            url = item.get('url', '')
-            if url:
-                url = f'=HYPERLINK("{url}"; "🔗 View")'
-
-            # Format end_date as live countdown formula
-            end_date = item.get('end_date', '')
-            if end_date and len(end_date) == 19:  # Format: "2025-11-17 21:00:00"
-                date_part = end_date[:10]
-                time_part = end_date[11:]
-                end_date = f'=DAYS(DATEVALUE("{date_part}") + TIMEVALUE("{time_part}"); NOW()) & "d " & HOUR(DATEVALUE("{date_part}") + TIMEVALUE("{time_part}") - NOW()) & "h " & MINUTE(DATEVALUE("{date_part}") + TIMEVALUE("{time_part}") - NOW()) & "m"'
-
-            # Prepare row data
-            row = {
-                'title': item.get('title', ''),
-                'bottles_count': item.get('bottles_count', ''),
-                'seller_name': item.get('seller_name', ''),
-                'current_price': item.get('current_price', ''),
-                'shipping_cost': item.get('shipping_cost', ''),
-                'end_date': end_date,
-                'images_count': len(item.get('images', [])),
-                'first_image': first_image_formula,
-                'url': url,
-                'scraped_at': item.get('scraped_at', ''),
-                'producer_rating': item.get('producer_rating', ''),
-                'vintage_rating': item.get('vintage_rating', ''),
-                'region_rating': item.get('region_rating', ''),
-                'overall_appeal': item.get('overall_appeal', ''),
-                'investment_potential': item.get('investment_potential', ''),
-            }
-
-            writer.writerow(row)
+            writer.writerow(format_csv_row(item))
 
     print(f"💾 CSV saved to: {filename}")
     print(f"📊 Total rows: {len(data_list)}")
@@ -183,19 +225,43 @@ def save_to_csv(data_list: list, filename: str):
 async def main():
     if len(sys.argv) < 2:
         print("Usage:")
-        print("  python batch_scraper_pro.py <urls_file.txt> [--headless] [--no-csv]")
-        print("  python batch_scraper_pro.py url1 url2 url3 [--headless] [--no-csv]")
+        print("  python batch_scraper_pro.py <urls_file.txt> [--headless] [--no-csv] [--ai-rating]")
+        print("  python batch_scraper_pro.py url1 url2 url3 [--headless] [--no-csv] [--ai-rating]")
+        print("  python batch_scraper_pro.py --resume <batch_YYYYmmdd_HHMMSS_xxxxxx> [--headless]")
         print("\nExamples:")
         print("  python batch_scraper_pro.py urls.txt")
         print("  python batch_scraper_pro.py 'URL1' 'URL2' --headless")
         print("\nOptions:")
         print("  --headless    Run in headless mode")
         print("  --no-csv      Don't export to CSV")
+        print("  --ai-rating   Add AI wine ratings (cached per wine)")
+        print("  --fsync       fsync results after every lot (survives power loss)")
+        print("  --parquet     Also export typed Parquet (needs pyarrow)")
+        print("  --arrow       Also export typed Arrow IPC stream (needs pyarrow)")
+        print("  --resume JOB  Continue an interrupted run (see: python checkpoint.py)")
+        print("  --skip-seen   Skip lots scraped in the last SEEN_FRESHNESS_HOURS (any run)")
+        print("  --defer-seen  Scrape recently scraped lots last")
+        print("  --rescrape    Scrape every lot (default, unless config.SEEN_POLICY says otherwise)")
+        print("  --distributed Let worker nodes scrape the lots (python work_queue.py work)")
         sys.exit(1)
 
     headless = '--headless' in sys.argv
     save_csv = '--no-csv' not in sys.argv
-    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    ai_rating = '--ai-rating' in sys.argv
+    flush_policy = FlushPolicy(fsync=True) if '--fsync' in sys.argv else None
+    columnar = 'parquet' if '--parquet' in sys.argv else ('arrow' if '--arrow' in sys.argv else None)
+    seen_policy = ('off' if '--rescrape' in sys.argv else 'skip' if '--skip-seen' in sys.argv
+                   else 'defer' if '--defer-seen' in sys.argv else config.SEEN_POLICY)
+    distributed = '--distributed' in sys.argv
+    resume_job = None
+    if '--resume' in sys.argv and sys.argv.index('--resume') + 1 < len(sys.argv):
+        resume_job = sys.argv[sys.argv.index('--resume') + 1]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--') and arg != resume_job]
+
+    if resume_job:
+        await scrape_multiple_urls([], headless=headless, flush_policy=flush_policy, resume_job=resume_job,
+                                   seen_policy=seen_policy, distributed=distributed, collect_results=False)
+        return
 
     # Check if first argument is a file
     urls = []
@@ -212,7 +278,9 @@ async def main():
         print("❌ No URLs provided")
         sys.exit(1)
 
-    await scrape_multiple_urls(urls, headless=headless, save_csv=save_csv)
+    await scrape_multiple_urls(urls, headless=headless, save_csv=save_csv, ai_rating=ai_rating,
+                               flush_policy=flush_policy, columnar=columnar, seen_policy=seen_policy,
+                               distributed=distributed, collect_results=False)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark: job results held as dicts vs Lot records
+
+Builds N synthetic scraped lots (default 100k) and measures, with
+tracemalloc, what keeping them in memory costs as Sheets-formatted dicts
+(how API job results used to be kept), as raw scraper dicts and as Lot
+records (how they are kept now).
+
+Usage: python benchmark_lot_memory.py [count]
+"""
+
+import sys
+import gc
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from lot import Lot
+from sinks import format_sheets_result
+
+
+SELLERS = [f"Wine Merchant {i}" for i in range(300)]
+REGIONS = ['Bordeaux', 'Burgundy', 'Champagne', 'Rhône', 'Piedmont', 'Tuscany', 'Rioja', 'Napa Valley']
+
+
+def synthetic_lot(i: int, rng: random.Random) -> dict:
+    """One scraper_pro-shaped result; strings are built per lot like real scrapes"""
+    lot_id = 90000000 + i
+    end = datetime(2025, 11, 17, 21, 0) + timedelta(minutes=rng.randint(0, 20000))
+    return {
+        'title': f"{rng.randint(1, 12)} bottles {rng.randint(1960, 2020)} Château {rng.choice(REGIONS)} Grand Cru {i}",
+        'images': [f"https://assets.catawiki.com/image/cw_ldp_l/plain/assets/catawiki/assets/2025/11/{lot_id}_{n}.jpg"
+                   for n in range(rng.randint(3, 8))],
+        'bottles_count': rng.randint(1, 12),
+        'seller_name': ''.join(rng.choice(SELLERS)),
+        'current_price': f"€{rng.randint(10, 5000):,}",
+        'shipping_cost': str(rng.randint(15, 60)),
+        'end_date': end.strftime('%Y-%m-%d %H:%M:%S'),
+        'url': f"https://www.catawiki.com/en/l/{lot_id}-chateau-grand-cru",
+        'scraped_at': (end - timedelta(days=2)).isoformat(),
+    }
+
+
+def measure(label: str, count: int, build) -> int:
+    rng = random.Random(42)
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    held = [build(synthetic_lot(i, rng)) for i in range(count)]
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<26} {current / 1024 / 1024:8.1f} MB  {current / count:7.0f} B/lot  {elapsed:6.2f} s")
+    del held
+    return current
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(f"📏 Holding {count:,} lots in memory\n")
+
+    sheets = measure('Sheets-formatted dicts', count, format_sheets_result)
+    raw = measure('Raw scraper dicts', count, lambda data: data)
+    lots = measure('Lot records', count, Lot.from_scraped)
+
+    print(f"\n💾 Lot records use {lots / sheets:.0%} of Sheets-formatted dicts, {lots / raw:.0%} of raw dicts")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Pre-warmed browsers for the API server
+
+api_server starts the pool in its lifespan: one Playwright driver and
+config.BROWSER_POOL_SIZE headless browsers, each with a spare context
+already built for the session the next lot is likely to get (fingerprint,
+cookies, stealth script). A lot checks out an idle browser instead of
+launching one, so the first request after a restart costs what the
+hundredth does. The pool never makes a lot wait: with every browser busy
+(or the pool down) the lot launches its own browser as before.
+
+Browsers stay up between lots; a browser is replaced after
+config.BROWSER_POOL_MAX_LOTS lots or when the memory governor flags it,
+and dropped (not relaunched) when the governor closed it for memory.
+Proxies go on the context (Linux Chromium takes per-context proxies).
+
+The CLIs (scraper_pro.py, batch_scraper_pro.py, category_scraper.py) never start the pool.
+"""
+
+import asyncio
+import os
+import secrets
+import time
+from typing import Optional, Dict, List, Tuple
+
+import config
+from session_pool import SessionPool, Session, STEALTH_SCRIPT
+
+# Long-lived browsers run without --single-process: one crashed renderer would take the browser down
+LAUNCH_ARGS = config.BROWSER_ARGS + ['--disable-gpu']
+
+DEFAULT_CONTEXT = {
+    'viewport': {'width': 1920, 'height': 1080},
+    'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'locale': 'en-US',
+    'timezone_id': 'Europe/Amsterdam',
+    'extra_http_headers': {
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.9',
+        'Accept-Encoding': 'gzip, deflate, br',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1',
+    },
+}
+
+
+async def new_context(browser, session: Optional[Session] = None, proxy: Optional[Dict] = None):
+    """Context with the session's fingerprint and cookies (default profile without one) and the stealth script"""
+    options = session.context_options() if session else dict(DEFAULT_CONTEXT)
+    if proxy:
+        options['proxy'] = proxy
+    context = await browser.new_context(**options)
+    await context.add_init_script(session.stealth_script() if session else STEALTH_SCRIPT % "['en-US', 'en']")
+    return context
+
+
+def context_key(session: Optional[Session], proxy: Optional[Dict]) -> Tuple:
+    """What a spare context was built from - it only serves a lot with the same key"""
+    if not session:
+        return (None, None, None, proxy['server'] if proxy else None)
+    try:
+        state_mtime = os.path.getmtime(session.state_path)
+    except OSError:
+        state_mtime = None
+    return (session.session_id, session.rotations, state_mtime, proxy['server'] if proxy else None)
+
+
+class PooledBrowser:
+    def __init__(self, browser, marker: str):
+        self.browser = browser
+        self.marker = marker  # Memory governor finds the process by it
+        self.busy = False
+        self.lots = 0
+        self.spare = None  # Context built ahead for spare_key
+        self.spare_key: Optional[Tuple] = None
+
+    async def drop_spare(self):
+        spare, self.spare, self.spare_key = self.spare, None, None
+        if spare is not None:
+            try:
+                await spare.close()
+            except Exception:
+                pass
+
+
+class BrowserPool:
+    _shared = None
+
+    def __init__(self, size: int = config.BROWSER_POOL_SIZE, headless: bool = True,
+                 sessions: Optional[SessionPool] = None):
+        self.size = size
+        self.headless = headless
+        self.sessions = sessions if sessions is not None else SessionPool.shared()
+        self.browsers: List[PooledBrowser] = []
+        self.state = 'starting'  # starting, ready, degraded (fewer browsers than size), failed, stopped
+        self.startup_s: Optional[float] = None
+        self.launching = 0
+        self.counts = {'warm': 0, 'cold': 0, 'spare_hits': 0, 'replaced': 0, 'dropped': 0, 'launch_errors': 0}
+        self._playwright = None
+        self._tasks = set()
+
+    @classmethod
+    def shared(cls) -> Optional['BrowserPool']:
+        """The server's pool (None until start_shared - the CLI launches per lot)"""
+        return cls._shared
+
+    @classmethod
+    async def start_shared(cls, timeout: float = config.BROWSER_POOL_START_TIMEOUT) -> 'BrowserPool':
+        """Start the process-wide pool; a slow or failed start leaves it degraded, never raises"""
+        pool = cls._shared = cls()
+        try:
+            await asyncio.wait_for(pool.start(), timeout)
+        except Exception as e:
+            pool._settle()
+            print(f"[{time.strftime('%H:%M:%S')}] ⚠️  Browser pool start: {type(e).__name__}: {e} "
+                  f"({len(pool.browsers)}/{pool.size} browsers, state {pool.state})")
+        return pool
+
+    @classmethod
+    async def close_shared(cls):
+        if cls._shared is not None:
+            await cls._shared.close()
+            cls._shared = None
+
+    async def start(self):
+        started = time.monotonic()
+        from playwright.async_api import async_playwright
+        self._playwright = await async_playwright().start()
+        results = await asyncio.gather(*(self._add_browser() for _ in range(self.size)), return_exceptions=True)
+        errors = [r for r in results if isinstance(r, Exception)]
+        self.startup_s = round(time.monotonic() - started, 2)
+        self._settle()
+        print(f"[{time.strftime('%H:%M:%S')}] 🔥 Browser pool {self.state}: {len(self.browsers)}/{self.size} browsers, "
+              f"{sum(1 for pb in self.browsers if pb.spare is not None)} spare contexts in {self.startup_s:.1f}s"
+              + (f" (first error: {str(errors[0]).splitlines()[0]})" if errors else ''))
+
+    def _settle(self):
+        if self.state == 'stopped':
+            return
+        if len(self.browsers) >= self.size:
+            self.state = 'ready'
+        else:
+            self.state = 'degraded' if self.browsers else 'failed'
+
+    def serves(self, headless: bool) -> bool:
+        return self.headless == headless and self.state in ('ready', 'degraded')
+
+    async def _add_browser(self):
+        """Launch one browser into the pool and build its spare context"""
+        self.launching += 1
+        try:
+            marker = f"--governor-tag=pool-{secrets.token_hex(4)}"
+            browser = await self._playwright.chromium.launch(headless=self.headless, args=LAUNCH_ARGS + [marker],
+                                                             timeout=30000)
+        except Exception:
+            self.counts['launch_errors'] += 1
+            raise
+        finally:
+            self.launching -= 1
+        pooled = PooledBrowser(browser, marker)
+        self.browsers.append(pooled)
+        await self._refill(pooled)
+
+    def _spare_target(self) -> Tuple[Optional[Session], Optional[Dict]]:
+        """Session (and its proxy) the next lot is most likely to get, not already covered by a spare"""
+        if not self.sessions:
+            return None, None
+        covered = {pb.spare_key[0] for pb in self.browsers if pb.spare_key}
+        session = next((s for s in self.sessions.ranked() if s.session_id not in covered), None)
+        if session is None:
+            return None, None
+        proxy = None
+        if session.proxy:
+            from proxy_pool import ProxyPool
+            bound = next((p for p in ProxyPool.shared().proxies if p.name == session.proxy), None)
+            proxy = bound.playwright() if bound else None
+        return session, proxy
+
+    async def _refill(self, pooled: PooledBrowser):
+        """Replace the browser's spare context with one for the next likely lot"""
+        await pooled.drop_spare()
+        session, proxy = self._spare_target()
+        if session is None and self.sessions:
+            return  # Every session already has a spare
+        key = context_key(session, proxy)
+        pooled.spare_key = key  # Reserved while building, so other browsers pick another session
+        try:
+            context = await new_context(pooled.browser, session, proxy)
+        except Exception as e:
+            pooled.spare_key = None
+            print(f"[{time.strftime('%H:%M:%S')}] ⚠️  Spare context failed: {e}")
+            return
+        if pooled.spare_key == key and pooled.spare is None and pooled in self.browsers:
+            pooled.spare = context
+        else:
+            await context.close()  # Taken or replaced while building
+
+    def checkout(self, key: Tuple) -> Optional[Tuple[PooledBrowser, Optional[object]]]:
+        """
+        Idle browser for a lot, with its spare context if it was built for key
+
+        None when every browser is busy - the caller launches its own.
+        Never waits.
+        """
+        idle = [pb for pb in self.browsers if not pb.busy and pb.browser.is_connected()]
+        if not idle:
+            self.counts['cold'] += 1
+            if len(self.browsers) + self.launching < self.size and self.state in ('ready', 'degraded'):
+                self._background(self._replenish())
+            return None
+
+        pooled = next((pb for pb in idle if pb.spare is not None and pb.spare_key == key), None)
+        context = None
+        if pooled is not None:
+            context, pooled.spare, pooled.spare_key = pooled.spare, None, None
+            self.counts['spare_hits'] += 1
+        else:
+            # Keep other spares for their lots; a browser without one is the cheapest to use
+            pooled = min(idle, key=lambda pb: pb.spare is not None)
+        pooled.busy = True
+        self.counts['warm'] += 1
+
+        # The session's cookies or proxy moved on: rebuild its stale spare
+        for pb in idle:
+            if pb is not pooled and pb.spare_key and pb.spare_key[0] == key[0] and pb.spare_key != key:
+                self._background(self._refill(pb))
+        return pooled, context
+
+    def release(self, pooled: PooledBrowser, recycle: bool = False, killed: bool = False):
+        """Lot done; the browser is kept (spare refilled), replaced, or dropped after a memory kill"""
+        pooled.busy = False
+        pooled.lots += 1
+        if killed:
+            self.counts['dropped'] += 1
+            self._background(self._retire(pooled))
+        elif recycle or not pooled.browser.is_connected() or pooled.lots >= config.BROWSER_POOL_MAX_LOTS:
+            self.counts['replaced'] += 1
+            self._background(self._replace(pooled))
+        elif pooled.spare is None:
+            self._background(self._refill(pooled))
+
+    async def _retire(self, pooled: PooledBrowser):
+        if pooled in self.browsers:
+            self.browsers.remove(pooled)
+        await pooled.drop_spare()
+        try:
+            await pooled.browser.close()
+        except Exception:
+            pass
+        self._settle()
+
+    async def _replace(self, pooled: PooledBrowser):
+        await self._retire(pooled)
+        await self._replenish()
+
+    async def _replenish(self):
+        if self.state == 'stopped' or len(self.browsers) + self.launching >= self.size:
+            return
+        try:
+            await self._add_browser()
+        except Exception as e:
+            print(f"[{time.strftime('%H:%M:%S')}] ⚠️  Pool browser launch failed: {e}")
+        self._settle()
+
+    def _background(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def close(self):
+        self.state = 'stopped'
+        for task in list(self._tasks):
+            task.cancel()
+        for pooled in list(self.browsers):
+            await self._retire(pooled)
+        if self._playwright is not None:
+            try:
+                await self._playwright.stop()
+            except Exception:
+                pass
+            self._playwright = None
+        print(f"[{time.strftime('%H:%M:%S')}] 🔌 Browser pool closed")
+
+    def summary(self) -> Dict:
+        return {
+            'state': self.state,
+            'size': self.size,
+            'browsers': len(self.browsers),
+            'idle': sum(1 for pb in self.browsers if not pb.busy),
+            'spare_contexts': sum(1 for pb in self.browsers if pb.spare is not None),
+            'startup_s': self.startup_s,
+            **self.counts,
+        }
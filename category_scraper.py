@@ -4,16 +4,66 @@ Catawiki Category Scraper - парсинг всех лотов в категор
 """
 
 import asyncio
+import secrets
 import time
-from typing import List, Optional
+from datetime import datetime
+from typing import List, Optional, Dict, Callable, Awaitable, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, urljoin
 from playwright.async_api import async_playwright
 from scraper_pro import CatawikiScraperPro
+from browser_pool import new_context
+from remote_browsers import RemoteBrowsers
+from circuit_breaker import detect_block, host_key
+from readiness import wait_listing_stable
+from tracing import span
+from checkpoint import Checkpoint
+from seen_index import SeenIndex
+from lot_store import LotStore, END_DATE_FORMAT
+from lot_fields import lot_id_from_url, parse_datetime
+from scheduler import next_check
+import config
+
+
+def newest_first(category_url: str) -> str:
+    """URL категории с сортировкой "сначала новые" (config.CATEGORY_NEWEST_SORT)"""
+    parts = urlsplit(category_url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in ('sort', 'page')]
+    query.append(('sort', config.CATEGORY_NEWEST_SORT))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def split_known(lot_urls: List[str], store: LotStore, now: Optional[datetime] = None) -> Tuple[List[str], List[str], int]:
+    """
+    Разделить URL страницы на новые лоты и известные, которым пора обновиться
+
+    Срок обновления - как у scheduler.py: чем ближе окончание, тем чаще.
+    Returns (new, due, known_total)
+    """
+    now = now or datetime.now()
+    known = store.known([int(lot_id) for lot_id in map(lot_id_from_url, lot_urls) if lot_id])
+    new, due = [], []
+    for url in lot_urls:
+        lot_id = lot_id_from_url(url)
+        snapshot = known.get(int(lot_id)) if lot_id else None
+        if snapshot is None:
+            new.append(url)
+            continue
+        end_date = datetime.strptime(snapshot['end_date'], END_DATE_FORMAT) if snapshot['end_date'] else None
+        next_due = next_check(end_date, now=parse_datetime(snapshot['scraped_at']).replace(tzinfo=None))
+        if next_due is not None and next_due <= now:
+            due.append(url)
+    return new, due, len(lot_urls) - len(new)
 
 
 class CatawikiCategoryScraper:
-    def __init__(self, headless: bool = True):
+    def __init__(self, headless: bool = True, job_id: Optional[str] = None, work_queue=None):
         self.headless = headless
-        self.scraper = CatawikiScraperPro(headless=headless)
+        self.job_id = job_id
+        self.scraper = CatawikiScraperPro(headless=headless, job_id=job_id)
+        self.work_queue = work_queue  # work_queue.WorkQueue: лоты парсят воркеры, здесь только листинг
+        self.skipped = 0  # Свежие/известные лоты, пропущенные в последнем scrape_category
+        self.endpoint = None  # Внешний браузер листинга (remote_browsers.py)
+        self._playwright = None  # Свой драйвер, только если браузер запускаем сами
 
     async def extract_lot_urls_from_page(self, page) -> List[str]:
         """Извлечь все URL лотов со страницы категории"""
@@ -44,10 +94,7 @@ class CatawikiCategoryScraper:
                 for link in all_links:
                     href = await link.get_attribute('href')
                     if href and '/en/l/' in href:
-                        if href.startswith('http'):
-                            lot_url = href.split('?')[0]
-                        else:
-                            lot_url = f"https://www.catawiki.com{href.split('?')[0]}"
+                        lot_url = urljoin(page.url, href.split('?')[0])
                         if lot_url not in lot_urls:
                             lot_urls.append(lot_url)
 
@@ -68,13 +115,8 @@ class CatawikiCategoryScraper:
                         continue
 
                 if href:
-                    # Полный URL
-                    if href.startswith('http'):
-                        lot_url = href.split('?')[0]  # Убрать query параметры
-                    else:
-                        lot_url = f"https://www.catawiki.com{href.split('?')[0]}"
-
-                    lot_urls.append(lot_url)
+                    # Полный URL (относительно страницы категории), без query параметров
+                    lot_urls.append(urljoin(page.url, href.split('?')[0]))
 
         except Exception as e:
             print(f"[{time.strftime('%H:%M:%S')}] ❌ Ошибка извлечения URL: {e}")
@@ -117,98 +159,159 @@ class CatawikiCategoryScraper:
             print(f"[{time.strftime('%H:%M:%S')}] ⚠️ Не удалось определить количество страниц: {e}")
             return 1
 
-    async def scrape_category(self, category_url: str, max_pages: Optional[int] = None) -> List[dict]:
+    async def _open_browser(self, browser_slot, session=None):
+        """Браузер с анти-детекцией и контекстом (сессии, если есть); returns (browser, context, page)"""
+        # Внешний браузер (remote_browsers.py) - свой Chromium не запускаем
+        remote = self.scraper.remote
+        self.endpoint = await remote.checkout() if remote else None
+        if self.endpoint:
+            browser = self.endpoint.browser
+        else:
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            browser = await self._playwright.chromium.launch(
+                headless=self.headless,
+                args=[
+                    '--disable-blink-features=AutomationControlled',
+                    '--disable-dev-shm-usage',
+                    '--no-sandbox',
+                    '--disable-setuid-sandbox',
+                    '--disable-web-security',
+                    '--disable-features=IsolateOrigins,site-per-process',
+                    '--disable-gpu',
+                    '--single-process',
+                    browser_slot.marker,  # По нему memory_governor.py находит процесс браузера
+                ],
+                timeout=30000
+            )
+            browser_slot.attach(browser)
+
+        context = await new_context(browser, session)
+        return browser, context, await context.new_page()
+
+    async def _close_browser(self, browser, context):
+        """Закрыть браузер; у внешнего - только наш контекст"""
+        if self.endpoint:
+            try:
+                await context.close()
+            except Exception:
+                pass
+            self.scraper.remote.release(self.endpoint)
+            self.endpoint = None
+        elif browser is not None:
+            try:
+                await browser.close()
+            except Exception:
+                pass
+
+    async def scrape_category(self, category_url: str, max_pages: Optional[int] = None,
+                              on_result: Optional[Callable[[Dict], Awaitable[None]]] = None,
+                              on_failure: Optional[Callable[[str, str], None]] = None,
+                              collect: bool = True, checkpoint: Optional[Checkpoint] = None,
+                              seen_policy: str = config.SEEN_POLICY, incremental: bool = False) -> List[dict]:
         """
         Парсинг всей категории с пагинацией
 
         Args:
             category_url: URL категории
             max_pages: Максимальное количество страниц для парсинга (None = все страницы)
+            on_result: Вызывается сразу после каждого успешного лота (стриминг в sinks.py)
+            on_failure: Вызывается с (url, ошибка) для каждого неудачного лота
+            collect: Хранить результаты в памяти и вернуть их (False - только on_result)
+            checkpoint: Состояние обхода (checkpoint.py) - продолжить с последней
+                        собранной страницы и пропустить уже обработанные лоты
+            seen_policy: Лоты, спарсенные за последние config.SEEN_FRESHNESS_HOURS
+                         (в любом запуске): 'skip', 'defer' (в конец) или 'off'
+            incremental: Только новое - сортировка "сначала новые", остановка на первой
+                         полностью известной странице (lot_store.py), парсятся новые лоты
+                         и известные, которым пора обновиться
 
         Returns:
-            Список данных всех лотов
+            Список данных всех лотов (пустой, если collect=False)
         """
         print("=" * 70)
         print("🗂️ Catawiki Category Scraper")
         print("=" * 70)
         print(f"Category URL: {category_url}")
         print(f"Max pages: {max_pages or 'ALL'}")
+        print(f"Mode: {'incremental' if incremental else 'full'}")
         print(f"Time: {time.strftime('%Y-%m-%d %H:%M:%S')}")
         print("=" * 70)
 
         all_lot_urls = []
-
-        async with async_playwright() as p:
+        self.skipped = 0
+        store = None
+        if incremental:
+            category_url = newest_first(category_url)
+            # Лоты уже отобраны по времени последнего парсинга и дате окончания
+            seen_policy = 'off'
+
+        if checkpoint and checkpoint.listing_done:
+            print(f"[{time.strftime('%H:%M:%S')}] ♻️  Все страницы уже собраны (checkpoint), пропускаем пагинацию")
+            return await self._scrape_lots(checkpoint.pending(), on_result, on_failure, collect, checkpoint, seen_policy)
+
+        if incremental:
+            store = LotStore()
+        sessions = self.scraper.sessions
+        session = None
+        outcome = 'ok'
+        breakers = self.scraper.breakers
+        await breakers.admit(category_url)  # Пауза, пока Catawiki нас блокирует
+        governor = self.scraper.governor  # Слот браузера, перезапуск при росте памяти
+
+        async with governor.slot(f"category {self.job_id or ''}".strip()) as browser_slot:
+            browser = context = None
             try:
-                # Запустить браузер с анти-детекцией
-                browser = await p.chromium.launch(
-                    headless=self.headless,
-                    args=[
-                        '--disable-blink-features=AutomationControlled',
-                        '--disable-dev-shm-usage',
-                        '--no-sandbox',
-                        '--disable-setuid-sandbox',
-                        '--disable-web-security',
-                        '--disable-features=IsolateOrigins,site-per-process',
-                        '--disable-gpu',
-                        '--single-process',
-                    ],
-                    timeout=30000
-                )
-
-                # Create context with stealth settings
-                context = await browser.new_context(
-                    viewport={'width': 1920, 'height': 1080},
-                    user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                    locale='en-US',
-                    timezone_id='Europe/Amsterdam',
-                    extra_http_headers={
-                        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                        'Accept-Language': 'en-US,en;q=0.9',
-                        'Accept-Encoding': 'gzip, deflate, br',
-                        'Connection': 'keep-alive',
-                        'Upgrade-Insecure-Requests': '1',
-                    }
-                )
-
-                # Add stealth script to hide automation
-                await context.add_init_script("""
-                    Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
-                    Object.defineProperty(navigator, 'plugins', {get: () => [1, 2, 3]});
-                    Object.defineProperty(navigator, 'languages', {get: () => ['en-US', 'en']});
-                    window.chrome = {runtime: {}};
-                """)
-
-                page = await context.new_page()
+                # Контекст с отпечатком и cookies прогретой сессии (session_pool.py)
+                if sessions:
+                    session = sessions.acquire()
+                    generation = session.rotations
+                browser, context, page = await self._open_browser(browser_slot, session)
 
                 # Загрузить первую страницу категории
                 print(f"[{time.strftime('%H:%M:%S')}] 🌐 Загрузка категории...")
-                response = await page.goto(category_url, wait_until='domcontentloaded', timeout=30000)
+                with span('category.goto', job_id=self.job_id, page=1, url=category_url):
+                    response = await page.goto(category_url, wait_until='domcontentloaded', timeout=30000)
 
                 # Проверка на блокировку
-                if response and response.status == 403:
-                    print(f"[{time.strftime('%H:%M:%S')}] ❌ Catawiki заблокировал доступ (403)")
-                    await browser.close()
+                if detect_block(response.status if response else None):
+                    print(f"[{time.strftime('%H:%M:%S')}] ❌ Catawiki заблокировал доступ ({response.status})")
+                    outcome = 'blocked'
                     return []
 
                 print(f"[{time.strftime('%H:%M:%S')}] ✓ Страница загружена (статус: {response.status if response else 'unknown'})")
 
-                await asyncio.sleep(3)  # Дать время на загрузку контента
+                with span('category.ready', job_id=self.job_id, page=1):
+                    await wait_listing_stable(page)  # Число карточек лотов перестало меняться
 
                 # Отладка: сохранить HTML для проверки
                 html_content = await page.content()
                 print(f"[{time.strftime('%H:%M:%S')}] 📄 HTML размер: {len(html_content)} символов")
 
                 # Определить общее количество страниц
-                total_pages = await self.get_total_pages(page)
+                with span('category.total_pages', job_id=self.job_id):
+                    total_pages = await self.get_total_pages(page)
 
                 if max_pages:
                     total_pages = min(total_pages, max_pages)
 
-                # Парсинг каждой страницы категории
-                for page_num in range(1, total_pages + 1):
+                # Парсинг каждой страницы категории (после сбоя - со следующей несобранной)
+                start_page = checkpoint.last_page + 1 if checkpoint else 1
+                if start_page > 1:
+                    print(f"[{time.strftime('%H:%M:%S')}] ♻️  Продолжаем со страницы {start_page} (checkpoint)")
+
+                for page_num in range(start_page, total_pages + 1):
                     print(f"\n[{time.strftime('%H:%M:%S')}] 📑 Страница {page_num}/{total_pages}")
 
+                    # Браузер разросся (memory_governor.py) - перезапустить, cookies сессии сохраняются
+                    if page_num > 1 and browser_slot.recycle:
+                        print(f"[{time.strftime('%H:%M:%S')}] ♻️  Браузер занимает {browser_slot.rss_mb:.0f} MB, "
+                              f"перезапуск...")
+                        if session:
+                            await sessions.save_state(session, context, generation)
+                        await self._close_browser(browser, context)
+                        browser, context, page = await self._open_browser(browser_slot, session)
+
                     # Если не первая страница, перейти на нужную
                     if page_num > 1:
                         # Построить URL с параметром page
@@ -216,28 +319,103 @@ class CatawikiCategoryScraper:
                         page_url = f"{category_url}{separator}page={page_num}"
 
                         print(f"[{time.strftime('%H:%M:%S')}] 🌐 Переход на страницу {page_num}...")
-                        await page.goto(page_url, wait_until='domcontentloaded', timeout=30000)
-                        await asyncio.sleep(3)
+                        with span('category.goto', job_id=self.job_id, page=page_num, url=page_url):
+                            response = await page.goto(page_url, wait_until='domcontentloaded', timeout=30000)
+                        if detect_block(response.status if response else None):
+                            # Остальные страницы не грузим - парсим то, что уже собрано
+                            print(f"[{time.strftime('%H:%M:%S')}] ❌ Блокировка на странице {page_num} "
+                                  f"({response.status}), пагинация остановлена")
+                            outcome = 'blocked'
+                            break
+                        with span('category.ready', job_id=self.job_id, page=page_num):
+                            await wait_listing_stable(page)
 
                     # Извлечь URL лотов со страницы
-                    lot_urls = await self.extract_lot_urls_from_page(page)
-                    all_lot_urls.extend(lot_urls)
-
+                    with span('category.extract_urls', job_id=self.job_id, page=page_num) as urls_span:
+                        lot_urls = await self.extract_lot_urls_from_page(page)
+                        if urls_span:
+                            urls_span.set(lots=len(lot_urls))
                     print(f"[{time.strftime('%H:%M:%S')}] ✓ Извлечено {len(lot_urls)} URL лотов")
 
-                await browser.close()
+                    page_known = False
+                    if incremental:
+                        new_urls, due_urls, known_count = split_known(lot_urls, store)
+                        print(f"[{time.strftime('%H:%M:%S')}] 🆕 Новых: {len(new_urls)}, известных: {known_count} "
+                              f"(пора обновить: {len(due_urls)})")
+                        page_known = bool(lot_urls) and not new_urls
+                        self.skipped += known_count - len(due_urls)
+                        lot_urls = new_urls + due_urls
+
+                    all_lot_urls.extend(lot_urls)
+                    if checkpoint:
+                        checkpoint.add_urls(lot_urls)
+                        checkpoint.page_done(page_num)
+
+                    if page_known:
+                        # Дальше только более старые лоты - они уже известны
+                        print(f"[{time.strftime('%H:%M:%S')}] ⏹️  Страница {page_num} полностью известна, "
+                              f"дальше не идём")
+                        break
+
+                if session:
+                    await sessions.save_state(session, context, generation)
+                if checkpoint and outcome != 'blocked':
+                    # После блокировки листинг не завершён - --resume продолжит со страницы page_done + 1
+                    checkpoint.listing_complete()
+
+            except asyncio.CancelledError:
+                outcome = 'cancelled'  # Задачу отменили - сессия и хост ни при чём
+                raise
 
             except Exception as e:
                 print(f"[{time.strftime('%H:%M:%S')}] ❌ Ошибка парсинга категории: {e}")
+                outcome = 'error'
                 return []
 
-        # Удалить дубликаты
-        all_lot_urls = list(set(all_lot_urls))
+            finally:
+                await self._close_browser(browser, context)
+                if self._playwright is not None:
+                    await self._playwright.stop()
+                    self._playwright = None
+                if store:
+                    store.close()
+                if session:
+                    sessions.release(session, outcome)
+                breakers.record(host_key(category_url), outcome, 'listing' if outcome == 'blocked' else None)
+
+        if checkpoint:
+            # Frontier без дубликатов, включая URL со страниц до сбоя
+            all_lot_urls = checkpoint.pending()
+        else:
+            # Удалить дубликаты
+            all_lot_urls = list(set(all_lot_urls))
         print(f"\n[{time.strftime('%H:%M:%S')}] 📊 Всего уникальных лотов: {len(all_lot_urls)}")
 
+        return await self._scrape_lots(all_lot_urls, on_result, on_failure, collect, checkpoint, seen_policy)
+
+    async def _scrape_lots(self, all_lot_urls: List[str],
+                           on_result: Optional[Callable[[Dict], Awaitable[None]]],
+                           on_failure: Optional[Callable[[str, str], None]],
+                           collect: bool, checkpoint: Optional[Checkpoint],
+                           seen_policy: str = config.SEEN_POLICY) -> List[dict]:
+        """Парсинг собранных URL лотов по одному"""
+        if checkpoint and checkpoint.processed:
+            print(f"[{time.strftime('%H:%M:%S')}] ♻️  Уже обработано {checkpoint.processed} лотов, осталось {len(all_lot_urls)}")
+
+        # Недавно спарсенные лоты (в любом запуске) пропустить или отложить в конец
+        all_lot_urls, skipped = SeenIndex.shared().plan(all_lot_urls, seen_policy)
+        self.skipped += len(skipped)
+        if skipped:
+            print(f"[{time.strftime('%H:%M:%S')}] ⏭️  Пропускаем {len(skipped)} лотов, "
+                  f"спарсенных за последние {config.SEEN_FRESHNESS_HOURS} ч")
+
+        if self.work_queue:
+            return await self._distribute_lots(all_lot_urls, on_result, on_failure, collect, checkpoint)
+
         # Теперь парсим каждый лот
         print(f"\n[{time.strftime('%H:%M:%S')}] 🚀 Начинаем парсинг каждого лота...")
         all_results = []
+        successful = 0
 
         for i, lot_url in enumerate(all_lot_urls, 1):
             print(f"\n[{time.strftime('%H:%M:%S')}] 📦 Лот {i}/{len(all_lot_urls)}: {lot_url}")
@@ -247,12 +425,26 @@ class CatawikiCategoryScraper:
                 result = await self.scraper.scrape_listing(lot_url)
 
                 if result and result.get('title'):
-                    all_results.append(result)
+                    successful += 1
+                    if collect:
+                        all_results.append(result)
+                    if on_result:
+                        await on_result(result)
+                    if checkpoint:
+                        checkpoint.done(lot_url)
                     print(f"[{time.strftime('%H:%M:%S')}] ✅ Успешно спарсено")
                 else:
+                    if on_failure:
+                        on_failure(lot_url, "No data extracted")
+                    if checkpoint:
+                        checkpoint.fail(lot_url, "No data extracted")
                     print(f"[{time.strftime('%H:%M:%S')}] ⚠️ Не удалось спарсить лот")
 
             except Exception as e:
+                if on_failure:
+                    on_failure(lot_url, str(e))
+                if checkpoint:
+                    checkpoint.fail(lot_url, str(e))
                 print(f"[{time.strftime('%H:%M:%S')}] ❌ Ошибка парсинга лота: {e}")
                 continue
 
@@ -260,40 +452,127 @@ class CatawikiCategoryScraper:
             if i < len(all_lot_urls):
                 await asyncio.sleep(3)
 
+        if checkpoint:
+            checkpoint.save()
+
         print("\n" + "=" * 70)
         print(f"✅ Парсинг категории завершен!")
         print(f"Всего лотов найдено: {len(all_lot_urls)}")
-        print(f"Успешно спарсено: {len(all_results)}")
-        print(f"Провалено: {len(all_lot_urls) - len(all_results)}")
+        print(f"Успешно спарсено: {successful}")
+        print(f"Провалено: {len(all_lot_urls) - successful}")
         print("=" * 70)
 
         return all_results
 
+    async def _distribute_lots(self, all_lot_urls: List[str],
+                               on_result: Optional[Callable[[Dict], Awaitable[None]]],
+                               on_failure: Optional[Callable[[str, str], None]],
+                               collect: bool, checkpoint: Optional[Checkpoint]) -> List[dict]:
+        """Отдать лоты воркерам (work_queue.py) и принять их результаты"""
+        name = checkpoint.job_id if checkpoint else (self.job_id or f"category_{int(time.time())}")
+        added = self.work_queue.put(name, all_lot_urls)
+        print(f"\n[{time.strftime('%H:%M:%S')}] 📤 {added} лотов в очереди '{name}', ждём воркеров...")
+        all_results = []
+
+        async def done(lot_url, result):
+            if collect:
+                all_results.append(result)
+            if on_result:
+                await on_result(result)
+            if checkpoint:
+                checkpoint.done(lot_url)
+
+        def failed(lot_url, error):
+            if on_failure:
+                on_failure(lot_url, error)
+            if checkpoint:
+                checkpoint.fail(lot_url, error)
+
+        await self.work_queue.wait_for(name, all_lot_urls, done, failed)
+        if checkpoint:
+            checkpoint.save()
+        print(f"[{time.strftime('%H:%M:%S')}] ✅ Воркеры закончили: {len(all_lot_urls)} лотов")
+        return all_results
+
 
 async def main():
     """Пример использования"""
     import sys
-    import json
+    from sinks import RunSinks
 
     if len(sys.argv) < 2:
-        print("Usage: python category_scraper.py <category_url> [max_pages]")
+        print("Usage: python category_scraper.py <category_url> [max_pages] [--skip-seen | --defer-seen | --rescrape] [--incremental] [--distributed]")
+        print("       python category_scraper.py --resume <job>")
         print("\nExample:")
         print('  python category_scraper.py "https://www.catawiki.com/en/s?q=burgundy&filters=..." 2')
+        print('  python category_scraper.py "https://www.catawiki.com/en/c/..." --incremental   # только новые лоты')
+        print("  python category_scraper.py --resume category_results_1731750000_3fa9c2")
         sys.exit(1)
 
-    category_url = sys.argv[1]
-    max_pages = int(sys.argv[2]) if len(sys.argv) > 2 else None
-
-    scraper = CatawikiCategoryScraper(headless=True)
-    results = await scraper.scrape_category(category_url, max_pages=max_pages)
-
-    # Сохранить результаты
-    if results:
-        output_file = f"category_results_{int(time.time())}.json"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
-
-        print(f"\n💾 Результаты сохранены в: {output_file}")
+    # Недавно спарсенные лоты: по умолчанию config.SEEN_POLICY
+    seen_policy = ('off' if '--rescrape' in sys.argv else 'skip' if '--skip-seen' in sys.argv
+                   else 'defer' if '--defer-seen' in sys.argv else config.SEEN_POLICY)
+    incremental = '--incremental' in sys.argv
+    distributed = '--distributed' in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg not in ('--rescrape', '--skip-seen', '--defer-seen', '--incremental', '--distributed')]
+
+    if args[0] == '--resume':
+        # Продолжить прерванный запуск: те же файлы, только необработанные лоты
+        checkpoint = Checkpoint.load(args[1]) if len(args) > 1 else None
+        if not checkpoint:
+            print("❌ Checkpoint not found (see: python checkpoint.py)")
+            sys.exit(1)
+        run_name = checkpoint.run_name
+        category_url = checkpoint.params['category_url']
+        max_pages = checkpoint.params.get('max_pages')
+        incremental = checkpoint.params.get('incremental', False)
+        distributed = checkpoint.params.get('distributed', distributed)
+        checkpoint.reconcile(f"output/{run_name}.ndjson")
+    else:
+        category_url = args[0]
+        max_pages = int(args[1]) if len(args) > 1 else None
+        run_name = f"category_results_{int(time.time())}_{secrets.token_hex(3)}"  # Unique even within one second
+        checkpoint = Checkpoint(run_name, 'category', params={'category_url': category_url, 'max_pages': max_pages,
+                                                              'incremental': incremental, 'distributed': distributed})
+
+    # Результаты пишутся на диск сразу после каждого лота
+    sinks = RunSinks('output', run_name, save_csv=True,
+                     meta={'category_url': category_url, 'max_pages': max_pages},
+                     resume=checkpoint.processed > 0 or checkpoint.last_page > 0)
+
+    async def on_result(result):
+        sinks.write(result)
+
+    # --distributed: лоты парсят воркеры (python work_queue.py work), результаты пишутся здесь
+    work_queue = None
+    if distributed:
+        from work_queue import WorkQueue
+        work_queue = WorkQueue.shared()
+    scraper = CatawikiCategoryScraper(headless=True, job_id=run_name, work_queue=work_queue)
+    try:
+        await scraper.scrape_category(category_url, max_pages=max_pages, on_result=on_result,
+                                      on_failure=sinks.fail, collect=False, checkpoint=checkpoint,
+                                      seen_policy=seen_policy, incremental=incremental)
+        if scraper.skipped:
+            sinks.summary.update(skipped=scraper.skipped)
+        sinks.close('completed')
+        if checkpoint.listing_done:
+            checkpoint.finish('completed')
+        else:
+            # Пагинацию остановила блокировка - остальные страницы соберёт --resume
+            checkpoint.finish('incomplete')
+            print(f"\n♻️  Листинг собран до страницы {checkpoint.last_page}, продолжить: "
+                  f"python category_scraper.py --resume {run_name}")
+    except BaseException:
+        # Checkpoint stays 'running' - continue with --resume
+        sinks.close('failed')
+        print(f"\n♻️  Продолжить: python category_scraper.py --resume {run_name}")
+        raise
+    finally:
+        await RemoteBrowsers.close_shared()  # Только отключиться - внешние браузеры продолжают работать
+
+    print(f"\n💾 Результаты сохранены в: {sinks.paths['ndjson']}")
+    print(f"📊 CSV: {sinks.paths['csv']}")
 
 
 if __name__ == "__main__":
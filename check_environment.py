@@ -131,6 +131,13 @@ def check_memory():
         print("\n💡 Chromium needs ~500MB RAM minimum")
         print("   If memory is low, use --single-process flag or add swap")
 
+        # What the runtime memory governor will start with (memory_governor.py)
+        from memory_governor import MemoryGovernor
+        governor = MemoryGovernor()
+        if governor.enabled:
+            print(f"   Memory governor: {governor.limit} browser(s) at once to start (max "
+                  f"{governor.max_concurrency}), adjusted while running")
+
     except Exception as e:
         print(f"⚠️  Could not check memory: {e}")
     print()
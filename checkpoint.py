@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Crawl checkpoints - resumable batch and category jobs
+
+One JSON file per job holds the frontier of lot URLs still to scrape, the
+completed and failed sets, the last category page whose URLs were
+collected and the job parameters. Progress since that snapshot goes to an
+append-only log next to it (<job_id>.log, one JSON line per finished lot,
+page or batch of new URLs), appended every few lots; the snapshot is
+rewritten atomically only every CHECKPOINT_COMPACT_EVERY log entries and
+at the end, so saving stays cheap on long crawls. After a crash the job
+continues where it stopped; lots written to the run's NDJSON after the
+last append are reconciled on resume, the rest are scraped again
+(at-least-once). A category crawl whose pagination was stopped by a block
+finishes as 'incomplete'; --resume collects the remaining pages.
+"""
+
+import sys
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Dict, List
+
+import config
+from lot_fields import lot_id_from_url
+from sinks import read_ndjson
+
+
+class Checkpoint:
+    """
+    Persisted crawl state of one job
+
+    Args:
+        job_id: Job id (API job id or CLI run name)
+        kind: 'batch' or 'category'
+        params: Arguments needed to restart the job
+        run_name: Name of the job's output files (resumed runs append to them)
+        origin: 'api' or 'cli' - api_server only resumes its own jobs
+    """
+
+    def __init__(self, job_id: str, kind: str, params: Optional[Dict] = None, run_name: Optional[str] = None,
+                 origin: str = 'cli', directory: str = config.CHECKPOINT_DIR, every: int = config.CHECKPOINT_EVERY,
+                 compact_every: int = config.CHECKPOINT_COMPACT_EVERY):
+        self.path = Path(directory) / f"{job_id}.json"
+        self.log_path = Path(directory) / f"{job_id}.log"
+        self.every = max(1, every)
+        self.compact_every = max(1, compact_every)
+        self._unsaved = 0
+        self._log: List[Dict] = []  # Entries not appended yet
+        self._logged = 0  # Entries in the log file since the last snapshot
+        self.state = {
+            'job_id': job_id,
+            'kind': kind,
+            'origin': origin,
+            'status': 'running',
+            'run_name': run_name or job_id,
+            'params': params or {},
+            'frontier': [],
+            'completed': [],
+            'failed': {},
+            'last_page': 0,
+            'listing_done': False,
+            'created_at': datetime.now().isoformat(),
+            'updated_at': None,
+        }
+        self._completed = set()
+        self._known = set()  # Frontier as a set
+        self._deferred: Optional[List[str]] = None
+
+    @classmethod
+    def load(cls, job_id: str, directory: str = config.CHECKPOINT_DIR) -> Optional['Checkpoint']:
+        path = Path(directory) / f"{job_id}.json"
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        checkpoint = cls(state['job_id'], state['kind'], directory=directory)
+        checkpoint.state.update(state)
+        checkpoint._completed = set(state['completed'])
+        checkpoint._known = set(state['frontier'])
+        checkpoint._replay()
+        return checkpoint
+
+    def _replay(self):
+        """Apply the log written since the snapshot (entries are idempotent: a crash between
+        snapshot and log removal just replays them again)"""
+        try:
+            with open(self.log_path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        end = data.rfind(b'\n') + 1
+        if end < len(data):
+            # Torn last line after a crash: cut it, or the next append would be glued to it
+            with open(self.log_path, 'r+b') as f:
+                f.truncate(end)
+        for line in data[:end].decode('utf-8').splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if 'done' in entry:
+                self._complete(entry['done'])
+            elif 'failed' in entry:
+                self.state['failed'][entry['failed']] = entry.get('error')
+            elif 'urls' in entry:
+                self._add(entry['urls'])
+            elif 'page' in entry:
+                self.state['last_page'] = max(self.state['last_page'], entry['page'])
+            elif 'listing_done' in entry:
+                self.state['listing_done'] = True
+            self._logged += 1
+        self.state['updated_at'] = datetime.fromtimestamp(self.log_path.stat().st_mtime).isoformat()
+
+    @classmethod
+    def unfinished(cls, origin: Optional[str] = None, directory: str = config.CHECKPOINT_DIR) -> List['Checkpoint']:
+        """Checkpoints of jobs that were still running when the process stopped"""
+        checkpoints = []
+        for path in sorted(Path(directory).glob('*.json')):
+            checkpoint = cls.load(path.stem, directory)
+            if checkpoint and checkpoint.status == 'running' and (origin is None or checkpoint.origin == origin):
+                checkpoints.append(checkpoint)
+        return checkpoints
+
+    @property
+    def job_id(self) -> str:
+        return self.state['job_id']
+
+    @property
+    def kind(self) -> str:
+        return self.state['kind']
+
+    @property
+    def origin(self) -> str:
+        return self.state['origin']
+
+    @property
+    def status(self) -> str:
+        return self.state['status']
+
+    @property
+    def run_name(self) -> str:
+        return self.state['run_name']
+
+    @property
+    def params(self) -> Dict:
+        return self.state['params']
+
+    @property
+    def last_page(self) -> int:
+        return self.state['last_page']
+
+    @property
+    def listing_done(self) -> bool:
+        return self.state['listing_done']
+
+    @property
+    def processed(self) -> int:
+        return len(self.state['completed']) + len(self.state['failed'])
+
+    def is_finished(self, url: str) -> bool:
+        return url in self._completed or url in self.state['failed']
+
+    def pending(self) -> List[str]:
+        """Frontier URLs not yet completed or failed, in discovery order"""
+        return [url for url in self.state['frontier'] if not self.is_finished(url)]
+
+    def add_urls(self, urls: List[str]):
+        added = self._add(urls)
+        if added:
+            self._log.append({'urls': added})
+
+    def _add(self, urls: List[str]) -> List[str]:
+        added = []
+        for url in urls:
+            if url not in self._known:
+                self._known.add(url)
+                self.state['frontier'].append(url)
+                added.append(url)
+        return added
+
+    def _complete(self, url: str):
+        if url not in self._completed:
+            self._completed.add(url)
+            self.state['completed'].append(url)
+
+    def reconcile(self, ndjson_path: str) -> int:
+        """
+        Mark lots already in the run's NDJSON output as done
+
+        Results written after the last checkpoint save would otherwise be
+        scraped (and written) a second time on resume.
+        """
+        if not Path(ndjson_path).exists():
+            return 0
+        written = {lot_id_from_url(record.get('url') or '') for record in read_ndjson(ndjson_path)}
+        written.discard(None)
+        marked = 0
+        for url in self.pending():
+            if lot_id_from_url(url) in written:
+                self._complete(url)
+                marked += 1
+        if marked:
+            self.save()
+        return marked
+
+    def page_done(self, page_num: int):
+        """Listing page collected - logged right away, a page costs a browser round trip"""
+        self.state['last_page'] = page_num
+        self._log.append({'page': page_num})
+        self.flush()
+
+    def listing_complete(self):
+        self.state['listing_done'] = True
+        self._log.append({'listing_done': True})
+        self.flush()
+
+    def done(self, url: str):
+        if self._deferred is not None:
+            self._deferred.append(url)
+            return
+        self._complete(url)
+        self._log.append({'done': url})
+        self._tick()
+
+    def defer(self):
+        """Hold done() marks until release() - for lots buffered before they reach the sinks"""
+        self._deferred = []
+
+    def release(self):
+        """Buffered lots were written (wine_rating.RatingBuffer on_flush)"""
+        deferred, self._deferred = self._deferred or [], []
+        for url in deferred:
+            self._complete(url)
+            self._log.append({'done': url})
+            self._tick()
+
+    def fail(self, url: str, error: Optional[str] = None):
+        self.state['failed'][url] = error
+        self._log.append({'failed': url, 'error': error})
+        self._tick()
+
+    def _tick(self):
+        self._unsaved += 1
+        if self._unsaved >= self.every:
+            self.flush()
+
+    def flush(self):
+        """Append pending progress to the log; rewrite the snapshot once the log is long"""
+        self._unsaved = 0
+        if not self._log:
+            return
+        if not self.path.exists():
+            self.save()  # The log is only read next to a snapshot
+            return
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in self._log))
+        self._logged += len(self._log)
+        self._log = []
+        if self._logged >= self.compact_every:
+            self.save()
+
+    def save(self):
+        """Rewrite the checkpoint atomically (temp file, then rename) and clear the log"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.state['updated_at'] = datetime.now().isoformat()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        if self.log_path.exists():
+            os.remove(self.log_path)
+        self._log, self._logged, self._unsaved = [], 0, 0
+
+    def finish(self, status: str = 'completed'):
+        self.state['status'] = status
+        self.save()
+
+
+def main():
+    directory = Path(config.CHECKPOINT_DIR)
+    paths = sorted(directory.glob('*.json'), key=lambda p: p.stat().st_mtime) if directory.exists() else []
+    if not paths:
+        print(f"No checkpoints in {directory}")
+        return
+
+    show_all = '--all' in sys.argv
+    for path in paths:
+        checkpoint = Checkpoint.load(path.stem)
+        if not checkpoint or (checkpoint.status not in ('running', 'incomplete') and not show_all):
+            continue
+        state = checkpoint.state
+        print(f"{state['job_id']:<40} {state['kind']:<9} {state['origin']:<4} {state['status']:<10} "
+              f"{len(state['completed'])} done, {len(state['failed'])} failed, {len(checkpoint.pending())} pending, "
+              f"page {state['last_page']}{' (listing done)' if state['listing_done'] else ''}  "
+              f"updated {state['updated_at']}")
+    print("\nResume: python batch_scraper_pro.py --resume <job> / python category_scraper.py --resume <job>")
+
+
+if __name__ == '__main__':
+    main()
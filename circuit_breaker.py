@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Block detection and circuit breakers per host and per proxy
+
+Block signals (403/429, Akamai challenge/"Access Denied" markers, a page
+without an h1) feed shared breakers. An empty h1 alone is often a slow
+render, so it only counts as a block after BREAKER_EMPTY_H1_THRESHOLD of
+them in a row. After BREAKER_HOST_THRESHOLD blocks in a row a host breaker
+opens and every worker pauses before launching a browser; per-proxy
+breakers open after the first block and the proxy pool routes around
+them. When the cooldown is over the breaker goes half-open and lets one
+probe request through: success closes it, another block re-opens it
+with a doubled cooldown.
+
+State is shared by all scrapers in the process, persisted in
+config.BREAKER_STATE_FILE (short CLI runs keep pausing) and shown in
+/health.
+"""
+
+import sys
+import asyncio
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict, List
+from urllib.parse import urlsplit
+
+import config
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+CHALLENGE_MARKERS = (
+    'access denied',
+    "you don't have permission to access",
+    'reference #',  # Akamai edge error page
+    'sec-if-cpt-container',  # Akamai bot manager challenge
+    '_sec/cp_challenge',
+    'please enable javascript',
+    'verify you are a human',
+    'are you a robot',
+)
+
+
+def detect_block(status: Optional[int] = None, html: Optional[str] = None,
+                 h1_text: Optional[str] = None) -> Optional[str]:
+    """
+    Block signal of a loaded page (None: looks like a normal page)
+
+    h1_text: text of the page's h1, '' when there is none (None: not checked)
+    """
+    if status in (403, 429):
+        return f"http_{status}"
+    if html:
+        lowered = html[:20000].lower()
+        for marker in CHALLENGE_MARKERS:
+            if marker in lowered:
+                return 'challenge'
+    if h1_text is not None and not h1_text.strip():
+        return 'empty_h1'
+    return None
+
+
+# Block signals that are also what a slow render looks like: counted separately
+SOFT_REASONS = ('empty_h1',)
+
+
+def is_soft_block(outcome: str, reason: Optional[str]) -> bool:
+    """A single empty-h1 'block' - not enough on its own to rotate a session or take out a proxy"""
+    return outcome == 'blocked' and reason in SOFT_REASONS
+
+
+def host_key(url: str) -> str:
+    return f"host:{urlsplit(url).hostname}"
+
+
+class CircuitBreaker:
+    """
+    closed -> (threshold blocks in a row) -> open -> (cooldown) -> half_open
+    half_open -> probe ok -> closed, probe blocked -> open (cooldown doubled)
+    """
+
+    def __init__(self, key: str, threshold: int, cooldown: float, max_cooldown: float):
+        self.key = key
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.consecutive_blocks = 0
+        self.consecutive_empty = 0  # Pages without an h1 in a row (see SOFT_REASONS)
+        self.opened_until = 0.0
+        self.opened = 0  # Times the breaker tripped
+        self.last_reason: Optional[str] = None
+        self.probing_since = 0.0
+
+    @property
+    def state(self) -> str:
+        if not self.opened_until:
+            return CLOSED
+        return OPEN if time.time() < self.opened_until else HALF_OPEN
+
+    def retry_in(self) -> float:
+        return max(0.0, self.opened_until - time.time())
+
+    def available(self) -> bool:
+        """Would allow() let a request through (no side effects)"""
+        state = self.state
+        return state == CLOSED or (state == HALF_OPEN and not self._probing())
+
+    def _probing(self) -> bool:
+        return bool(self.probing_since) and time.time() - self.probing_since < config.BREAKER_PROBE_TIMEOUT
+
+    def allow(self) -> bool:
+        """Let a request through; in half-open state only one probe at a time"""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == OPEN or self._probing():
+            return False
+        self.probing_since = time.time()
+        return True
+
+    def record(self, outcome: str, reason: Optional[str] = None) -> bool:
+        """
+        Feed a result: 'ok', 'blocked', 'error' or 'cancelled' (neither, ends a probe)
+
+        A 'blocked' with a soft reason (empty_h1) only counts once
+        BREAKER_EMPTY_H1_THRESHOLD of them came in a row.
+        Returns True when the state changed.
+        """
+        before = self.state
+        self.probing_since = 0.0
+        if is_soft_block(outcome, reason):
+            self.consecutive_empty += 1
+            if self.consecutive_empty < config.BREAKER_EMPTY_H1_THRESHOLD:
+                return False
+            self.consecutive_empty = 0
+        if outcome == 'ok':
+            self.consecutive_blocks = 0
+            self.consecutive_empty = 0
+            if before != CLOSED:
+                self.opened_until, self.cooldown = 0.0, self.base_cooldown
+                print(f"[{time.strftime('%H:%M:%S')}] ✅ Circuit {self.key} closed (probe succeeded)")
+        elif outcome == 'blocked':
+            self.consecutive_blocks += 1
+            self.last_reason = reason or 'blocked'
+            if before == HALF_OPEN:
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+                self._trip()
+            elif before == CLOSED and self.consecutive_blocks >= self.threshold:
+                self._trip()
+        return self.state != before
+
+    def _trip(self):
+        self.opened_until = time.time() + self.cooldown
+        self.opened += 1
+        print(f"[{time.strftime('%H:%M:%S')}] 🔌 Circuit {self.key} open for {self.cooldown:.0f}s "
+              f"({self.consecutive_blocks} blocks in a row, last: {self.last_reason})")
+
+    def to_dict(self) -> Dict:
+        return {key: getattr(self, key) for key in
+                ('cooldown', 'consecutive_blocks', 'consecutive_empty', 'opened_until', 'opened', 'last_reason')}
+
+    def summary(self) -> Dict:
+        return {
+            'key': self.key,
+            'state': self.state,
+            'retry_in_s': round(self.retry_in()),
+            'consecutive_blocks': self.consecutive_blocks,
+            'opened': self.opened,
+            'last_reason': self.last_reason,
+        }
+
+
+class Breakers:
+    """Registry of breakers, keyed 'host:<hostname>' or 'proxy:<name>'"""
+
+    _shared = None
+
+    def __init__(self, state_path: Optional[str] = config.BREAKER_STATE_FILE):
+        self.state_path = state_path
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self._saved: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        if state_path:
+            try:
+                with open(state_path, 'r', encoding='utf-8') as f:
+                    self._saved = json.load(f)
+            except (FileNotFoundError, ValueError):
+                pass
+
+    @classmethod
+    def shared(cls) -> 'Breakers':
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def get(self, key: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self.breakers.get(key)
+            if breaker is None:
+                if key.startswith('proxy:'):
+                    breaker = CircuitBreaker(key, config.BREAKER_PROXY_THRESHOLD, config.PROXY_QUARANTINE_SECONDS,
+                                             config.PROXY_QUARANTINE_MAX)
+                else:
+                    breaker = CircuitBreaker(key, config.BREAKER_HOST_THRESHOLD, config.BREAKER_HOST_COOLDOWN,
+                                             config.BREAKER_HOST_COOLDOWN_MAX)
+                for name, value in self._saved.get(key, {}).items():
+                    setattr(breaker, name, value)
+                self.breakers[key] = breaker
+            return breaker
+
+    async def admit(self, url: str):
+        """Wait until the URL's host breaker lets a request through (pauses all workers while open)"""
+        breaker = self.get(host_key(url))
+        announced = False
+        while not breaker.allow():
+            if not announced:
+                wait = f"pausing for {breaker.retry_in():.0f}s" if breaker.state == OPEN else "waiting for the probe"
+                print(f"[{time.strftime('%H:%M:%S')}] ⏸️  {breaker.key} is blocking us ({breaker.last_reason}), {wait}")
+                announced = True
+            await asyncio.sleep(min(max(breaker.retry_in(), config.BREAKER_POLL), config.BREAKER_POLL * 10))
+        if breaker.state == HALF_OPEN:
+            print(f"[{time.strftime('%H:%M:%S')}] 🔎 Probing {breaker.key} with a single request")
+
+    def record(self, key: str, outcome: str, reason: Optional[str] = None):
+        if self.get(key).record(outcome, reason):
+            self.save()
+
+    def save(self):
+        if not self.state_path:
+            return
+        with self._lock:
+            state = {**self._saved, **{key: b.to_dict() for key, b in self.breakers.items()}}
+        Path(self.state_path).parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def stats(self) -> List[Dict]:
+        for key in self._saved:
+            self.get(key)
+        return [breaker.summary() for breaker in self.breakers.values()]
+
+    def reset(self):
+        with self._lock:
+            self.breakers, self._saved = {}, {}
+        self.save()
+
+
+def main():
+    usage = (
+        "Usage:\n"
+        "  python circuit_breaker.py stats    # breaker state per host / proxy\n"
+        "  python circuit_breaker.py reset    # close all breakers"
+    )
+    if len(sys.argv) < 2:
+        print(usage)
+        sys.exit(1)
+
+    command = sys.argv[1]
+    breakers = Breakers.shared()
+    if command == 'stats':
+        entries = breakers.stats()
+        if not entries:
+            print("No breakers yet")
+        for entry in entries:
+            retry = f" retry in {entry['retry_in_s']}s" if entry['state'] == OPEN else ''
+            print(f"{entry['key']:<36} {entry['state']:<9}{retry}  opened {entry['opened']}x  "
+                  f"last: {entry['last_reason'] or '-'}")
+    elif command == 'reset':
+        breakers.reset()
+        print("✅ All breakers closed")
+    else:
+        print(usage)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Per-lot deadline budget
+
+One Deadline per lot: every stage (launch, goto, h1 wait, extraction...)
+takes its timeout from what is left of the budget instead of a fixed
+value, so a lot never runs longer than config.LOT_BUDGET_SECONDS. Stage
+durations are recorded; when the budget runs out the stage that was
+running is counted as the overrun (DeadlineStats, shown in /health).
+Each stage is also a tracing span.
+
+    deadline = Deadline(45, lot_id)
+    async with deadline.stage('goto'):
+        await page.goto(url, timeout=deadline.timeout_ms(20000))
+"""
+
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Optional, Dict
+
+import config
+from tracing import span
+
+
+class DeadlineExceeded(Exception):
+    """The lot's budget ran out; .stage is where"""
+
+    def __init__(self, stage: str, deadline: 'Deadline'):
+        super().__init__(f"Deadline of {deadline.budget:g}s exceeded in stage '{stage}' ({deadline.describe()})")
+        self.stage = stage
+
+
+class Deadline:
+    def __init__(self, budget: float = config.LOT_BUDGET_SECONDS, label: Optional[str] = None):
+        self.budget = budget
+        self.label = label
+        self.started = time.monotonic()
+        self.expires = self.started + budget
+        self.stages: Dict[str, float] = {}
+        self.current: Optional[str] = None
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def check(self):
+        if self.remaining() <= 0:
+            raise DeadlineExceeded(self.current or 'between stages', self)
+
+    def timeout_ms(self, cap_ms: Optional[float] = None) -> int:
+        """Playwright timeout for the next call: what is left, at most cap_ms"""
+        self.check()
+        remaining_ms = self.remaining() * 1000
+        return int(min(cap_ms, remaining_ms) if cap_ms else remaining_ms)
+
+    @asynccontextmanager
+    async def stage(self, name: str):
+        """Time a stage; Playwright/asyncio timeouts after the budget ran out become DeadlineExceeded"""
+        self.check()
+        previous, self.current = self.current, name
+        started = time.monotonic()
+        with span(name):
+            try:
+                yield self
+            except (asyncio.TimeoutError, TimeoutError) as e:
+                if self.remaining() <= 0:
+                    raise DeadlineExceeded(name, self) from e
+                raise
+            except Exception as e:
+                # Playwright's TimeoutError is not a builtin subclass
+                if type(e).__name__ == 'TimeoutError' and self.remaining() <= 0:
+                    raise DeadlineExceeded(name, self) from e
+                raise
+            finally:
+                self.stages[name] = self.stages.get(name, 0.0) + time.monotonic() - started
+                self.current = previous
+
+    async def run(self, name: str, awaitable):
+        """Await within the remaining budget (for stages without their own timeout)"""
+        async with self.stage(name):
+            try:
+                return await asyncio.wait_for(awaitable, timeout=self.remaining())
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded(name, self)
+
+    async def sleep(self, seconds: float):
+        """Sleep, but never past the deadline"""
+        await asyncio.sleep(min(seconds, self.remaining()))
+
+    def describe(self) -> str:
+        return ', '.join(f"{name} {seconds:.1f}s" for name, seconds in self.stages.items()) or 'no stages'
+
+    def report(self) -> Dict:
+        return {
+            'budget_s': self.budget,
+            'elapsed_s': round(self.elapsed(), 2),
+            'stages': {name: round(seconds, 2) for name, seconds in self.stages.items()},
+        }
+
+
+class DeadlineStats:
+    """Process-wide counts of lots that ran out of budget, per stage"""
+
+    _shared = None
+
+    def __init__(self):
+        self.lots = 0
+        self.overruns: Dict[str, int] = {}
+        self.stage_seconds: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls) -> 'DeadlineStats':
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def record(self, deadline: Deadline, overrun_stage: Optional[str] = None):
+        with self._lock:
+            self.lots += 1
+            for name, seconds in deadline.stages.items():
+                self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+            if overrun_stage:
+                self.overruns[overrun_stage] = self.overruns.get(overrun_stage, 0) + 1
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {
+                'lots': self.lots,
+                'overruns': dict(self.overruns),
+                'avg_stage_s': {name: round(total / self.lots, 2) for name, total in self.stage_seconds.items()}
+                if self.lots else {},
+            }
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Sampled, content-addressed debug artifact store
+
+Screenshots and page HTML are captured only for failed lots or a
+configurable sample of successful ones, stored compressed under
+{root}/{job_id}/{lot_id}/{kind}-{sha256}.{ext}, and the oldest files are
+evicted once the store grows past its size budget.
+"""
+
+import sys
+import gzip
+import hashlib
+import os
+import random
+import re
+import time
+from pathlib import Path
+from typing import Optional, Dict, List
+
+import config
+
+
+def _safe(part: Optional[str], default: str) -> str:
+    # Path components come from job ids / lot ids (and API paths) - keep them filesystem-safe,
+    # '.' and '..' would leave the directory
+    safe = re.sub(r'[^A-Za-z0-9_.-]', '_', part)[:80] if part else ''
+    return default if not safe.strip('.') else safe
+
+
+class ArtifactStore:
+    def __init__(self, root: str = config.DEBUG_ARTIFACTS_DIR,
+                 sample_rate: float = config.DEBUG_SAMPLE_RATE,
+                 max_bytes: int = config.DEBUG_MAX_BYTES):
+        self.root = Path(root)
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self._size = None
+
+    def should_capture(self, failed: bool) -> bool:
+        """Always on failure, otherwise for `sample_rate` of lots"""
+        return failed or random.random() < self.sample_rate
+
+    async def capture(self, page, lot_id: Optional[str], job_id: Optional[str] = None,
+                      reason: str = 'sample') -> List[str]:
+        """Save a screenshot and the page HTML; returns stored paths (never raises)"""
+        stored = []
+        try:
+            screenshot = await page.screenshot(type='jpeg', quality=config.DEBUG_SCREENSHOT_QUALITY,
+                                               full_page=config.DEBUG_FULL_PAGE)
+            stored.append(self.put(screenshot, 'jpg', lot_id, job_id, f"{reason}-screenshot"))
+        except Exception as e:
+            print(f"[{time.strftime('%H:%M:%S')}] ⚠️  Screenshot failed: {e}")
+
+        try:
+            html = await page.content()
+            stored.append(self.put(html.encode('utf-8'), 'html', lot_id, job_id, f"{reason}-page"))
+        except Exception as e:
+            print(f"[{time.strftime('%H:%M:%S')}] ⚠️  HTML capture failed: {e}")
+
+        if stored:
+            print(f"[{time.strftime('%H:%M:%S')}] 📸 Debug artifacts ({reason}): {self.lot_dir(job_id, lot_id)}")
+        return stored
+
+    def lot_dir(self, job_id: Optional[str], lot_id: Optional[str]) -> Path:
+        return self.root / _safe(job_id, 'nojob') / _safe(lot_id, 'unknown')
+
+    def put(self, content: bytes, ext: str, lot_id: Optional[str], job_id: Optional[str], kind: str) -> str:
+        """Store content once per hash; text formats are gzip-compressed"""
+        digest = hashlib.sha256(content).hexdigest()[:16]
+        if ext != 'jpg':
+            content = gzip.compress(content, compresslevel=6)
+            ext = f"{ext}.gz"
+
+        directory = self.lot_dir(job_id, lot_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{_safe(kind, 'artifact')}-{digest}.{ext}"
+        if not path.exists():
+            tmp_path = path.with_suffix(path.suffix + '.tmp')
+            tmp_path.write_bytes(content)
+            os.replace(tmp_path, path)
+            self._grow(len(content))
+        return str(path)
+
+    def _files(self) -> List[Path]:
+        if not self.root.exists():
+            return []
+        return [p for p in self.root.rglob('*') if p.is_file() and not p.name.endswith('.tmp')]
+
+    def _grow(self, added: int):
+        if self._size is None:
+            self._size = sum(p.stat().st_size for p in self._files())
+        else:
+            self._size += added
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Delete oldest artifacts until the store is at 80% of its budget"""
+        files = sorted(self._files(), key=lambda p: p.stat().st_mtime)
+        size = sum(p.stat().st_size for p in files)
+        target = self.max_bytes * 0.8
+        removed = 0
+        for path in files:
+            if size <= target:
+                break
+            size -= path.stat().st_size
+            path.unlink(missing_ok=True)
+            removed += 1
+            # Drop empty lot/job directories
+            for parent in (path.parent, path.parent.parent):
+                try:
+                    parent.rmdir()
+                except OSError:
+                    break
+        self._size = size
+        if removed:
+            print(f"[{time.strftime('%H:%M:%S')}] 🧹 Evicted {removed} debug artifacts")
+
+    def list(self, job_id: str, lot_id: Optional[str] = None) -> Dict[str, List[str]]:
+        """Artifact file names per lot for a job (or for one lot)"""
+        job_dir = self.root / _safe(job_id, 'nojob')
+        if not job_dir.exists():
+            return {}
+        lot_dirs = [job_dir / _safe(lot_id, 'unknown')] if lot_id else [d for d in job_dir.iterdir() if d.is_dir()]
+        return {
+            d.name: sorted(p.name for p in d.iterdir() if p.is_file() and not p.name.endswith('.tmp'))
+            for d in lot_dirs if d.exists()
+        }
+
+    def path(self, job_id: str, lot_id: str, name: str) -> Optional[Path]:
+        """Resolve a stored artifact (None if missing or outside the store)"""
+        if not all(part and part.strip('.') for part in (job_id, lot_id, name)):
+            return None
+        lot_dir = self.lot_dir(job_id, lot_id)
+        if name not in self.list(job_id, lot_id).get(lot_dir.name, []):
+            return None
+        path = (lot_dir / name).resolve()
+        if not path.is_relative_to(self.root.resolve()) or not path.is_file():
+            return None
+        return path
+
+    @staticmethod
+    def read(path: Path) -> bytes:
+        """Artifact content, decompressed"""
+        data = path.read_bytes()
+        return gzip.decompress(data) if path.name.endswith('.gz') else data
+
+
+_shared = None
+
+
+def shared_store() -> ArtifactStore:
+    """Process-wide store used by the scrapers"""
+    global _shared
+    if _shared is None:
+        _shared = ArtifactStore()
+    return _shared
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ('list', 'show'):
+        print("Usage:")
+        print("  python debug_artifacts.py list <job_id> [lot_id]")
+        print("  python debug_artifacts.py show <job_id> <lot_id> <name> > page.html")
+        sys.exit(1)
+
+    store = ArtifactStore()
+    if sys.argv[1] == 'list':
+        lot_id = sys.argv[3] if len(sys.argv) > 3 else None
+        for lot, names in store.list(sys.argv[2], lot_id).items():
+            print(f"📦 {lot}")
+            for name in names:
+                print(f"   {name}")
+    else:
+        if len(sys.argv) < 5:
+            print("show needs <job_id> <lot_id> <name>")
+            sys.exit(1)
+        path = store.path(sys.argv[2], sys.argv[3], sys.argv[4])
+        if not path:
+            print("Artifact not found", file=sys.stderr)
+            sys.exit(1)
+        sys.stdout.buffer.write(ArtifactStore.read(path))
+
+
+if __name__ == '__main__':
+    main()
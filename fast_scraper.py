@@ -12,11 +12,16 @@ from playwright.async_api import async_playwright, TimeoutError as PlaywrightTim
 from typing import Optional, Dict
 import re
 
+from debug_artifacts import shared_store
+from lot_fields import lot_id_from_url
+from readiness import wait_lot_ready
+
 
 class FastCatawikiScraper:
     def __init__(self, headless: bool = True, proxy: Optional[str] = None):
         self.headless = headless
         self.proxy = proxy
+        self.artifacts = shared_store()
 
     async def scrape_listing(self, url: str) -> Optional[Dict]:
         """Scrape Catawiki listing with faster timeouts"""
@@ -99,19 +104,17 @@ class FastCatawikiScraper:
                 except PlaywrightTimeout:
                     print(f"[{time.strftime('%H:%M:%S')}] ⚠️  Title element not found, continuing...")
 
-                # Small delay
-                await asyncio.sleep(2)
+                # Price and bidding counter rendered
+                await wait_lot_ready(page)
 
                 # Extract data
                 print(f"[{time.strftime('%H:%M:%S')}] 📊 Extracting data...")
                 data = await self._extract_data(page)
 
                 # Save debug info
-                try:
-                    await page.screenshot(path='debug_screenshot.png')
-                    print(f"[{time.strftime('%H:%M:%S')}] 📸 Screenshot saved")
-                except Exception as e:
-                    print(f"[{time.strftime('%H:%M:%S')}] ⚠️  Screenshot failed: {e}")
+                failed = not data.get('title')
+                if self.artifacts.should_capture(failed):
+                    await self.artifacts.capture(page, lot_id_from_url(url), reason='failed' if failed else 'sample')
 
                 await browser.close()
                 print(f"[{time.strftime('%H:%M:%S')}] ✓ Browser closed")
@@ -241,16 +244,6 @@ class FastCatawikiScraper:
                 data['current_price'] = price_match.group(0).strip()
                 print(f"[{time.strftime('%H:%M:%S')}] ✓ Price (regex): {data['current_price']}")
 
-        # Save HTML for debugging if extraction failed
-        if not data['title']:
-            try:
-                html = await page.content()
-                with open('debug_page.html', 'w', encoding='utf-8') as f:
-                    f.write(html)
-                print(f"[{time.strftime('%H:%M:%S')}] 💾 Saved HTML to debug_page.html")
-            except:
-                pass
-
         return data
 
 
@@ -296,7 +289,7 @@ async def main():
         print("❌ FAILED - Could not scrape data")
         print("=" * 70)
         print("\nTroubleshooting:")
-        print("1. Check debug_screenshot.png and debug_page.html")
+        print("1. Check debug artifacts: python debug_artifacts.py list nojob")
         print("2. Try running without --headless to see what happens")
         print("3. Check if Akamai is blocking (403 error)")
         print("4. Ensure all dependencies are installed:")
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test against the local mock (mock_server.py)
+
+Runs a real target - batch_scraper_pro.py, category_scraper.py or the API
+server - as a subprocess in its own run directory under config.LOADTEST_DIR.
+All state paths in config are relative, so the target's breakers, sessions,
+seen index, lot store and traces stay in the run directory, and only the
+mock is hit. Reported:
+    lots/minute (successful lots over wall time)
+    per-lot p50/p95/p99 (the target's scrape_listing spans)
+    peak RSS of the target's process tree: Python, Playwright driver, Chromium
+    error rates per outcome and reason
+The report is also saved as report.json in the run directory, the target's
+output as target.log.
+
+Usage:
+    python load_test.py batch [--lots 20]
+    python load_test.py category [--pages 2] [--lots-per-page 24]
+    python load_test.py api [--lots 20] [--concurrency 2]
+    python load_test.py api --endpoint category [--pages 2]
+
+Mock options: [--latency-ms 200] [--jitter-ms latency/2] [--block-rate 0.05] [--render-delay-ms 300]
+"""
+
+import sys
+import asyncio
+import json
+import os
+import subprocess
+import threading
+import time
+import urllib.request
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Dict, List
+
+import config
+from mock_server import MockCatawiki, start_in_thread
+from memory_governor import process_tree, rss_mb, process_kind, cmdline
+from tracing import read_spans, LOT_SPAN
+
+REPO_DIR = Path(__file__).resolve().parent
+
+
+class MemorySampler:
+    """Samples RSS of a process tree in a thread; keeps the peaks"""
+
+    def __init__(self, root_pid: int, interval: float = config.LOADTEST_SAMPLE_INTERVAL):
+        self.root_pid = root_pid
+        self.interval = interval
+        self.peak_total = 0.0
+        self.peak_by_kind: Dict[str, float] = {}
+        self.at_peak: Dict[str, float] = {}  # Breakdown of the sample with the highest total
+        self.peak_browsers = 0
+        self.current = 0.0
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='memory-sampler', daemon=True)
+
+    def start(self) -> 'MemorySampler':
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def sample(self):
+        by_kind: Dict[str, float] = {}
+        browsers = 0
+        for pid, name in process_tree(self.root_pid).items():
+            kind = process_kind(pid, name, self.root_pid)
+            by_kind[kind] = by_kind.get(kind, 0.0) + rss_mb(pid)
+            # One browser = one main process (its renderers/helpers have --type=)
+            if kind == 'chromium' and '--type=' not in cmdline(pid):
+                browsers += 1
+        self.current = sum(by_kind.values())
+        self.samples += 1
+        if self.current > self.peak_total:
+            self.peak_total, self.at_peak = self.current, by_kind
+        for kind, value in by_kind.items():
+            self.peak_by_kind[kind] = max(self.peak_by_kind.get(kind, 0.0), value)
+        self.peak_browsers = max(self.peak_browsers, browsers)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.sample()
+            self._stop.wait(self.interval)
+
+    def summary(self) -> Dict:
+        return {
+            'peak_total_mb': round(self.peak_total),
+            'at_peak_mb': {kind: round(value) for kind, value in self.at_peak.items()},
+            'peak_by_kind_mb': {kind: round(value) for kind, value in self.peak_by_kind.items()},
+            'peak_browsers': self.peak_browsers,
+            'samples': self.samples,
+        }
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def http_json(method: str, url: str, payload: Optional[Dict] = None, timeout: float = 300) -> Dict:
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    request = urllib.request.Request(url, data=data, method=method, headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+class LoadTest:
+    def __init__(self, mode: str, mock: MockCatawiki, lots: int = 20, pages: int = 2, concurrency: int = 2,
+                 endpoint: str = 'scrape', mock_port: int = config.LOADTEST_MOCK_PORT,
+                 api_port: int = config.LOADTEST_API_PORT):
+        self.mode = mode
+        self.mock = mock
+        self.lots = lots
+        self.pages = pages
+        self.concurrency = concurrency
+        self.endpoint = endpoint
+        self.origin = f"http://127.0.0.1:{mock_port}"
+        self.mock_port = mock_port
+        self.api_url = f"http://127.0.0.1:{api_port}"
+        self.api_port = api_port
+        self.run_dir = Path(config.LOADTEST_DIR).resolve() / f"{mode}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        self.client_errors: Counter = Counter()
+
+    @property
+    def category_url(self) -> str:
+        return f"{self.origin}/en/c/333-wine"
+
+    def env(self) -> Dict[str, str]:
+        """Target environment: mock only (no proxies, warm-up on the mock), tracing on"""
+        pythonpath = os.pathsep.join(filter(None, [str(REPO_DIR), os.environ.get('PYTHONPATH')]))
+        return {**os.environ, 'PYTHONPATH': pythonpath, 'PYTHONUNBUFFERED': '1', 'TRACING': '1',
+                'TRACE_FORMAT': 'jsonl', 'PROXIES': '', 'PROXY_FILE': '', 'SESSION_WARM_URL': f"{self.origin}/en/"}
+
+    def command(self) -> List[str]:
+        if self.mode == 'batch':
+            urls_file = self.run_dir / 'urls.txt'
+            urls_file.write_text('\n'.join(self.mock.all_lot_urls(self.origin, self.lots)) + '\n', encoding='utf-8')
+            return [sys.executable, str(REPO_DIR / 'batch_scraper_pro.py'), str(urls_file),
+                    '--headless', '--no-csv', '--rescrape']
+        if self.mode == 'category':
+            return [sys.executable, str(REPO_DIR / 'category_scraper.py'), self.category_url, str(self.pages),
+                    '--rescrape']
+        return [sys.executable, '-m', 'uvicorn', 'api_server:app', '--host', '127.0.0.1', '--port', str(self.api_port)]
+
+    async def drive_api(self, process: subprocess.Popen):
+        """Wait for the API to come up, then send the load"""
+        for _ in range(60):
+            if process.poll() is not None:
+                raise RuntimeError(f"api_server exited with {process.returncode} (see {self.run_dir / 'target.log'})")
+            try:
+                await asyncio.to_thread(http_json, 'GET', f"{self.api_url}/health", None, 5)
+                break
+            except OSError:
+                await asyncio.sleep(1)
+        else:
+            raise RuntimeError("api_server did not answer /health within 60s")
+
+        if self.endpoint == 'category':
+            response = await asyncio.to_thread(http_json, 'POST', f"{self.api_url}/scrape-category", {
+                'category_url': self.category_url, 'max_pages': self.pages, 'save_csv': False,
+                'include_results': False, 'seen_policy': 'off'})
+            job_id = response['job_id']
+            print(f"[{time.strftime('%H:%M:%S')}] 📤 Category job {job_id}")
+            while True:
+                await asyncio.sleep(2)
+                job = await asyncio.to_thread(http_json, 'GET', f"{self.api_url}/job/{job_id}")
+                if job['status'] in ('completed', 'failed'):
+                    if job['status'] == 'failed':
+                        self.client_errors[f"job_failed: {job.get('error')}"[:120]] += 1
+                    return
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def one(url: str):
+            async with semaphore:
+                try:
+                    response = await asyncio.to_thread(http_json, 'POST', f"{self.api_url}/scrape",
+                                                       {'url': url, 'headless': True})
+                    if not response.get('success'):
+                        self.client_errors['no_data'] += 1
+                except Exception as e:
+                    self.client_errors[f"http: {type(e).__name__}"] += 1
+
+        await asyncio.gather(*(one(url) for url in self.mock.all_lot_urls(self.origin, self.lots)))
+
+    def run(self) -> Dict:
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        server = start_in_thread(self.mock, self.mock_port)
+        print(f"[{time.strftime('%H:%M:%S')}] 🧪 Mock on {self.origin}, run directory {self.run_dir}")
+
+        started_ns = time.time_ns()
+        started = time.monotonic()
+        log = open(self.run_dir / 'target.log', 'w', encoding='utf-8')
+        process = subprocess.Popen(self.command(), cwd=self.run_dir, env=self.env(), stdout=log,
+                                   stderr=subprocess.STDOUT)
+        sampler = MemorySampler(process.pid).start()
+        print(f"[{time.strftime('%H:%M:%S')}] 🚀 {self.mode} target started (pid {process.pid})")
+
+        try:
+            if self.mode == 'api':
+                asyncio.run(self.drive_api(process))
+            else:
+                while process.poll() is None:
+                    try:
+                        process.wait(timeout=15)
+                    except subprocess.TimeoutExpired:
+                        print(f"[{time.strftime('%H:%M:%S')}] ⏳ {time.monotonic() - started:.0f}s, "
+                              f"{sampler.current:.0f} MB, {sum(self.mock.stats()['requests'].values())} mock requests")
+                if process.returncode:
+                    self.client_errors[f"exit_code_{process.returncode}"] += 1
+        finally:
+            wall = time.monotonic() - started
+            if process.poll() is None:
+                process.terminate()
+                try:
+                    process.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+            sampler.stop()
+            log.close()
+            server.shutdown()
+
+        report = self.report(wall, started_ns, sampler)
+        with open(self.run_dir / 'report.json', 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        return report
+
+    def report(self, wall: float, started_ns: int, sampler: MemorySampler) -> Dict:
+        trace_path = self.run_dir / config.TRACE_FILE
+        spans = read_spans(str(trace_path)) if trace_path.exists() else []
+        lots = [s for s in spans if s['name'] == LOT_SPAN and s['start_ns'] >= started_ns]
+        durations = [s['duration_ms'] / 1000 for s in lots]
+        outcomes = Counter(s['attrs'].get('outcome', 'ok') for s in lots)
+        reasons = Counter((s['attrs'].get('reason') or 'unknown').splitlines()[0][:80]
+                          for s in lots if s['attrs'].get('outcome') != 'ok')
+        ok = outcomes.get('ok', 0)
+        return {
+            'mode': self.mode if self.mode != 'api' else f"api/{self.endpoint}",
+            'mock': {'latency_ms': self.mock.latency_ms, 'jitter_ms': self.mock.jitter_ms,
+                     'block_rate': self.mock.block_rate, 'render_delay_ms': self.mock.render_delay_ms,
+                     **self.mock.stats()},
+            'concurrency': self.concurrency if self.mode == 'api' and self.endpoint == 'scrape' else 1,
+            'wall_s': round(wall, 1),
+            'lots': len(lots),
+            'outcomes': dict(outcomes),
+            'lots_per_minute': round(ok / (wall / 60), 2) if wall else 0.0,
+            'per_lot_s': {f"p{int(q * 100)}": round(percentile(durations, q), 2) if durations else None
+                          for q in (0.5, 0.95, 0.99)},
+            'error_rate': round(1 - ok / len(lots), 4) if lots else None,
+            'error_reasons': dict(reasons.most_common(10)),
+            'client_errors': dict(self.client_errors),
+            'memory': sampler.summary(),
+            'run_dir': str(self.run_dir),
+        }
+
+
+def print_report(report: Dict):
+    mock, memory, per_lot = report['mock'], report['memory'], report['per_lot_s']
+    at_peak = memory['at_peak_mb']
+    print(f"\n{'='*70}")
+    print(f"📊 LOAD TEST: {report['mode']} (concurrency {report['concurrency']})")
+    print(f"{'='*70}")
+    print(f"Mock:        {mock['latency_ms']:.0f}±{mock['jitter_ms']:.0f}ms latency, {mock['block_rate']:.0%} 403s, "
+          f"{sum(mock['requests'].values())} requests ({mock['blocked']} blocked)")
+    print(f"Wall time:   {report['wall_s']}s")
+    print(f"Lots:        {report['lots']} " + ' '.join(f"{k}={v}" for k, v in report['outcomes'].items()))
+    print(f"Throughput:  {report['lots_per_minute']} lots/min")
+    if per_lot['p50'] is not None:
+        print(f"Per lot:     p50 {per_lot['p50']}s  p95 {per_lot['p95']}s  p99 {per_lot['p99']}s")
+    if report['error_rate'] is not None:
+        print(f"Error rate:  {report['error_rate']:.1%}" +
+              (f"  ({', '.join(f'{k}: {v}' for k, v in report['error_reasons'].items())})"
+               if report['error_reasons'] else ''))
+    if report['client_errors']:
+        print(f"Client:      {report['client_errors']}")
+    print(f"Peak RSS:    {memory['peak_total_mb']} MB = " +
+          ' + '.join(f"{kind} {mb}" for kind, mb in sorted(at_peak.items(), key=lambda item: -item[1])) +
+          f"  (max {memory['peak_browsers']} browsers at once)")
+    print(f"Report:      {report['run_dir']}/report.json")
+    print(f"{'='*70}\n")
+
+
+def main():
+    modes = ('batch', 'category', 'api')
+    if len(sys.argv) < 2 or sys.argv[1] not in modes:
+        print(__doc__.split('Usage:')[1].rstrip())
+        sys.exit(1)
+
+    def option(name: str, default):
+        if name in sys.argv and sys.argv.index(name) + 1 < len(sys.argv):
+            return type(default)(sys.argv[sys.argv.index(name) + 1])
+        return default
+
+    mode = sys.argv[1]
+    pages = option('--pages', 2)
+    latency = option('--latency-ms', 200.0)
+    mock = MockCatawiki(pages=max(pages, 5), lots_per_page=option('--lots-per-page', 24),
+                        latency_ms=latency, jitter_ms=option('--jitter-ms', latency / 2),
+                        block_rate=option('--block-rate', 0.0), render_delay_ms=option('--render-delay-ms', 300))
+    endpoint = option('--endpoint', 'scrape')
+    if endpoint not in ('scrape', 'category'):
+        print("--endpoint must be 'scrape' or 'category'")
+        sys.exit(1)
+    test = LoadTest(mode, mock, lots=option('--lots', 20), pages=pages, concurrency=option('--concurrency', 2),
+                    endpoint=endpoint, mock_port=option('--port', config.LOADTEST_MOCK_PORT),
+                    api_port=option('--api-port', config.LOADTEST_API_PORT))
+    print_report(test.run())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+Typed lot record
+
+Scrapers fill plain dicts with display strings while extracting; Lot is
+the compact, parsed form that results are held in (price in cents +
+currency, int bottle count, datetime end, tuple of image URLs, interned
+seller and currency). CSV, JSON and Sheets formatting happens at the
+sink via to_dict(); see benchmark_lot_memory.py for the numbers.
+
+Display strings the parsed form can't reproduce ('€ 1,250', an end date
+like 'Closes Sunday 21:00') are kept as they came in `raw`, so
+from_scraped(data).to_dict() gives them back unchanged.
+"""
+
+import sys
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional, Dict
+
+from lot_fields import (
+    CURRENCY_SYMBOLS, lot_id_from_url, unwrap_formula, parse_price, parse_shipping, parse_bottles,
+    parse_rating, parse_datetime, parse_end_date,
+)
+from wine_rating import RATING_FIELDS
+
+
+_SYMBOLS = {code: symbol for symbol, code in CURRENCY_SYMBOLS.items()}
+
+# Display fields to_dict() re-renders from parsed values
+RAW_FIELDS = ('current_price', 'shipping_cost', 'end_date')
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    # Sellers and currencies repeat across thousands of lots. Image URLs are
+    # unique per lot, interning them would only grow the interned-string table
+    return sys.intern(value) if value else None
+
+
+def _naive(value: Optional[datetime]) -> Optional[datetime]:
+    # Zone-less local time, like scraper_pro's end_date
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone().replace(tzinfo=None)
+    return value
+
+
+class Lot:
+    """One scraped lot with parsed field values"""
+
+    __slots__ = (
+        'lot_id', 'url', 'title', 'seller_name', 'bottles_count', 'price_cents', 'currency',
+        'shipping_cost', 'end_date', 'images', 'scraped_at', 'raw',
+    ) + tuple(RATING_FIELDS)
+
+    def __init__(self, url: str, title: Optional[str] = None, seller_name: Optional[str] = None,
+                 bottles_count: Optional[int] = None, price: Optional[Decimal] = None,
+                 currency: Optional[str] = None, shipping_cost: Optional[float] = None,
+                 end_date: Optional[datetime] = None, images: tuple = (),
+                 scraped_at: Optional[datetime] = None, **ratings):
+        lot_id = lot_id_from_url(url)
+        self.lot_id = int(lot_id) if lot_id else None
+        self.url = url
+        self.title = title
+        self.seller_name = _intern(seller_name)
+        self.bottles_count = bottles_count
+        # Whole cents: a small int instead of a Decimal object per lot
+        self.price_cents = int((price * 100).to_integral_value()) if price is not None else None
+        self.currency = _intern(currency)
+        self.shipping_cost = shipping_cost
+        self.end_date = end_date
+        self.images = tuple(images)
+        self.scraped_at = scraped_at
+        self.raw: Optional[Dict[str, str]] = None  # Only for lots with unusual display strings
+        for field in RATING_FIELDS:
+            setattr(self, field, ratings.get(field))
+
+    @classmethod
+    def from_scraped(cls, data: Dict) -> 'Lot':
+        """Parse a scraper result dict (raw, re-imported CSV or Sheets-formatted)"""
+        scraped_at = _naive(parse_datetime(data.get('scraped_at')))
+        price, currency = parse_price(data.get('current_price'))
+
+        images = data.get('images')
+        if not isinstance(images, (list, tuple)):
+            # Re-imported CSVs only have the first image formula
+            first = unwrap_formula(data.get('first_image') or '')
+            images = [first] if first else []
+
+        lot = cls(
+            url=unwrap_formula(data.get('url') or ''),
+            title=data.get('title') or None,
+            seller_name=data.get('seller_name') or data.get('seller') or None,
+            bottles_count=parse_bottles(data.get('bottles_count')),
+            price=price,
+            currency=currency,
+            shipping_cost=parse_shipping(data.get('shipping_cost')),
+            end_date=_naive(parse_end_date(data.get('end_date'), reference=scraped_at)),
+            images=tuple(images),
+            scraped_at=scraped_at,
+            **{field: parse_rating(data.get(field)) for field in RATING_FIELDS},
+        )
+        rendered = lot._display()
+        raw = {field: data[field] for field in RAW_FIELDS
+               if isinstance(data.get(field), str) and data[field] and data[field] != rendered[field]}
+        lot.raw = raw or None
+        return lot
+
+    @property
+    def price(self) -> Optional[Decimal]:
+        if self.price_cents is None:
+            return None
+        if self.price_cents % 100 == 0:
+            return Decimal(self.price_cents // 100)
+        return Decimal(self.price_cents).scaleb(-2)
+
+    @property
+    def display_price(self) -> Optional[str]:
+        """'€1,250' - the format scraper_pro extracts"""
+        if self.price is None:
+            return None
+        symbol = _SYMBOLS.get(self.currency)
+        if symbol:
+            return f"{symbol}{self.price:,}"
+        return f"{self.price:,} {self.currency}" if self.currency else f"{self.price:,}"
+
+    def _display(self) -> Dict:
+        """RAW_FIELDS as rendered from the parsed values"""
+        return {
+            'current_price': self.display_price,
+            'shipping_cost': f"{self.shipping_cost:g}" if self.shipping_cost is not None else None,
+            'end_date': self.end_date.strftime('%Y-%m-%d %H:%M:%S') if self.end_date else None,
+        }
+
+    def to_dict(self) -> Dict:
+        """Scraper-shaped dict (what NDJSON, CSV and Sheets formatting in sinks.py expect)"""
+        display = {**self._display(), **(self.raw or {})}
+        data = {
+            'title': self.title,
+            'images': list(self.images),
+            'bottles_count': self.bottles_count,
+            'seller_name': self.seller_name,
+            'current_price': display['current_price'],
+            'shipping_cost': display['shipping_cost'],
+            'end_date': display['end_date'],
+            'url': self.url,
+            'scraped_at': self.scraped_at.isoformat() if self.scraped_at else None,
+        }
+        for field in RATING_FIELDS:
+            value = getattr(self, field)
+            if value is not None:
+                data[field] = f"{value}/10"
+        return data
+
+    def __repr__(self) -> str:
+        return f"Lot({self.lot_id}, {self.title!r}, {self.display_price})"
@@ -0,0 +1,160 @@
+"""
+Helpers for parsing scraped lot fields
+
+Scrapers keep fields as display strings ("€1,250", "35", "1 day 23 hours",
+"=HYPERLINK(...)"); these functions turn them into typed values.
+"""
+
+import re
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Optional, Tuple
+
+
+CURRENCY_SYMBOLS = {
+    '€': 'EUR',
+    '$': 'USD',
+    '£': 'GBP',
+}
+
+
+def lot_id_from_url(url: str) -> Optional[str]:
+    """Numeric Catawiki lot id from a lot URL ('.../en/l/98998534-slug' -> '98998534')"""
+    if not url:
+        return None
+    match = re.search(r'/l/(\d+)', unwrap_formula(url))
+    return match.group(1) if match else None
+
+
+def unwrap_formula(value: str) -> str:
+    """First quoted argument of a Sheets formula ('=HYPERLINK("url"; "🔗 View")' -> 'url')"""
+    if value and value.startswith('='):
+        match = re.search(r'"([^"]*)"', value)
+        if match:
+            return match.group(1)
+    return value
+
+
+def _to_decimal(number: str) -> Optional[Decimal]:
+    # Thousands separators: "1,250" / "1.250" / "1 250"; decimals: "1,250.50" / "12,50"
+    number = number.replace(' ', '').replace('\xa0', '')
+    if re.fullmatch(r'\d{1,3}(?:[.,]\d{3})+', number):
+        number = re.sub(r'[.,]', '', number)
+    elif ',' in number and '.' in number:
+        number = number.replace(',', '')
+    else:
+        number = number.replace(',', '.')
+    try:
+        return Decimal(number)
+    except InvalidOperation:
+        return None
+
+
+def parse_price(text) -> Tuple[Optional[Decimal], Optional[str]]:
+    """Amount and ISO currency from a price string ('€1,250' -> (Decimal('1250'), 'EUR'))"""
+    if text is None or text == '':
+        return None, None
+    if isinstance(text, (int, float, Decimal)):
+        return Decimal(str(text)), None
+
+    text = str(text)
+    currency = None
+    for symbol, code in CURRENCY_SYMBOLS.items():
+        if symbol in text:
+            currency = code
+            break
+    if not currency:
+        code_match = re.search(r'\b(EUR|USD|GBP|CHF)\b', text)
+        currency = code_match.group(1) if code_match else None
+
+    match = re.search(r'\d[\d.,\s]*', text)
+    if not match:
+        return None, currency
+    return _to_decimal(match.group(0).strip().rstrip('.,')), currency
+
+
+def parse_shipping(text) -> Optional[float]:
+    """Shipping cost as a number ('35' / '€35 from France' -> 35.0, 'Free' -> 0.0)"""
+    if text is None or text == '':
+        return None
+    if isinstance(text, (int, float)):
+        return float(text)
+    if 'free' in str(text).lower():
+        return 0.0
+    amount, _ = parse_price(text)
+    return float(amount) if amount is not None else None
+
+
+def parse_bottles(value) -> Optional[int]:
+    """Bottle count as int (6, '6', '6 bottles' -> 6)"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, int):
+        return value
+    match = re.search(r'\d+', str(value))
+    return int(match.group(0)) if match else None
+
+
+def parse_rating(value) -> Optional[int]:
+    """AI rating as int ('8/10' -> 8, 'N/A' -> None)"""
+    if value is None:
+        return None
+    match = re.match(r'\s*(\d+)', str(value))
+    return int(match.group(1)) if match else None
+
+
+def parse_datetime(value) -> Optional[datetime]:
+    """ISO-ish timestamp string to datetime (naive values are kept naive)"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+
+_COUNTDOWN_UNITS = [
+    ('days', r'(\d+)\s*(?:days?|дн\w*|день)'),
+    ('hours', r'(\d+)\s*(?:hours?|hrs?|h\b|час\w*|ч\b)'),
+    ('minutes', r'(\d+)\s*(?:minutes?|mins?|m\b|мин\w*)'),
+    ('seconds', r'(\d+)\s*(?:seconds?|secs?|s\b|сек\w*)'),
+]
+
+
+def parse_end_date(value, reference: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    Auction end as datetime
+
+    Accepts the exact "YYYY-MM-DD HH:MM:SS" produced by scraper_pro, ISO
+    timestamps from `datetime` attributes, the Sheets countdown formula and
+    free-form countdowns ("1 day 23 hours 22 min"), which are resolved
+    against `reference` (normally the lot's scraped_at).
+    """
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+
+    text = str(value).strip()
+    if text.startswith('='):
+        # =DAYS(DATEVALUE("2025-11-17") + TIMEVALUE("21:00:00"); ...)
+        parts = re.findall(r'"(\d{4}-\d{2}-\d{2})".*?"(\d{2}:\d{2}:\d{2})"', text)
+        if parts:
+            return datetime.fromisoformat(f"{parts[0][0]} {parts[0][1]}")
+        return None
+
+    exact = parse_datetime(text)
+    if exact:
+        return exact
+
+    delta = {}
+    for unit, pattern in _COUNTDOWN_UNITS:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            delta[unit] = int(match.group(1))
+    if delta:
+        return (reference or datetime.now()) + timedelta(**delta)
+
+    return None
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+SQLite lot history store
+
+`lots` holds the latest snapshot of every lot (upserted by lot id) and
+`observations` is an append-only time series of price and end date, one
+row per scrape. Writes are batched into transactions; indexes on seller,
+end date and scrape time keep incremental queries in the millisecond range.
+"""
+
+import sys
+import json
+import re
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional, Dict, List, Iterable
+
+import config
+from lot import Lot
+from lot_fields import parse_datetime
+from sinks import read_records
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lots (
+    lot_id INTEGER PRIMARY KEY,
+    url TEXT,
+    title TEXT,
+    seller_name TEXT,
+    bottles_count INTEGER,
+    price REAL,
+    currency TEXT,
+    shipping_cost REAL,
+    end_date TEXT,
+    images TEXT,
+    first_seen_at TEXT NOT NULL,
+    scraped_at TEXT NOT NULL,
+    job_id TEXT,
+    data TEXT,
+    closed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_lots_seller ON lots(seller_name);
+CREATE INDEX IF NOT EXISTS idx_lots_end_date ON lots(end_date);
+CREATE INDEX IF NOT EXISTS idx_lots_scraped_at ON lots(scraped_at);
+
+CREATE TABLE IF NOT EXISTS observations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    lot_id INTEGER NOT NULL,
+    scraped_at TEXT NOT NULL,
+    price REAL,
+    currency TEXT,
+    end_date TEXT,
+    job_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_observations_lot ON observations(lot_id, scraped_at);
+CREATE INDEX IF NOT EXISTS idx_observations_scraped_at ON observations(scraped_at);
+"""
+
+END_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def lot_closed(end_date: Optional[datetime], scraped_at: datetime) -> bool:
+    """Scraped clearly after the end date (countdown-derived end dates jitter by a minute or two)"""
+    return end_date is not None and (scraped_at - end_date).total_seconds() > config.LOT_CLOSED_GRACE
+
+
+def snapshot_row(record, job_id: Optional[str] = None) -> Optional[Dict]:
+    """Typed row for the lots table from a Lot or scraped result (None if it has no lot id)"""
+    lot = record if isinstance(record, Lot) else Lot.from_scraped(record)
+    if not lot.lot_id:
+        return None
+    scraped_at = lot.scraped_at or datetime.now()
+
+    return {
+        'lot_id': lot.lot_id,
+        'url': lot.url,
+        'title': lot.title,
+        'seller_name': lot.seller_name,
+        'bottles_count': lot.bottles_count,
+        'price': float(lot.price) if lot.price is not None else None,
+        'currency': lot.currency,
+        'shipping_cost': lot.shipping_cost,
+        'end_date': lot.end_date.strftime(END_DATE_FORMAT) if lot.end_date else None,
+        'images': json.dumps(list(lot.images), ensure_ascii=False),
+        'scraped_at': scraped_at.isoformat(),
+        'job_id': job_id,
+        'data': json.dumps(lot.to_dict() if isinstance(record, Lot) else record, ensure_ascii=False, default=str),
+        'closed_at': scraped_at.isoformat() if lot_closed(lot.end_date, scraped_at) else None,
+    }
+
+
+def parse_since(value: str) -> str:
+    """'24h' / '30m' / '7d' / ISO timestamp -> ISO timestamp"""
+    match = re.fullmatch(r'(\d+)\s*([smhd])', value.strip())
+    if match:
+        seconds = int(match.group(1)) * {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[match.group(2)]
+        return (datetime.now() - timedelta(seconds=seconds)).isoformat()
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"Invalid since {value!r}: use e.g. 30m, 24h, 7d or an ISO timestamp")
+    return parsed.isoformat()
+
+
+def end_date_shift(old: Optional[str], new: Optional[str]) -> Optional[float]:
+    """Seconds the end date moved (None when either is missing or unparseable)"""
+    old_end, new_end = parse_datetime(old), parse_datetime(new)
+    if old_end is None or new_end is None:
+        return None
+    return (new_end - old_end).total_seconds()
+
+
+class LotStore:
+    def __init__(self, db_path: str = config.LOT_STORE_DB):
+        self.db_path = db_path
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(lots)")}
+        if 'closed_at' not in columns:  # Stores created before closed lots were tracked
+            self.conn.execute("ALTER TABLE lots ADD COLUMN closed_at TEXT")
+
+    def upsert_many(self, records: Iterable[Dict], job_id: Optional[str] = None) -> int:
+        """Upsert latest snapshots and append observations in one transaction"""
+        rows = [row for row in (snapshot_row(r, job_id) for r in records) if row]
+        if not rows:
+            return 0
+
+        with self.conn:
+            self.conn.executemany("""
+                INSERT INTO lots (lot_id, url, title, seller_name, bottles_count, price, currency,
+                                  shipping_cost, end_date, images, first_seen_at, scraped_at, job_id, data, closed_at)
+                VALUES (:lot_id, :url, :title, :seller_name, :bottles_count, :price, :currency,
+                        :shipping_cost, :end_date, :images, :scraped_at, :scraped_at, :job_id, :data, :closed_at)
+                ON CONFLICT(lot_id) DO UPDATE SET
+                    url = excluded.url,
+                    title = COALESCE(excluded.title, lots.title),
+                    seller_name = COALESCE(excluded.seller_name, lots.seller_name),
+                    bottles_count = COALESCE(excluded.bottles_count, lots.bottles_count),
+                    price = COALESCE(excluded.price, lots.price),
+                    currency = COALESCE(excluded.currency, lots.currency),
+                    shipping_cost = COALESCE(excluded.shipping_cost, lots.shipping_cost),
+                    end_date = COALESCE(excluded.end_date, lots.end_date),
+                    images = excluded.images,
+                    scraped_at = excluded.scraped_at,
+                    job_id = excluded.job_id,
+                    data = excluded.data,
+                    closed_at = COALESCE(lots.closed_at, excluded.closed_at)
+                WHERE excluded.scraped_at >= lots.scraped_at
+            """, rows)
+            self.conn.executemany("""
+                INSERT INTO observations (lot_id, scraped_at, price, currency, end_date, job_id)
+                VALUES (:lot_id, :scraped_at, :price, :currency, :end_date, :job_id)
+            """, rows)
+        return len(rows)
+
+    def get(self, lot_id: int) -> Optional[Dict]:
+        row = self.conn.execute("SELECT * FROM lots WHERE lot_id = ?", (int(lot_id),)).fetchone()
+        return self._lot(row) if row else None
+
+    def history(self, lot_id: int) -> List[Dict]:
+        rows = self.conn.execute(
+            "SELECT scraped_at, price, currency, end_date, job_id FROM observations "
+            "WHERE lot_id = ? ORDER BY scraped_at",
+            (int(lot_id),)
+        )
+        return [dict(row) for row in rows]
+
+    def changes_since(self, since: str, limit: Optional[int] = None) -> List[Dict]:
+        """
+        Lots that are new or whose price/end date changed since `since` (ISO)
+
+        Each entry is the latest snapshot plus `change` ('new', 'price',
+        'end_date' or 'price,end_date') and the previous values.
+        """
+        rows = self.conn.execute("""
+            WITH recent AS (
+                SELECT DISTINCT lot_id FROM observations WHERE scraped_at >= :since
+            )
+            SELECT l.*,
+                (SELECT o.price FROM observations o
+                 WHERE o.lot_id = l.lot_id AND o.scraped_at < :since
+                 ORDER BY o.scraped_at DESC LIMIT 1) AS previous_price,
+                (SELECT o.end_date FROM observations o
+                 WHERE o.lot_id = l.lot_id AND o.scraped_at < :since
+                 ORDER BY o.scraped_at DESC LIMIT 1) AS previous_end_date
+            FROM lots l JOIN recent r ON r.lot_id = l.lot_id
+            ORDER BY l.scraped_at DESC
+        """, {'since': since})
+
+        changes = []
+        for row in rows:
+            lot = self._lot(row)
+            if lot['first_seen_at'] >= since:
+                lot['change'] = 'new'
+            else:
+                changed = []
+                if row['previous_price'] != row['price']:
+                    changed.append('price')
+                # end_date comes from a minute-resolution countdown: only real moves count
+                shift = end_date_shift(row['previous_end_date'], row['end_date'])
+                if (abs(shift) > config.LOT_STORE_END_TOLERANCE if shift is not None
+                        else row['previous_end_date'] != row['end_date']):
+                    changed.append('end_date')
+                if not changed:
+                    continue
+                lot['change'] = ','.join(changed)
+            lot['previous_price'] = row['previous_price']
+            lot['previous_end_date'] = row['previous_end_date']
+            changes.append(lot)
+            if limit and len(changes) >= limit:
+                break
+        return changes
+
+    def known(self, lot_ids: List[int]) -> Dict[int, Dict]:
+        """Last scrape time and end date of those lots that are in the store"""
+        if not lot_ids:
+            return {}
+        placeholders = ','.join('?' * len(lot_ids))
+        rows = self.conn.execute(
+            f"SELECT lot_id, scraped_at, end_date FROM lots WHERE lot_id IN ({placeholders})",
+            [int(lot_id) for lot_id in lot_ids]
+        )
+        return {row['lot_id']: dict(row) for row in rows}
+
+    def ending_between(self, start: str, end: str) -> List[Dict]:
+        rows = self.conn.execute(
+            "SELECT * FROM lots WHERE end_date >= ? AND end_date < ? ORDER BY end_date", (start, end)
+        )
+        return [self._lot(row) for row in rows]
+
+    def by_seller(self, seller_name: str) -> List[Dict]:
+        rows = self.conn.execute(
+            "SELECT * FROM lots WHERE seller_name = ? ORDER BY scraped_at DESC", (seller_name,)
+        )
+        return [self._lot(row) for row in rows]
+
+    def stats(self) -> Dict:
+        lots, last = self.conn.execute("SELECT COUNT(*), MAX(scraped_at) FROM lots").fetchone()
+        observations = self.conn.execute("SELECT COUNT(*) FROM observations").fetchone()[0]
+        return {'lots': lots, 'observations': observations, 'last_scraped_at': last, 'db_path': self.db_path}
+
+    @staticmethod
+    def _lot(row) -> Dict:
+        lot = {k: row[k] for k in row.keys() if k not in ('data', 'previous_price', 'previous_end_date')}
+        lot['images'] = json.loads(lot['images']) if lot.get('images') else []
+        return lot
+
+    def close(self):
+        self.conn.close()
+
+
+class LotStoreSink:
+    """RunSinks-compatible sink that upserts into the LotStore in batched transactions"""
+
+    def __init__(self, store: Optional[LotStore] = None, job_id: Optional[str] = None,
+                 batch_size: int = config.LOT_STORE_BATCH_SIZE):
+        self.store = store or LotStore()
+        self.job_id = job_id
+        self.batch_size = max(1, batch_size)
+        self.buffer: List[Dict] = []
+
+    def write(self, record: Dict):
+        self.buffer.append(record)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.store.upsert_many(self.buffer, job_id=self.job_id)
+            self.buffer = []
+
+    def close(self):
+        self.flush()
+        self.store.close()
+
+
+def record_lots(records: List[Dict], job_id: Optional[str] = None) -> int:
+    """One-shot upsert for single-lot paths (/scrape, /scrape-async)"""
+    if not config.LOT_STORE_ENABLED:
+        return 0
+    store = LotStore()
+    try:
+        return store.upsert_many(records, job_id=job_id)
+    finally:
+        store.close()
+
+
+def main():
+    usage = (
+        "Usage:\n"
+        "  python lot_store.py stats\n"
+        "  python lot_store.py changes [[--since] 24h|ISO]\n"
+        "  python lot_store.py history <lot_id>\n"
+        "  python lot_store.py import <results.ndjson|.json>"
+    )
+    if len(sys.argv) < 2:
+        print(usage)
+        sys.exit(1)
+
+    store = LotStore()
+    command = sys.argv[1]
+    started = time.perf_counter()
+
+    if command == 'stats':
+        print(json.dumps(store.stats(), indent=2))
+
+    elif command == 'changes':
+        since = '24h'
+        if '--since' in sys.argv and sys.argv.index('--since') + 1 < len(sys.argv):
+            since = sys.argv[sys.argv.index('--since') + 1]
+        elif len(sys.argv) > 2:
+            since = sys.argv[2]
+        try:
+            since_iso = parse_since(since)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        changes = store.changes_since(since_iso)
+        for lot in changes:
+            print(f"{lot['change']:<16} {lot['lot_id']:<10} {lot['price'] or '':>10} "
+                  f"(was {lot['previous_price'] or '-'})  {(lot['title'] or '')[:60]}")
+        print(f"\n📊 {len(changes)} changed lots since {since}")
+
+    elif command == 'history' and len(sys.argv) > 2:
+        for observation in store.history(int(sys.argv[2])):
+            print(f"{observation['scraped_at']}  {observation['price']} {observation['currency'] or ''}  "
+                  f"ends {observation['end_date']}")
+
+    elif command == 'import' and len(sys.argv) > 2:
+        print(f"💾 Imported {store.upsert_many(read_records(sys.argv[2]))} lots")
+
+    else:
+        print(usage)
+        sys.exit(1)
+
+    print(f"⏱️  {(time.perf_counter() - started) * 1000:.1f} ms")
+    store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Memory governor - keep browsers within the box's memory
+
+Every browser launch takes a slot (MemoryGovernor.slot). While slots are
+in use a sampler task reads MemAvailable, this process's RSS and the RSS
+of each browser's process tree every GOVERNOR_INTERVAL seconds (the /proc
+walk runs in a worker thread) and decides:
+
+    shed     MemAvailable < GOVERNOR_LOW_MB: one slot less (at most every GOVERNOR_SETTLE_SECONDS)
+    raise    MemAvailable > GOVERNOR_HIGH_MB for GOVERNOR_SETTLE_SECONDS: one slot more
+    recycle  browser tree > GOVERNOR_BROWSER_MAX_MB: flagged; long-lived browsers
+             (category listing) are relaunched at the next page
+    kill     MemAvailable < GOVERNOR_CRITICAL_MB: the largest browser is closed now -
+             one failed lot instead of an OOM-killed job
+
+Browsers are found by a marker switch on their command line. Figures and
+decisions are in summary() (shown in /health). Linux only (/proc); elsewhere
+slots are handed out without limits.
+
+CLI:
+    python memory_governor.py    # memory now and the starting browser limit
+"""
+
+import asyncio
+import os
+import secrets
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Optional, Dict, List, Tuple
+
+import config
+from tracing import span
+
+
+def process_table() -> Dict[int, Tuple[int, str]]:
+    """pid -> (parent pid, command name) for every process"""
+    table = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'r') as f:
+                stat = f.read()
+        except OSError:
+            continue  # Exited while we were looking
+        # comm is in parentheses and may contain spaces
+        name = stat[stat.index('(') + 1:stat.rindex(')')]
+        table[int(entry)] = (int(stat[stat.rindex(')') + 2:].split()[1]), name)
+    return table
+
+
+def process_tree(root_pid: int, table: Optional[Dict[int, Tuple[int, str]]] = None) -> Dict[int, str]:
+    """pid -> command name for root_pid and all its descendants"""
+    table = table if table is not None else process_table()
+    tree = {root_pid: table.get(root_pid, (0, '?'))[1]}
+    grew = True
+    while grew:
+        grew = False
+        for pid, (ppid, name) in table.items():
+            if ppid in tree and pid not in tree:
+                tree[pid] = name
+                grew = True
+    return tree
+
+
+def rss_mb(pid: int) -> float:
+    try:
+        with open(f'/proc/{pid}/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def cmdline(pid: int) -> str:
+    try:
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            return f.read().replace(b'\0', b' ').decode('utf-8', 'replace')
+    except OSError:
+        return ''
+
+
+def process_kind(pid: int, name: str, root_pid: int) -> str:
+    if pid == root_pid:
+        return 'python'
+    lowered = name.lower()
+    if 'chrom' in lowered or 'headless' in lowered:
+        return 'chromium'
+    if lowered == 'node':
+        return 'driver'  # Playwright's node driver
+    return 'other'
+
+
+def system_memory() -> Dict[str, float]:
+    """MemTotal and MemAvailable in MB"""
+    memory = {}
+    with open('/proc/meminfo', 'r') as f:
+        for line in f:
+            key, value = line.split(':', 1)
+            if key in ('MemTotal', 'MemAvailable'):
+                memory[key] = int(value.split()[0]) / 1024
+    return memory
+
+
+def measure(slots: List[Tuple[str, Optional[int]]]) -> Dict:
+    """
+    One memory reading (blocking /proc walk - run it in a thread)
+
+    slots: (marker, pid or None) of each browser slot. Returns MemTotal/
+    MemAvailable, this process's and its children's RSS, the pid found for
+    each marker ('pids') and the RSS of each slot's process tree ('rss').
+    """
+    own_pid = os.getpid()
+    table = process_table()
+    tree = process_tree(own_pid, table)
+    reading = {
+        'memory': system_memory(),
+        'python_mb': rss_mb(own_pid),
+        'browsers_mb': sum(rss_mb(pid) for pid in tree if pid != own_pid),
+        'pids': {},
+        'rss': {},
+    }
+
+    # Browser main processes carry the slot's marker (helpers have --type=)
+    unresolved = {marker for marker, pid in slots if pid not in tree}
+    if unresolved:
+        for pid, name in tree.items():
+            if process_kind(pid, name, own_pid) != 'chromium':
+                continue
+            line = cmdline(pid)
+            if '--type=' in line:
+                continue
+            for marker in list(unresolved):
+                if marker in line:
+                    reading['pids'][marker] = pid
+                    unresolved.discard(marker)
+
+    for marker, pid in slots:
+        pid = reading['pids'].get(marker, pid)
+        if pid is not None:
+            reading['rss'][pid] = sum(rss_mb(child) for child in process_tree(pid, table))
+    return reading
+
+
+class BrowserSlot:
+    """One running browser as the governor sees it"""
+
+    def __init__(self, label: Optional[str]):
+        self.token = secrets.token_hex(4)
+        self.label = label or self.token
+        self.browser = None
+        self.pid: Optional[int] = None
+        self.rss_mb = 0.0
+        self.peak_mb = 0.0
+        self.recycle = False  # Over GOVERNOR_BROWSER_MAX_MB: relaunch when convenient
+        self.killed = False  # Closed by the governor (memory critical)
+        self.marker = f"--governor-tag={self.token}"  # Extra Chromium switch that identifies the browser's process
+
+    def attach(self, browser, marker: Optional[str] = None):
+        """Launched (or relaunched after a recycle); marker: a pooled browser's own switch"""
+        self.browser = browser
+        if marker:
+            self.marker = marker
+        self.pid = None
+        self.rss_mb = 0.0
+        self.recycle = False
+
+    def summary(self) -> Dict:
+        return {'label': self.label, 'rss_mb': round(self.rss_mb), 'peak_mb': round(self.peak_mb),
+                'recycle': self.recycle}
+
+
+class MemoryGovernor:
+    _shared = None
+
+    def __init__(self, max_concurrency: int = config.GOVERNOR_MAX_CONCURRENCY,
+                 min_concurrency: int = config.GOVERNOR_MIN_CONCURRENCY):
+        self.enabled = config.GOVERNOR_ENABLED and os.path.exists('/proc/meminfo')
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = max_concurrency
+        self.available_mb: Optional[float] = None
+        self.total_mb: Optional[float] = None
+        if self.enabled:
+            # Start with what fits now; the sampler adjusts from there
+            memory = system_memory()
+            self.total_mb, self.available_mb = memory.get('MemTotal'), memory.get('MemAvailable')
+            if self.available_mb is not None:
+                fits = int(self.available_mb // config.GOVERNOR_BROWSER_ESTIMATE_MB)
+                self.limit = max(min_concurrency, min(max_concurrency, fits))
+        self.slots: Dict[str, BrowserSlot] = {}
+        self.waiting = 0
+        self.python_mb = 0.0
+        self.browsers_mb = 0.0
+        self.peak_mb = 0.0
+        self.decisions: Dict[str, int] = {'shed': 0, 'raise': 0, 'recycle': 0, 'kill': 0}
+        self.recent = deque(maxlen=20)
+        self._changed_at = time.time()
+        self._comfortable_since: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def shared(cls) -> 'MemoryGovernor':
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    @asynccontextmanager
+    async def slot(self, label: Optional[str] = None):
+        """Wait for a browser slot; launch the browser with slot.marker and slot.attach() it"""
+        slot = BrowserSlot(label)
+        if not self.enabled:
+            yield slot
+            return
+
+        self._ensure_sampler()
+        if len(self.slots) >= self.limit:
+            self.waiting += 1
+            try:
+                with span('memory_wait', limit=self.limit):
+                    print(f"[{time.strftime('%H:%M:%S')}] ⏸️  {len(self.slots)}/{self.limit} browsers running "
+                          f"({self.available_mb or 0:.0f} MB available), waiting for a slot...")
+                    while len(self.slots) >= self.limit:
+                        await asyncio.sleep(config.GOVERNOR_POLL)
+            finally:
+                self.waiting -= 1
+
+        self.slots[slot.token] = slot
+        try:
+            yield slot
+        finally:
+            self.slots.pop(slot.token, None)
+
+    def _ensure_sampler(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        # Runs while browsers are up or lots are waiting; the next slot restarts it
+        while self.slots or self.waiting:
+            try:
+                await self.sample()
+            except Exception as e:
+                print(f"[{time.strftime('%H:%M:%S')}] ⚠️  Memory sample failed: {e}")
+            await asyncio.sleep(config.GOVERNOR_INTERVAL)
+
+    async def sample(self):
+        # The /proc walk over every Chromium child runs in a thread, not on the scraping event loop
+        slots = list(self.slots.values())
+        reading = await asyncio.to_thread(measure, [(slot.marker, slot.pid) for slot in slots])
+        memory = reading['memory']
+        self.total_mb, self.available_mb = memory.get('MemTotal'), memory.get('MemAvailable')
+        self.python_mb, self.browsers_mb = reading['python_mb'], reading['browsers_mb']
+        self.peak_mb = max(self.peak_mb, self.python_mb + self.browsers_mb)
+
+        for slot in slots:
+            if slot.token not in self.slots:
+                continue  # Released while the thread was reading
+            slot.pid = reading['pids'].get(slot.marker, slot.pid)
+            if slot.pid is None or slot.pid not in reading['rss']:
+                continue
+            slot.rss_mb = reading['rss'][slot.pid]
+            slot.peak_mb = max(slot.peak_mb, slot.rss_mb)
+            if not slot.recycle and slot.rss_mb > config.GOVERNOR_BROWSER_MAX_MB:
+                slot.recycle = True
+                self._decide('recycle', f"{slot.label}: {slot.rss_mb:.0f} MB")
+
+        available = self.available_mb
+        if available is None:
+            return
+
+        if available < config.GOVERNOR_CRITICAL_MB:
+            candidates = [slot for slot in self.slots.values() if slot.browser is not None and not slot.killed]
+            if candidates:
+                victim = max(candidates, key=lambda slot: slot.rss_mb)
+                victim.killed = True
+                self._decide('kill', f"{victim.label}: {victim.rss_mb:.0f} MB, {available:.0f} MB available")
+                try:
+                    await victim.browser.close()
+                except Exception:
+                    pass
+
+        settled = time.time() - self._changed_at >= config.GOVERNOR_SETTLE_SECONDS
+        if available < config.GOVERNOR_LOW_MB:
+            self._comfortable_since = None
+            if settled and self.limit > self.min_concurrency:
+                self.limit -= 1
+                self._decide('shed', f"limit {self.limit}, {available:.0f} MB available")
+        elif available > config.GOVERNOR_HIGH_MB:
+            if self._comfortable_since is None:
+                self._comfortable_since = time.time()
+            comfortable = time.time() - self._comfortable_since >= config.GOVERNOR_SETTLE_SECONDS
+            if settled and comfortable and self.limit < self.max_concurrency:
+                self.limit += 1
+                self._decide('raise', f"limit {self.limit}, {available:.0f} MB available")
+        else:
+            self._comfortable_since = None
+
+    def _decide(self, action: str, detail: str):
+        self.decisions[action] += 1
+        if action in ('shed', 'raise'):
+            self._changed_at = time.time()
+        self.recent.append({'at': datetime.now().isoformat(timespec='seconds'), 'action': action, 'detail': detail})
+        icon = {'shed': '📉', 'raise': '📈', 'recycle': '♻️ ', 'kill': '💀'}[action]
+        print(f"[{time.strftime('%H:%M:%S')}] {icon} Memory governor: {action} ({detail})")
+
+    def summary(self) -> Dict:
+        return {
+            'enabled': self.enabled,
+            'limit': self.limit,
+            'max_concurrency': self.max_concurrency,
+            'browsers': len(self.slots),
+            'waiting': self.waiting,
+            'available_mb': round(self.available_mb) if self.available_mb is not None else None,
+            'total_mb': round(self.total_mb) if self.total_mb is not None else None,
+            'python_mb': round(self.python_mb),
+            'browsers_mb': round(self.browsers_mb),
+            'peak_mb': round(self.peak_mb),
+            'decisions': dict(self.decisions),
+            'recent': list(self.recent),
+            'slots': [slot.summary() for slot in self.slots.values()],
+        }
+
+
+def main():
+    governor = MemoryGovernor()
+    if not governor.enabled:
+        print("Memory governor is off (GOVERNOR=0 or no /proc/meminfo)")
+        return
+    print(f"Memory:    {governor.available_mb:.0f} MB available of {governor.total_mb:.0f} MB")
+    print(f"Browsers:  start with {governor.limit} at once (max {governor.max_concurrency}, "
+          f"~{config.GOVERNOR_BROWSER_ESTIMATE_MB} MB each, recycled above {config.GOVERNOR_BROWSER_MAX_MB} MB)")
+    print(f"Shed below {config.GOVERNOR_LOW_MB} MB available, raise above {config.GOVERNOR_HIGH_MB} MB, "
+          f"close the largest browser below {config.GOVERNOR_CRITICAL_MB} MB")
+
+
+if __name__ == '__main__':
+    main()
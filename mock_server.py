@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Local mock of the Catawiki pages the scrapers read
+
+Serves category listings with pagination, lot pages (title, images, seller,
+price, shipping and a ticking bidding counter) and a home page for session
+warm-up, all generated from the lot id so every run sees the same data.
+Part of each page is rendered by script after render_delay_ms, like the
+real site, so the readiness waits have something to wait for. Latency and
+403 "Access Denied" responses can be injected for load tests (load_test.py).
+
+    /en/c/<id>-<slug>?page=N     listing page N (also /en/s?q=...)
+    /en/l/<lot_id>-<slug>        lot page
+    /_mock/stats                 requests served / blocked, as JSON
+
+Usage: python mock_server.py [--port 8765] [--latency-ms 200] [--jitter-ms latency/2]
+                             [--block-rate 0.05] [--pages 5] [--lots-per-page 24]
+"""
+
+import sys
+import html
+import json
+import random
+import re
+import threading
+import time
+import unicodedata
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict
+from urllib.parse import urlsplit, parse_qs
+
+FIRST_LOT_ID = 10000000
+
+REGIONS = ['Bordeaux', 'Burgundy', 'Champagne', 'Rhône', 'Piedmont', 'Tuscany', 'Rioja', 'Napa Valley']
+SELLERS = [f"Wine Merchant {i}" for i in range(50)]
+COUNTRIES = ['France', 'Italy', 'Spain', 'Germany', 'Netherlands', 'Belgium']
+
+# 1x1 transparent GIF for every image request
+PIXEL = bytes.fromhex('47494638396101000100800000000000ffffff21f90401000000002c00000000010001000002024401003b')
+
+BLOCK_PAGE = """<!DOCTYPE html>
+<html><head><title>Access Denied</title></head>
+<body><h1>Access Denied</h1>
+<p>You don't have permission to access "%s" on this server.</p>
+<p>Reference #18.%08x</p></body></html>"""
+
+PAGE = """<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><title>%(title)s | Catawiki</title></head>
+<body><main>%(body)s</main>
+<script>%(script)s</script></body></html>"""
+
+# Listing: the second half of the cards is added after the delay
+LISTING_SCRIPT = """
+setTimeout(() => {
+    const grid = document.getElementById('lots');
+    for (const card of %(cards)s) grid.insertAdjacentHTML('beforeend', card);
+}, %(delay)d);
+"""
+
+# Lot: price and counter appear after the delay, then the counter ticks
+COUNTDOWN_SCRIPT = """
+setTimeout(() => {
+    document.querySelector('[data-testid="lot-bid-price"]').textContent = %(price)s;
+    let left = %(seconds)d;
+    const units = [['day', 86400], ['hours', 3600], ['min', 60], ['sec', 1]];
+    const render = () => {
+        let rest = left;
+        document.querySelector('[data-testid="lot-bidding-counter"]').innerHTML = units.map(([label, size]) => {
+            const value = Math.floor(rest / size);
+            rest -= value * size;
+            return '<div class="AnimatedNumber_container__mK3l2"><div class="tw:text-h4">' + value +
+                   '</div><div class="tw:text-label-s">' + label + '</div></div>';
+        }).join('');
+        left = Math.max(0, left - 1);
+    };
+    render();
+    setInterval(render, 1000);
+}, %(delay)d);
+"""
+
+
+def slug(text: str) -> str:
+    ascii_text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^a-z0-9]+', '-', ascii_text.lower()).strip('-')
+
+
+def lot_url_path(lot_id: int) -> str:
+    return f"/en/l/{lot_id}-{slug(lot_fixture(lot_id)['title'])}"
+
+
+def lot_fixture(lot_id: int) -> Dict:
+    """Lot data derived from the id (same id, same lot)"""
+    rng = random.Random(lot_id)
+    bottles = rng.randint(1, 12)
+    region = rng.choice(REGIONS)
+    return {
+        'title': f"{bottles} bottles {rng.randint(1960, 2020)} Château {region} Grand Cru",
+        'images': [f"/assets.catawiki/image/cw_ldp_l/plain/assets/catawiki/assets/2025/11/{lot_id}_{n}.jpg"
+                   for n in range(rng.randint(3, 8))],
+        'seller': rng.choice(SELLERS),
+        'seller_id': rng.randint(1000, 9999),
+        'price': f"€ {rng.randint(10, 5000):,}",
+        'shipping': f"€{rng.randint(15, 60)} from {rng.choice(COUNTRIES)}",
+        'seconds_left': rng.randint(600, 6 * 86400),
+    }
+
+
+class MockCatawiki:
+    """Page generation and request accounting (shared by all handler threads)"""
+
+    def __init__(self, pages: int = 5, lots_per_page: int = 24, latency_ms: float = 200, jitter_ms: float = 100,
+                 block_rate: float = 0.0, render_delay_ms: int = 300, seed: Optional[int] = None):
+        self.pages = pages
+        self.lots_per_page = lots_per_page
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.block_rate = block_rate
+        self.render_delay_ms = render_delay_ms
+        self.rng = random.Random(seed)
+        self.requests: Dict[str, int] = {}
+        self.blocked = 0
+        self._lock = threading.Lock()
+
+    def lot_ids(self, page: int):
+        first = FIRST_LOT_ID + (page - 1) * self.lots_per_page
+        return range(first, first + self.lots_per_page)
+
+    def all_lot_urls(self, origin: str, count: int):
+        """URLs of the first count lots (in listing order)"""
+        return [f"{origin}{lot_url_path(FIRST_LOT_ID + i)}" for i in range(count)]
+
+    def delay(self):
+        with self._lock:
+            jitter = self.rng.uniform(-self.jitter_ms, self.jitter_ms)
+        time.sleep(max(0.0, self.latency_ms + jitter) / 1000)
+
+    def should_block(self, kind: str) -> bool:
+        with self._lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+            if kind in ('lot', 'listing') and self.rng.random() < self.block_rate:
+                self.blocked += 1
+                return True
+        return False
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'requests': dict(self.requests), 'blocked': self.blocked}
+
+    def listing(self, page: int) -> str:
+        page = max(1, min(page, self.pages))
+        cards = []
+        for lot_id in self.lot_ids(page):
+            lot = lot_fixture(lot_id)
+            cards.append(
+                f'<article class="c-lot-card__container" data-testid="lot-card-container-{lot_id}">'
+                f'<a class="c-lot-card" href="{lot_url_path(lot_id)}?ref=listing">'
+                f'<img src="{lot["images"][0]}" alt=""><p>{html.escape(lot["title"])}</p>'
+                f'<span class="c-lot-card__price">{lot["price"]}</span></a></article>')
+        shown = len(cards) // 2
+
+        numbers = sorted({1, 2, 3, page - 1, page, page + 1, self.pages} & set(range(1, self.pages + 1)))
+        links, previous = [], 0
+        for number in numbers:
+            if number - previous > 1:
+                links.append('<span data-testid="page">…</span>')
+            links.append(f'<a data-testid="page" href="?page={number}">{number}</a>')
+            previous = number
+
+        body = (f'<h1>Wine auctions</h1><div id="lots" data-sentry-component="ListingLotsWrapper">{"".join(cards[:shown])}</div>'
+                f'<nav class="c-pagination__container">{"".join(links)}</nav>')
+        script = LISTING_SCRIPT % {'cards': json.dumps(cards[shown:]), 'delay': self.render_delay_ms}
+        return PAGE % {'title': f"Wine auctions - page {page}", 'body': body, 'script': script}
+
+    def lot(self, lot_id: int) -> str:
+        lot = lot_fixture(lot_id)
+        images = ''.join(f'<img src="{src}" alt="">' for src in lot['images'])
+        body = (
+            f'<h1>{html.escape(lot["title"])}</h1>'
+            f'<section class="gallery"><picture>{images}</picture>'
+            f'<img src="/assets.catawiki/icons/flag-fr.svg" alt=""></section>'
+            f'<a href="/u/{lot["seller_id"]}-{slug(lot["seller"])}"><h2>{lot["seller"]}</h2></a>'
+            f'<div><span>Current bid</span> <span data-testid="lot-bid-price"></span></div>'
+            f'<div data-testid="lot-bidding-counter"></div>'
+            f'<p data-testid="shipping-cost">{lot["shipping"]}</p>'
+        )
+        script = COUNTDOWN_SCRIPT % {'price': json.dumps(lot['price']), 'seconds': lot['seconds_left'],
+                                     'delay': self.render_delay_ms}
+        return PAGE % {'title': html.escape(lot['title']), 'body': body, 'script': script}
+
+    def home(self) -> str:
+        return PAGE % {'title': 'Catawiki', 'body': '<h1>Weekly auctions</h1><a href="/en/c/wine">Wine</a>',
+                       'script': ''}
+
+
+class Handler(BaseHTTPRequestHandler):
+    mock: MockCatawiki = None
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        path = parts.path
+
+        if path == '/_mock/stats':
+            return self._send(200, json.dumps(self.mock.stats()), 'application/json')
+        if path.startswith('/assets.catawiki/'):
+            return self._send(200, PIXEL, 'image/gif')
+
+        if path.startswith('/en/l/'):
+            kind = 'lot'
+        elif path.startswith('/en/c/') or path.startswith('/en/s'):
+            kind = 'listing'
+        elif path in ('/', '/en', '/en/'):
+            kind = 'home'
+        else:
+            return self._send(404, '<h1>Not found</h1>')
+
+        self.mock.delay()
+        if self.mock.should_block(kind):
+            return self._send(403, BLOCK_PAGE % (html.escape(path), random.getrandbits(32)))
+
+        if kind == 'lot':
+            try:
+                lot_id = int(path[len('/en/l/'):].split('-')[0])
+            except ValueError:
+                return self._send(404, '<h1>Not found</h1>')
+            return self._send(200, self.mock.lot(lot_id))
+        if kind == 'listing':
+            try:
+                page = int(parse_qs(parts.query).get('page', ['1'])[0])
+            except ValueError:
+                page = 1
+            return self._send(200, self.mock.listing(page))
+        return self._send(200, self.mock.home())
+
+    def _send(self, status: int, body, content_type: str = 'text/html; charset=utf-8'):
+        data = body.encode('utf-8') if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Browser closed mid-response
+
+    def log_message(self, format, *args):
+        pass  # One line per request would drown the scraper output
+
+
+def make_server(mock: MockCatawiki, port: int = 8765, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    handler = type('MockHandler', (Handler,), {'mock': mock})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_thread(mock: MockCatawiki, port: int = 8765) -> ThreadingHTTPServer:
+    """Serve in a daemon thread (call .shutdown() when done)"""
+    server = make_server(mock, port)
+    threading.Thread(target=server.serve_forever, name='mock-catawiki', daemon=True).start()
+    return server
+
+
+def main():
+    def option(name: str, default):
+        if name in sys.argv and sys.argv.index(name) + 1 < len(sys.argv):
+            return type(default)(sys.argv[sys.argv.index(name) + 1])
+        return default
+
+    if '--help' in sys.argv or '-h' in sys.argv:
+        print(__doc__)
+        sys.exit(0)
+
+    port = option('--port', 8765)
+    latency = option('--latency-ms', 200.0)
+    mock = MockCatawiki(pages=option('--pages', 5), lots_per_page=option('--lots-per-page', 24),
+                        latency_ms=latency, jitter_ms=option('--jitter-ms', latency / 2),
+                        block_rate=option('--block-rate', 0.0), render_delay_ms=option('--render-delay-ms', 300))
+    server = make_server(mock, port)
+    print(f"🧪 Mock Catawiki on http://127.0.0.1:{port}  ({mock.pages} pages x {mock.lots_per_page} lots, "
+          f"latency {mock.latency_ms:.0f}±{mock.jitter_ms:.0f}ms, {mock.block_rate:.0%} 403s)")
+    print(f"   Category: http://127.0.0.1:{port}/en/c/333-wine")
+    print(f"   Lot:      http://127.0.0.1:{port}{lot_url_path(FIRST_LOT_ID)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n📊 {mock.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Columnar Parquet / Arrow export with typed fields
+
+Prices become decimal + currency, shipping a float, bottle count an int,
+end date and scrape time timestamps, images a list column and ratings
+small ints. Rows are buffered and written one row group at a time while
+a job runs. Requires pyarrow (optional dependency).
+"""
+
+import sys
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, List
+
+import config
+from lot import Lot
+from sinks import read_records
+from wine_rating import RATING_FIELDS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyarrow.ipc as ipc
+except ImportError:
+    pa = None
+
+
+def lot_schema():
+    return pa.schema([
+        ('lot_id', pa.int64()),
+        ('title', pa.string()),
+        ('bottles_count', pa.int32()),
+        ('seller_name', pa.string()),
+        ('price', pa.decimal128(14, 2)),
+        ('currency', pa.string()),
+        ('shipping_cost', pa.float64()),
+        ('end_date', pa.timestamp('s')),
+        ('images', pa.list_(pa.string())),
+        ('url', pa.string()),
+        ('scraped_at', pa.timestamp('us')),
+    ] + [(field, pa.int8()) for field in RATING_FIELDS])
+
+
+def typed_row(item) -> Dict:
+    """Typed column values for a Lot or a scraped result dict (raw or Sheets-formatted)"""
+    lot = item if isinstance(item, Lot) else Lot.from_scraped(item)
+    row = {
+        'lot_id': lot.lot_id,
+        'title': lot.title,
+        'bottles_count': lot.bottles_count,
+        'seller_name': lot.seller_name,
+        'price': lot.price.quantize(Decimal('0.01')) if lot.price is not None else None,
+        'currency': lot.currency,
+        'shipping_cost': lot.shipping_cost,
+        'end_date': lot.end_date,
+        'images': list(lot.images),
+        'url': lot.url or None,
+        'scraped_at': lot.scraped_at,
+    }
+    for field in RATING_FIELDS:
+        row[field] = getattr(lot, field)
+    return row
+
+
+def part_path(path: str) -> str:
+    """
+    Next free part file next to path (run.parquet -> run.part1.parquet, ...)
+
+    A resumed run writes its rows to a new part: the file of the interrupted
+    run is left as it is (an unclosed Parquet file has no footer, an Arrow
+    stream is readable up to its last complete batch).
+    """
+    target = Path(path)
+    n = 1
+    while True:
+        candidate = target.with_name(f"{target.stem}.part{n}{target.suffix}")
+        if not candidate.exists():
+            return str(candidate)
+        n += 1
+
+
+def part_files(path: str) -> List[str]:
+    """The run's columnar file followed by the parts written by resumed runs"""
+    target = Path(path)
+    files = [str(target)] if target.exists() else []
+    n = 1
+    while True:
+        candidate = target.with_name(f"{target.stem}.part{n}{target.suffix}")
+        if not candidate.exists():
+            return files
+        files.append(str(candidate))
+        n += 1
+
+
+class ParquetSink:
+    """
+    Typed columnar sink (RunSinks-compatible: write/close)
+
+    Args:
+        path: Output file (.parquet, or .arrow for Arrow IPC stream)
+        row_group_size: Rows buffered before a row group / record batch is written
+        resume: Resumed run - an existing file is kept and rows go to a new part (see part_path)
+    """
+
+    def __init__(self, path: str, row_group_size: int = config.PARQUET_ROW_GROUP_SIZE, resume: bool = False):
+        if pa is None:
+            raise RuntimeError("Columnar export needs pyarrow: pip install pyarrow")
+        self.path = part_path(path) if resume and Path(path).exists() else str(path)
+        self.format = 'arrow' if self.path.endswith('.arrow') else 'parquet'
+        self.row_group_size = max(1, row_group_size)
+        self.schema = lot_schema()
+        self.buffer: List[Dict] = []
+        self.count = 0
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+
+        if self.format == 'parquet':
+            self.writer = pq.ParquetWriter(self.path, self.schema, compression=config.PARQUET_COMPRESSION)
+        else:
+            # Stream format: readable up to the last complete batch even after a crash
+            self.writer = ipc.new_stream(self.path, self.schema)
+
+    def write(self, record: Dict):
+        self.buffer.append(typed_row(record))
+        self.count += 1
+        if len(self.buffer) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        batch = pa.RecordBatch.from_pylist(self.buffer, schema=self.schema)
+        if self.format == 'parquet':
+            self.writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            self.writer.write_batch(batch)
+        self.buffer = []
+
+    def close(self):
+        if self.writer is None:
+            return
+        self.flush()
+        self.writer.close()
+        self.writer = None
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python parquet_sink.py <input.ndjson|.csv|.json> <output.parquet|output.arrow>")
+        print("\nConverts existing results (including Sheets-formatted CSVs) to typed columns")
+        sys.exit(1)
+
+    source, target = sys.argv[1], sys.argv[2]
+    sink = ParquetSink(target)
+    try:
+        for record in read_records(source):
+            sink.write(record)
+    finally:
+        sink.close()
+    print(f"💾 {sink.count} rows written to {target}")
+
+
+if __name__ == '__main__':
+    main()
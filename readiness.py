@@ -0,0 +1,135 @@
+"""
+Readiness waits - wait for what the page needs instead of fixed sleeps
+
+Lot page: ready once a price is rendered and the bidding counter shows
+digits (or the lot is closed). Category page: ready once the number of lot
+cards has stopped changing for config.READY_QUIET_MS, observed by an
+injected MutationObserver. Both give up after a max wait and continue
+with whatever is there, like the old sleeps did.
+
+Wait times are kept per kind (ReadinessStats, shown in /health) so the
+median per-page wait can be compared with the sleeps it replaced.
+"""
+
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Optional, Dict
+
+import config
+
+BIDDING_COUNTER_SELECTOR = '[data-testid="lot-bidding-counter"]'
+PRICE_SELECTORS = ['[data-testid*="bid"]', '[data-testid*="price"]', '.current-bid', 'span[class*="price"]']
+LOT_CARD_SELECTOR = ', '.join([
+    '[data-testid^="lot-card-container-"]',
+    'article.c-lot-card__container',
+    'a.c-lot-card[href*="/en/l/"]',
+])
+
+_LOT_READY_JS = r"""
+([counterSelector, priceSelectors]) => {
+    const hasPrice = priceSelectors.some(sel =>
+        Array.from(document.querySelectorAll(sel)).some(el => /[€$£]\s*\d/.test(el.textContent)));
+    const counter = document.querySelector(counterSelector);
+    const counting = counter && /\d/.test(counter.textContent);
+    const h1 = document.querySelector('h1');
+    const closed = /\b(closed|sold|final bid)\b/i.test(document.body ? document.body.innerText.slice(0, 5000) : '');
+    return Boolean(h1 && h1.textContent.trim() && hasPrice && (counting || closed));
+}
+"""
+
+_STABLE_COUNT_JS = r"""
+([selector, quietMs, maxMs]) => new Promise(resolve => {
+    const count = () => document.querySelectorAll(selector).length;
+    let last = count();
+    let quietTimer = null;
+    const finish = (timedOut) => {
+        observer.disconnect();
+        clearTimeout(quietTimer);
+        clearTimeout(maxTimer);
+        resolve({count: count(), timedOut});
+    };
+    // Quiet period only counts once cards exist
+    const restartQuiet = () => {
+        clearTimeout(quietTimer);
+        if (last > 0) quietTimer = setTimeout(() => finish(false), quietMs);
+    };
+    const observer = new MutationObserver(() => {
+        const now = count();
+        if (now !== last) {
+            last = now;
+            restartQuiet();
+        }
+    });
+    observer.observe(document.documentElement, {childList: true, subtree: true});
+    const maxTimer = setTimeout(() => finish(true), maxMs);
+    restartQuiet();
+})
+"""
+
+
+class ReadinessStats:
+    """Recent wait times per kind ('lot', 'listing') and how often the max wait was hit"""
+
+    _shared = None
+
+    def __init__(self, keep: int = 500):
+        self.waits: Dict[str, deque] = {}
+        self.timeouts: Dict[str, int] = {}
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls) -> 'ReadinessStats':
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def record(self, kind: str, seconds: float, timed_out: bool):
+        with self._lock:
+            self.waits.setdefault(kind, deque(maxlen=self.keep)).append(seconds)
+            self.timeouts[kind] = self.timeouts.get(kind, 0) + timed_out
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {
+                kind: {
+                    'pages': len(waits),
+                    'median_s': round(statistics.median(waits), 2),
+                    'max_s': round(max(waits), 2),
+                    'max_wait_hit': self.timeouts.get(kind, 0),
+                }
+                for kind, waits in self.waits.items() if waits
+            }
+
+
+async def wait_lot_ready(page, max_wait: float = config.READY_LOT_MAX_WAIT) -> float:
+    """Wait until price and bidding counter are rendered; returns seconds waited"""
+    started = time.perf_counter()
+    timed_out = False
+    try:
+        await page.wait_for_function(_LOT_READY_JS, arg=[BIDDING_COUNTER_SELECTOR, PRICE_SELECTORS],
+                                     timeout=max(1, int(max_wait * 1000)), polling=config.READY_POLL_MS)
+    except Exception as e:
+        if type(e).__name__ != 'TimeoutError':
+            raise
+        timed_out = True
+    waited = time.perf_counter() - started
+    ReadinessStats.shared().record('lot', waited, timed_out)
+    print(f"[{time.strftime('%H:%M:%S')}] " + (f"⚠️  Lot not ready after {waited:.1f}s, continuing..." if timed_out
+                                               else f"✓ Lot ready in {waited:.2f}s"))
+    return waited
+
+
+async def wait_listing_stable(page, selector: str = LOT_CARD_SELECTOR, quiet_ms: int = config.READY_QUIET_MS,
+                              max_wait: float = config.READY_LISTING_MAX_WAIT) -> Optional[int]:
+    """Wait until the lot-card count stops changing; returns the card count"""
+    started = time.perf_counter()
+    result = await page.evaluate(_STABLE_COUNT_JS, [selector, quiet_ms, int(max_wait * 1000)])
+    waited = time.perf_counter() - started
+    ReadinessStats.shared().record('listing', waited, result['timedOut'])
+    print(f"[{time.strftime('%H:%M:%S')}] " + (
+        f"⚠️  Listing still changing after {waited:.1f}s ({result['count']} cards), continuing..."
+        if result['timedOut'] else f"✓ Listing stable in {waited:.2f}s ({result['count']} cards)"))
+    return result['count']
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Already-running browsers over CDP or a Playwright browser server
+
+With config.BROWSER_ENDPOINTS set, scrapers (batch CLI, category crawler,
+API, work_queue workers) don't launch Chromium: a lot or a category
+listing opens a context in one of the endpoints' browsers and closes only
+that context. Browser lifecycle is someone else's job (systemd, docker),
+so short CLI runs share warm browsers and skip the launch.
+
+    http://host:9222     Chrome with --remote-debugging-port (connect_over_cdp)
+    ws://host:3000/...   Playwright browser server (launchServer / playwright run-server,
+                         same Playwright version as here)
+
+Each browser is connected on first use and shared by every lot in the
+process; a lot goes to the endpoint with the fewest open contexts. An
+unreachable endpoint is skipped for BROWSER_ENDPOINT_RETRY_SECONDS; with
+none reachable lots launch their own browser as before. Fingerprint,
+cookies, stealth script and proxy go on the context - the browser's own
+flags (headless, --disable-blink-features=AutomationControlled) are up
+to whoever started it.
+
+CLI:
+    python remote_browsers.py    # connect to each endpoint and show its browser version
+"""
+
+import asyncio
+import time
+from typing import Optional, Dict, List
+
+import config
+
+
+class Endpoint:
+    def __init__(self, url: str):
+        self.url = url
+        self.kind = 'server' if url.startswith(('ws://', 'wss://')) else 'cdp'
+        self.browser = None
+        self.in_use = 0  # Open contexts (and connects in progress)
+        self.lots = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.down_until = 0.0
+        self.lock = asyncio.Lock()
+
+    @property
+    def connected(self) -> bool:
+        return self.browser is not None and self.browser.is_connected()
+
+    def summary(self) -> Dict:
+        return {
+            'url': self.url,
+            'kind': self.kind,
+            'connected': self.connected,
+            'version': self.browser.version if self.connected else None,
+            'in_use': self.in_use,
+            'lots': self.lots,
+            'failures': self.failures,
+            'last_error': self.last_error,
+            'retry_in_s': max(0, round(self.down_until - time.time())) if not self.connected else 0,
+        }
+
+
+class RemoteBrowsers:
+    _shared = None
+
+    def __init__(self, endpoints: List[str] = config.BROWSER_ENDPOINTS):
+        self.endpoints = [Endpoint(url) for url in dict.fromkeys(endpoints)]
+        self._playwright = None
+        self._driver_lock = asyncio.Lock()
+
+    @classmethod
+    def shared(cls) -> Optional['RemoteBrowsers']:
+        """Process-wide endpoints (None when config.BROWSER_ENDPOINTS is empty)"""
+        if cls._shared is None and config.BROWSER_ENDPOINTS:
+            cls._shared = cls()
+        return cls._shared
+
+    @classmethod
+    async def close_shared(cls):
+        if cls._shared is not None:
+            await cls._shared.close()
+            cls._shared = None
+
+    async def checkout(self) -> Optional[Endpoint]:
+        """
+        Endpoint for a lot: the one with the fewest open contexts, connected if needed
+
+        None when no endpoint is reachable - the caller launches its own browser.
+        Give it back with release().
+        """
+        tried = set()
+        while True:
+            now = time.time()
+            candidates = [e for e in self.endpoints
+                          if e.url not in tried and (e.connected or e.down_until <= now)]
+            if not candidates:
+                if self.endpoints:
+                    print(f"[{time.strftime('%H:%M:%S')}] ⚠️  No browser endpoint reachable, launching locally")
+                return None
+            endpoint = min(candidates, key=lambda e: (not e.connected, e.in_use, e.lots))
+            tried.add(endpoint.url)
+            endpoint.in_use += 1  # Counted while connecting, so concurrent lots spread out
+            if await self._connect(endpoint):
+                endpoint.lots += 1
+                return endpoint
+            endpoint.in_use -= 1
+
+    def release(self, endpoint: Endpoint):
+        endpoint.in_use = max(0, endpoint.in_use - 1)
+
+    async def _connect(self, endpoint: Endpoint) -> bool:
+        if endpoint.connected:
+            return True
+        async with endpoint.lock:
+            if endpoint.connected:
+                return True
+            if endpoint.down_until > time.time():
+                return False  # Failed while we waited for the lock
+            try:
+                async with self._driver_lock:
+                    if self._playwright is None:
+                        from playwright.async_api import async_playwright
+                        self._playwright = await async_playwright().start()
+                timeout = config.BROWSER_ENDPOINT_TIMEOUT * 1000
+                if endpoint.kind == 'cdp':
+                    endpoint.browser = await self._playwright.chromium.connect_over_cdp(endpoint.url, timeout=timeout)
+                else:
+                    endpoint.browser = await self._playwright.chromium.connect(endpoint.url, timeout=timeout)
+            except Exception as e:
+                endpoint.browser = None
+                endpoint.failures += 1
+                endpoint.last_error = str(e).splitlines()[0][:200] if str(e) else type(e).__name__
+                endpoint.down_until = time.time() + config.BROWSER_ENDPOINT_RETRY_SECONDS
+                print(f"[{time.strftime('%H:%M:%S')}] ⚠️  Browser endpoint {endpoint.url} unreachable: "
+                      f"{endpoint.last_error} (retry in {config.BROWSER_ENDPOINT_RETRY_SECONDS}s)")
+                return False
+            print(f"[{time.strftime('%H:%M:%S')}] 🔗 Connected to {endpoint.kind} browser {endpoint.url} "
+                  f"({endpoint.browser.version})")
+            return True
+
+    async def close(self):
+        """Disconnect; the browsers keep running (contexts were closed by their lots)"""
+        if self._playwright is not None:
+            try:
+                await self._playwright.stop()
+            except Exception:
+                pass
+            self._playwright = None
+        for endpoint in self.endpoints:
+            endpoint.browser = None
+
+    def summary(self) -> List[Dict]:
+        return [endpoint.summary() for endpoint in self.endpoints]
+
+
+def main():
+    if not config.BROWSER_ENDPOINTS:
+        print("No browser endpoints configured (BROWSER_ENDPOINTS) - scrapers launch their own Chromium")
+        return
+
+    async def check():
+        remote = RemoteBrowsers()
+        for endpoint in remote.endpoints:
+            ok = await remote._connect(endpoint)
+            detail = f"{endpoint.browser.version}, {len(endpoint.browser.contexts)} contexts open" if ok \
+                else endpoint.last_error
+            print(f"{'✅' if ok else '❌'} {endpoint.kind:<6} {endpoint.url}  {detail}")
+        await remote.close()
+
+    asyncio.run(check())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+In-memory RESP (Redis protocol) stand-in
+
+Implements the command subset work_queue.RedisWorkQueue uses, including
+WATCH/MULTI/EXEC, so the multi-host backend can be run and tested without
+a Redis install. Single process, nothing is persisted - for real
+deployments point WORK_QUEUE_URL at Redis.
+
+Usage: python resp_server.py [--port 6379]
+"""
+
+import sys
+import asyncio
+import time
+from bisect import insort
+from collections import defaultdict
+from typing import Dict, List
+
+
+class Status(str):
+    """Simple-string reply (+OK)"""
+
+
+class CommandError(Exception):
+    pass
+
+
+class Store:
+    def __init__(self):
+        self.data: Dict[str, object] = {}
+        self.versions: Dict[str, int] = defaultdict(int)  # Bumped on every write, for WATCH
+
+    def _get(self, key: str, kind: type):
+        value = self.data.get(key)
+        if value is None:
+            value = kind()
+            self.data[key] = value
+        elif not isinstance(value, kind):
+            raise CommandError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def _touch(self, *keys: str):
+        for key in keys:
+            self.versions[key] += 1
+            if key in self.data and not self.data[key]:
+                del self.data[key]
+
+    # Sets
+    def sadd(self, key, *members):
+        values = self._get(key, set)
+        added = len(set(members) - values)
+        values.update(members)
+        self._touch(key)
+        return added
+
+    def srem(self, key, *members):
+        values = self._get(key, set)
+        removed = len(values & set(members))
+        values.difference_update(members)
+        self._touch(key)
+        return removed
+
+    def smembers(self, key):
+        return sorted(self.data.get(key) or ())
+
+    def sismember(self, key, member):
+        return int(member in (self.data.get(key) or ()))
+
+    # Sorted sets (dict member -> score; ranges sort on demand, fine for a stand-in)
+    def zadd(self, key, *args):
+        values = self._get(key, dict)
+        only_existing = bool(args) and args[0].upper() == 'XX'
+        if only_existing:
+            args = args[1:]
+        added = 0
+        for score, member in zip(args[::2], args[1::2]):
+            if only_existing and member not in values:
+                continue
+            added += member not in values
+            values[member] = float(score)
+        self._touch(key)
+        return added
+
+    def zrem(self, key, *members):
+        values = self._get(key, dict)
+        removed = sum(1 for member in members if values.pop(member, None) is not None)
+        self._touch(key)
+        return removed
+
+    def zscore(self, key, member):
+        score = (self.data.get(key) or {}).get(member)
+        return None if score is None else repr(score)
+
+    def zcard(self, key):
+        return len(self.data.get(key) or ())
+
+    @staticmethod
+    def _bound(value: str) -> float:
+        return {'-inf': float('-inf'), '+inf': float('inf'), 'inf': float('inf')}.get(value) or float(value)
+
+    def zcount(self, key, low, high):
+        low, high = self._bound(low), self._bound(high)
+        return sum(1 for score in (self.data.get(key) or {}).values() if low <= score <= high)
+
+    def zrangebyscore(self, key, low, high, *options):
+        low, high = self._bound(low), self._bound(high)
+        ordered: List = []
+        for member, score in (self.data.get(key) or {}).items():
+            if low <= score <= high:
+                insort(ordered, (score, member))
+        members = [member for _, member in ordered]
+        if len(options) == 3 and options[0].upper() == 'LIMIT':
+            offset, count = int(options[1]), int(options[2])
+            members = members[offset:offset + count if count >= 0 else None]
+        return members
+
+    # Hashes
+    def hset(self, key, *args):
+        values = self._get(key, dict)
+        added = 0
+        for field, value in zip(args[::2], args[1::2]):
+            added += field not in values
+            values[field] = value
+        self._touch(key)
+        return added
+
+    def hget(self, key, field):
+        return (self.data.get(key) or {}).get(field)
+
+    def hmget(self, key, *fields):
+        values = self.data.get(key) or {}
+        return [values.get(field) for field in fields]
+
+    def hdel(self, key, *fields):
+        values = self._get(key, dict)
+        removed = sum(1 for field in fields if values.pop(field, None) is not None)
+        self._touch(key)
+        return removed
+
+    def hincrby(self, key, field, amount):
+        values = self._get(key, dict)
+        values[field] = str(int(values.get(field) or 0) + int(amount))
+        self._touch(key)
+        return int(values[field])
+
+    def hlen(self, key):
+        return len(self.data.get(key) or ())
+
+    def hvals(self, key):
+        return list((self.data.get(key) or {}).values())
+
+    # Keys
+    def delete(self, *keys):
+        removed = sum(1 for key in keys if self.data.pop(key, None) is not None)
+        for key in keys:
+            self.versions[key] += 1
+        return removed
+
+    def flushall(self):
+        for key in list(self.data):
+            self.versions[key] += 1
+        self.data.clear()
+        return Status('OK')
+
+
+COMMANDS = {
+    'SADD': Store.sadd, 'SREM': Store.srem, 'SMEMBERS': Store.smembers, 'SISMEMBER': Store.sismember,
+    'ZADD': Store.zadd, 'ZREM': Store.zrem, 'ZSCORE': Store.zscore, 'ZCARD': Store.zcard,
+    'ZCOUNT': Store.zcount, 'ZRANGEBYSCORE': Store.zrangebyscore,
+    'HSET': Store.hset, 'HGET': Store.hget, 'HMGET': Store.hmget, 'HDEL': Store.hdel,
+    'HINCRBY': Store.hincrby, 'HLEN': Store.hlen, 'HVALS': Store.hvals,
+    'DEL': Store.delete, 'FLUSHALL': Store.flushall,
+}
+
+
+def encode(value) -> bytes:
+    if isinstance(value, Status):
+        return f"+{value}\r\n".encode()
+    if isinstance(value, CommandError):
+        return f"-{value}\r\n".encode()
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, bool) or isinstance(value, int):
+        return f":{int(value)}\r\n".encode()
+    if isinstance(value, (list, tuple)):
+        return f"*{len(value)}\r\n".encode() + b''.join(encode(item) for item in value)
+    data = str(value).encode('utf-8')
+    return f"${len(data)}\r\n".encode() + data + b"\r\n"
+
+
+async def read_command(reader: asyncio.StreamReader) -> List[str]:
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError
+    if not line.startswith(b'*'):
+        return line.decode().split()  # Inline command (redis-cli / telnet)
+    args = []
+    for _ in range(int(line[1:])):
+        length = int((await reader.readline())[1:])
+        args.append((await reader.readexactly(length + 2))[:-2].decode('utf-8'))
+    return args
+
+
+class RespServer:
+    def __init__(self):
+        self.store = Store()
+
+    def run(self, name: str, args: List[str]):
+        handler = COMMANDS.get(name)
+        if handler is None:
+            raise CommandError(f"ERR unknown command '{name}'")
+        try:
+            return handler(self.store, *args)
+        except TypeError:
+            raise CommandError(f"ERR wrong number of arguments for '{name.lower()}' command")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        watched: Dict[str, int] = {}
+        queued = None
+        try:
+            while True:
+                args = await read_command(reader)
+                if not args:
+                    continue
+                name, args = args[0].upper(), args[1:]
+                try:
+                    if name in ('PING',):
+                        reply = Status('PONG')
+                    elif name in ('AUTH', 'SELECT'):
+                        reply = Status('OK')
+                    elif name == 'WATCH':
+                        watched.update({key: self.store.versions[key] for key in args})
+                        reply = Status('OK')
+                    elif name == 'UNWATCH':
+                        watched = {}
+                        reply = Status('OK')
+                    elif name == 'MULTI':
+                        queued = []
+                        reply = Status('OK')
+                    elif name == 'DISCARD':
+                        queued, watched = None, {}
+                        reply = Status('OK')
+                    elif name == 'EXEC':
+                        if queued is None:
+                            raise CommandError("ERR EXEC without MULTI")
+                        changed = any(self.store.versions[key] != version for key, version in watched.items())
+                        reply = None if changed else [self._safe_run(n, a) for n, a in queued]
+                        queued, watched = None, {}
+                    elif queued is not None:
+                        queued.append((name, args))
+                        reply = Status('QUEUED')
+                    else:
+                        reply = self.run(name, args)
+                except CommandError as e:
+                    reply = e
+                writer.write(encode(reply))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _safe_run(self, name: str, args: List[str]):
+        try:
+            return self.run(name, args)
+        except CommandError as e:
+            return e
+
+
+async def serve(host: str = '127.0.0.1', port: int = 6379):
+    server = await asyncio.start_server(RespServer().handle, host, port)
+    print(f"[{time.strftime('%H:%M:%S')}] 🧪 RESP stand-in on {host}:{port} "
+          f"(WORK_QUEUE_URL=redis://{host}:{port}/0)")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    port = 6379
+    if '--port' in sys.argv and sys.argv.index('--port') + 1 < len(sys.argv):
+        port = int(sys.argv[sys.argv.index('--port') + 1])
+    host = '0.0.0.0' if '--public' in sys.argv else '127.0.0.1'
+    try:
+        asyncio.run(serve(host, port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
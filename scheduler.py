@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+End-date-aware re-scrape scheduler
+
+Tracked lots sit in a heap keyed on their next due time. The re-check
+interval tightens as the lot's end date approaches (config.SCHEDULE_TIERS:
+daily, hourly, every 5 minutes, every minute in the last 10 minutes),
+lots are scraped with a global concurrency cap and dropped once they
+have closed. The queue is persisted after every check; new lots are
+added through an inbox file so the CLI can feed a running daemon.
+"""
+
+import sys
+import asyncio
+import heapq
+import json
+import os
+import signal
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional, Dict, List
+
+import config
+from lot import Lot
+from lot_fields import lot_id_from_url
+from scraper_pro import CatawikiScraperPro
+from sinks import RunSinks
+from watcher import WatchSink
+
+
+def next_check(end_date: Optional[datetime], now: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    When to look at a lot next (None once it has closed)
+
+    The due time never skips over a tier boundary, so a lot checked daily
+    is picked up exactly when it enters the hourly window.
+    """
+    now = now or datetime.now()
+    if end_date is None:
+        return now + timedelta(seconds=config.SCHEDULE_DEFAULT_INTERVAL)
+
+    remaining = (end_date - now).total_seconds()
+    if remaining <= 0:
+        return None
+
+    for threshold, interval in config.SCHEDULE_TIERS:
+        if remaining > threshold:
+            due = now + timedelta(seconds=interval)
+            if threshold > 0:
+                return min(due, end_date - timedelta(seconds=threshold))
+            # Final tier: one last look just after the end for the hammer price
+            return min(due, end_date + timedelta(seconds=config.SCHEDULE_CLOSE_GRACE))
+    return None
+
+
+class Scheduler:
+    """
+    Priority-queue re-scrape daemon
+
+    Args:
+        queue_path: Persisted queue (JSON)
+        inbox_path: Lot URLs appended here are picked up by the running daemon
+        concurrency: Lots scraped at the same time (each check launches a browser)
+        work_queue: work_queue.WorkQueue - checks run on worker nodes, concurrency is then
+                    the number of checks in flight
+    """
+
+    def __init__(self, queue_path: str = config.SCHEDULE_QUEUE_FILE, inbox_path: str = config.SCHEDULE_INBOX_FILE,
+                 concurrency: int = config.SCHEDULE_CONCURRENCY, headless: bool = True, work_queue=None):
+        self.queue_path = queue_path
+        self.inbox_path = inbox_path
+        self.concurrency = max(1, concurrency)
+        self.headless = headless
+        self.work_queue = work_queue
+        self.lots: Dict[str, Dict] = {}  # lot_id -> entry
+        self.heap: List = []  # (due timestamp, lot_id); stale items are skipped on pop
+        self.active: set = set()
+        self.sinks: Optional[RunSinks] = None
+        self._stopping = False
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.queue_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f).get('lots', [])
+        except (FileNotFoundError, ValueError):
+            entries = []
+        for entry in entries:
+            self.lots[entry['lot_id']] = entry
+            heapq.heappush(self.heap, (entry['due'], entry['lot_id']))
+
+    def save(self):
+        """Rewrite the queue atomically (temp file, then rename)"""
+        Path(self.queue_path).parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{self.queue_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'updated_at': datetime.now().isoformat(), 'lots': list(self.lots.values())}, f, indent=1)
+        os.replace(tmp_path, self.queue_path)
+
+    def add(self, url: str, end_date: Optional[datetime] = None, due: Optional[float] = None) -> bool:
+        """Track a lot (already tracked lots keep their schedule)"""
+        lot_id = lot_id_from_url(url)
+        if not lot_id or lot_id in self.lots:
+            return False
+        self.lots[lot_id] = {
+            'lot_id': lot_id,
+            'url': url,
+            'due': due if due is not None else time.time(),
+            'end_date': end_date.isoformat() if end_date else None,
+            'checks': 0,
+            'failures': 0,
+            'last_checked': None,
+            'last_price': None,
+        }
+        heapq.heappush(self.heap, (self.lots[lot_id]['due'], lot_id))
+        return True
+
+    def _reschedule(self, entry: Dict, due: float):
+        entry['due'] = due
+        heapq.heappush(self.heap, (due, entry['lot_id']))
+
+    def drain_inbox(self) -> int:
+        """Pick up URLs appended by `python scheduler.py add` (rename first, so no line is lost)"""
+        if not os.path.exists(self.inbox_path):
+            return 0
+        claimed = f"{self.inbox_path}.{os.getpid()}"
+        os.replace(self.inbox_path, claimed)
+        added = 0
+        with open(claimed, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip() and self.add(line.strip()):
+                    added += 1
+        os.remove(claimed)
+        if added:
+            print(f"[{time.strftime('%H:%M:%S')}] 📥 {added} lots added from inbox ({len(self.lots)} tracked)")
+            self.save()
+        return added
+
+    def pop_due(self, now: float) -> Optional[Dict]:
+        while self.heap and self.heap[0][0] <= now:
+            due, lot_id = heapq.heappop(self.heap)
+            entry = self.lots.get(lot_id)
+            if entry and entry['due'] == due and lot_id not in self.active:
+                return entry
+        return None
+
+    def seconds_until_next(self, now: float) -> float:
+        # Drop stale heap heads so the sleep is based on a live entry
+        while self.heap and (self.heap[0][1] not in self.lots or self.lots[self.heap[0][1]]['due'] != self.heap[0][0]):
+            heapq.heappop(self.heap)
+        if not self.heap:
+            return config.SCHEDULE_TICK
+        return max(0.0, min(self.heap[0][0] - now, config.SCHEDULE_TICK))
+
+    async def check(self, entry: Dict):
+        """Scrape one lot and schedule its next visit"""
+        url = entry['url']
+        print(f"[{time.strftime('%H:%M:%S')}] 🔁 Checking lot {entry['lot_id']} (check #{entry['checks'] + 1})")
+        try:
+            if self.work_queue:
+                data = await self.work_queue.fetch('scheduler', url)
+            else:
+                scraper = CatawikiScraperPro(headless=self.headless, job_id='scheduler')
+                data = await scraper.scrape_listing(url)
+        except Exception as e:
+            print(f"[{time.strftime('%H:%M:%S')}] ❌ Lot {entry['lot_id']}: {e}")
+            data = None
+
+        entry['checks'] += 1
+        entry['last_checked'] = datetime.now().isoformat()
+
+        if not data or not data.get('title'):
+            entry['failures'] += 1
+            self.sinks.fail(url, "No data extracted")
+            if entry['failures'] >= config.SCHEDULE_MAX_FAILURES:
+                print(f"[{time.strftime('%H:%M:%S')}] 🗑️  Dropping lot {entry['lot_id']} after {entry['failures']} failures")
+                del self.lots[entry['lot_id']]
+            else:
+                self._reschedule(entry, time.time() + config.SCHEDULE_RETRY_DELAY * entry['failures'])
+            return
+
+        self.sinks.write(data)
+        lot = Lot.from_scraped(data)
+        entry['failures'] = 0
+        entry['end_date'] = lot.end_date.isoformat() if lot.end_date else entry['end_date']
+        entry['last_price'] = lot.display_price
+
+        end_date = lot.end_date or (datetime.fromisoformat(entry['end_date']) if entry['end_date'] else None)
+        due = next_check(end_date)
+        if due is None:
+            print(f"[{time.strftime('%H:%M:%S')}] 🏁 Lot {entry['lot_id']} closed at {entry['last_price']}")
+            del self.lots[entry['lot_id']]
+        else:
+            self._reschedule(entry, due.timestamp())
+            print(f"[{time.strftime('%H:%M:%S')}] 📅 Lot {entry['lot_id']} {entry['last_price']}, "
+                  f"next check {due.strftime('%Y-%m-%d %H:%M:%S')}")
+
+    async def _run_check(self, entry: Dict):
+        try:
+            await self.check(entry)
+        finally:
+            self.active.discard(entry['lot_id'])
+            self.save()
+
+    def stop(self):
+        self._stopping = True
+
+    async def run(self):
+        """Dispatch due lots until stopped (SIGINT/SIGTERM)"""
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        # With a webhook configured, every check also feeds watch mode (price, bids, extensions, close)
+        self.sinks = RunSinks('output', f"scheduler_{datetime.now().strftime('%Y%m%d_%H%M%S')}", save_csv=False,
+                              meta={'job_id': 'scheduler'}, watch=WatchSink() if config.WATCH_WEBHOOK_URL else None)
+        tasks = set()
+        print(f"[{time.strftime('%H:%M:%S')}] ⏰ Scheduler started: {len(self.lots)} lots, concurrency {self.concurrency}")
+        try:
+            while not self._stopping:
+                self.drain_inbox()
+                now = time.time()
+                while len(self.active) < self.concurrency:
+                    entry = self.pop_due(now)
+                    if not entry:
+                        break
+                    self.active.add(entry['lot_id'])
+                    task = asyncio.create_task(self._run_check(entry))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                await asyncio.sleep(self.seconds_until_next(time.time()) if len(self.active) < self.concurrency
+                                    else config.SCHEDULE_TICK)
+        finally:
+            if tasks:
+                print(f"[{time.strftime('%H:%M:%S')}] ⏳ Waiting for {len(tasks)} running checks...")
+                await asyncio.gather(*tasks, return_exceptions=True)
+            self.save()
+            self.sinks.close('completed')
+            print(f"[{time.strftime('%H:%M:%S')}] 👋 Scheduler stopped, {len(self.lots)} lots queued")
+
+
+def enqueue(urls: List[str], inbox_path: str = config.SCHEDULE_INBOX_FILE):
+    """Hand lots to the (running or next) scheduler daemon"""
+    Path(inbox_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(inbox_path, 'a', encoding='utf-8') as f:
+        for url in urls:
+            f.write(url.strip() + '\n')
+
+
+def main():
+    usage = (
+        "Usage:\n"
+        "  python scheduler.py run [--concurrency N] [--show-browser] [--distributed]\n"
+        "  python scheduler.py add <lot_url ...|urls.txt>\n"
+        "  python scheduler.py add --from-store      # all open lots from the lot history store\n"
+        "  python scheduler.py list"
+    )
+    if len(sys.argv) < 2:
+        print(usage)
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == 'run':
+        concurrency = config.SCHEDULE_CONCURRENCY
+        if '--concurrency' in sys.argv and sys.argv.index('--concurrency') + 1 < len(sys.argv):
+            concurrency = int(sys.argv[sys.argv.index('--concurrency') + 1])
+        work_queue = None
+        if '--distributed' in sys.argv:
+            # Checks run on worker nodes (python work_queue.py work)
+            from work_queue import WorkQueue
+            work_queue = WorkQueue.shared()
+        scheduler = Scheduler(concurrency=concurrency, headless='--show-browser' not in sys.argv, work_queue=work_queue)
+        asyncio.run(scheduler.run())
+
+    elif command == 'add' and len(sys.argv) > 2:
+        if sys.argv[2] == '--from-store':
+            from lot_store import LotStore
+            store = LotStore()
+            now = datetime.now()
+            lots = store.ending_between(now.strftime('%Y-%m-%d %H:%M:%S'), '9999-12-31')
+            store.close()
+            urls = [lot['url'] for lot in lots]
+        elif len(sys.argv) == 3 and Path(sys.argv[2]).exists():
+            with open(sys.argv[2], 'r') as f:
+                urls = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+        else:
+            urls = sys.argv[2:]
+        urls = [url for url in urls if lot_id_from_url(url)]
+        enqueue(urls)
+        print(f"📥 {len(urls)} lots queued for the scheduler")
+
+    elif command == 'list':
+        scheduler = Scheduler()
+        entries = sorted(scheduler.lots.values(), key=lambda entry: entry['due'])
+        for entry in entries:
+            due = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['due']))
+            print(f"{entry['lot_id']:<10} next {due}  ends {entry['end_date'] or '?':<19}  "
+                  f"{entry['last_price'] or '-':>10}  checks {entry['checks']}")
+        print(f"\n⏰ {len(entries)} lots tracked")
+
+    else:
+        print(usage)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -11,118 +11,280 @@ import re
 import csv
 from datetime import datetime
 from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeout
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Callable
 from pathlib import Path
+from selector_stats import SelectorStats
+from debug_artifacts import ArtifactStore, shared_store
+from lot_fields import lot_id_from_url
+from proxy_pool import ProxyPool, ProxyLease
+from session_pool import SessionPool, Session
+from browser_pool import BrowserPool, PooledBrowser, new_context, context_key
+from remote_browsers import RemoteBrowsers, Endpoint
+from circuit_breaker import Breakers, detect_block, host_key
+from deadline import Deadline, DeadlineExceeded, DeadlineStats
+from readiness import wait_lot_ready
+from memory_governor import MemoryGovernor, BrowserSlot
+from tracing import span, LOT_SPAN
+import config
 
 
 class CatawikiScraperPro:
-    def __init__(self, headless: bool = True, proxy: Optional[str] = None):
+    def __init__(self, headless: bool = True, proxy: Optional[str] = None,
+                 selector_stats: Optional[SelectorStats] = None, job_id: Optional[str] = None,
+                 artifacts: Optional[ArtifactStore] = None, proxy_pool: Optional[ProxyPool] = None,
+                 sessions: Optional[SessionPool] = None, lot_budget: float = config.LOT_BUDGET_SECONDS):
         self.headless = headless
         self.proxy = proxy
+        # An explicit proxy wins; otherwise lots go through the configured pool (empty pool: direct)
+        self.proxy_pool = None if proxy else (proxy_pool or ProxyPool.shared())
+        self.sessions = sessions or SessionPool.shared()  # Warm fingerprint + cookies per lot (None: fresh context)
+        self.breakers = Breakers.shared()
+        self.governor = MemoryGovernor.shared()  # Browsers at once, recycling (memory_governor.py)
+        self.browser_pool = BrowserPool.shared()  # Warm browsers (api_server only; None: launch per lot)
+        self.remote = RemoteBrowsers.shared()  # External browsers (config.BROWSER_ENDPOINTS) before either
+        self.lot_budget = lot_budget  # Seconds per lot across all stages (deadline.py)
+        self.selector_stats = selector_stats or SelectorStats.shared()
+        self.job_id = job_id  # Groups debug artifacts per API job / batch run
+        self.artifacts = artifacts or shared_store()
+        self.partial: Optional[Dict] = None  # Last lot's extracted data, kept if the lot is cancelled afterwards
 
     async def scrape_listing(self, url: str) -> Optional[Dict]:
         """Scrape Catawiki listing with clean data"""
-
-        print(f"[{time.strftime('%H:%M:%S')}] 🚀 Starting browser...")
-
-        async with async_playwright() as p:
-            try:
-                # Launch browser
-                launch_args = {
-                    'headless': self.headless,
-                    'args': [
-                        '--disable-blink-features=AutomationControlled',
-                        '--disable-dev-shm-usage',
-                        '--no-sandbox',
-                        '--disable-setuid-sandbox',
-                        '--disable-web-security',
-                        '--disable-features=IsolateOrigins,site-per-process',
-                        '--disable-gpu',
-                        '--single-process',
-                    ],
-                    'timeout': 30000,
-                }
-
-                if self.proxy:
-                    launch_args['proxy'] = {'server': self.proxy}
-
-                browser = await p.chromium.launch(**launch_args)
-                print(f"[{time.strftime('%H:%M:%S')}] ✓ Browser launched")
-
-                # Create context
-                context = await browser.new_context(
-                    viewport={'width': 1920, 'height': 1080},
-                    user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                    locale='en-US',
-                    timezone_id='Europe/Amsterdam',
-                    extra_http_headers={
-                        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                        'Accept-Language': 'en-US,en;q=0.9',
-                        'Accept-Encoding': 'gzip, deflate, br',
-                        'Connection': 'keep-alive',
-                        'Upgrade-Insecure-Requests': '1',
+        with span(LOT_SPAN, lot_id=lot_id_from_url(url), job_id=self.job_id, url=url) as lot_span:
+            # Pauses here (no browser launched) while the host's circuit breaker is open
+            with span('breaker_wait'):
+                await self.breakers.admit(url)
+            # Browser slot before the proxy: a lot waiting for memory doesn't hold a proxy
+            async with self.governor.slot(lot_id_from_url(url)) as browser_slot:
+                lease = ProxyLease(None)
+                try:
+                    if not self.proxy_pool:
+                        return await self._scrape_in_session(url, {'server': self.proxy} if self.proxy else None,
+                                                             lease, browser_slot)
+
+                    async with self.proxy_pool.lease() as lease:
+                        return await self._scrape_in_session(url, lease.playwright, lease, browser_slot)
+                except asyncio.CancelledError:
+                    lease.outcome = 'cancelled'  # Client gone / job cancelled: no one's fault
+                    raise
+                except BaseException:
+                    lease.outcome = 'error'
+                    raise
+                finally:
+                    self.breakers.record(host_key(url), lease.outcome, lease.error)
+                    if lot_span:
+                        lot_span.set(outcome=lease.outcome, reason=lease.error,
+                                     proxy=lease.proxy.name if lease.proxy else None)
+
+    async def _scrape_in_session(self, url: str, proxy: Optional[Dict], lease: ProxyLease,
+                                 browser_slot: Optional[BrowserSlot] = None) -> Optional[Dict]:
+        """Run the lot in a warm session; the lot's outcome goes to the proxy lease and the session"""
+        session = self.sessions.acquire(lease.proxy.name if lease.proxy else None) if self.sessions else None
+        try:
+            data = await self._scrape_listing(url, proxy, lease, session, browser_slot)
+            if data is None and lease.outcome == 'ok':
+                lease.outcome = 'error'
+            return data
+        except asyncio.CancelledError:
+            lease.outcome = 'cancelled'
+            raise
+        except BaseException:
+            lease.outcome = 'error'
+            raise
+        finally:
+            if session:
+                self.sessions.release(session, lease.outcome, lease.error)
+
+    async def _scrape_listing(self, url: str, proxy: Optional[Dict] = None,
+                              lease: Optional[ProxyLease] = None, session: Optional[Session] = None,
+                              browser_slot: Optional[BrowserSlot] = None) -> Optional[Dict]:
+        # Server only: a warm browser from the pool when one is idle (browser_pool.py)
+        pool = self.browser_pool if self.browser_pool and self.browser_pool.serves(self.headless) else None
+        via = [f"proxy {lease.proxy.name}"] if lease and lease.proxy else []
+        if session:
+            via.append(f"{'warm' if session.warm else 'cold'} session {session.session_id}")
+        print(f"[{time.strftime('%H:%M:%S')}] 🚀 Starting browser" + (f" ({', '.join(via)})" if via else '') + "...")
+        generation = session.rotations if session else None
+
+        deadline = Deadline(self.lot_budget, lot_id_from_url(url))
+        overrun = None
+
+        playwright = None
+        endpoint = None
+        pooled = None
+        browser = None
+        context = None
+        page = None
+        try:
+            async with deadline.stage('launch'):
+                if self.remote:
+                    endpoint = await self.remote.checkout()
+                    if endpoint:
+                        browser = endpoint.browser
+                if browser is None and pool:
+                    checked_out = pool.checkout(context_key(session, proxy))
+                    if checked_out:
+                        pooled, context = checked_out
+                        browser = pooled.browser
+                if browser is None:
+                    launch_args = {
+                        'headless': self.headless,
+                        'args': [
+                            '--disable-blink-features=AutomationControlled',
+                            '--disable-dev-shm-usage',
+                            '--no-sandbox',
+                            '--disable-setuid-sandbox',
+                            '--disable-web-security',
+                            '--disable-features=IsolateOrigins,site-per-process',
+                            '--disable-gpu',
+                            '--single-process',
+                        ],
+                        'timeout': deadline.timeout_ms(30000),
                     }
-                )
 
-                # Add stealth script
-                await context.add_init_script("""
-                    Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
-                    Object.defineProperty(navigator, 'plugins', {get: () => [1, 2, 3]});
-                    Object.defineProperty(navigator, 'languages', {get: () => ['en-US', 'en']});
-                    window.chrome = {runtime: {}};
-                """)
+                    if proxy:
+                        launch_args['proxy'] = proxy
+                    if browser_slot:
+                        launch_args['args'].append(browser_slot.marker)  # Memory governor finds the process by it
+
+                    playwright = await async_playwright().start()
+                    browser = await playwright.chromium.launch(**launch_args)
+            # An external browser isn't ours to measure or close - the governor only counts the slot
+            if browser_slot and not endpoint:
+                browser_slot.attach(browser, pooled.marker if pooled else None)
+            if endpoint:
+                print(f"[{time.strftime('%H:%M:%S')}] ✓ Connected browser {endpoint.url}")
+            elif pooled:
+                print(f"[{time.strftime('%H:%M:%S')}] ✓ Warm browser from pool" + (" with spare context" if context else ''))
+            else:
+                print(f"[{time.strftime('%H:%M:%S')}] ✓ Browser launched")
 
+            # Create context (session: its fingerprint and cookies); a shared browser takes the proxy here
+            async with deadline.stage('context'):
+                if context is None:
+                    context = await new_context(browser, session, proxy if pooled or endpoint else None)
                 page = await context.new_page()
-                print(f"[{time.strftime('%H:%M:%S')}] ✓ Page created")
+            print(f"[{time.strftime('%H:%M:%S')}] ✓ Page created")
 
-                # Navigate
-                print(f"[{time.strftime('%H:%M:%S')}] 🌐 Loading: {url[:80]}...")
+            # Navigate
+            print(f"[{time.strftime('%H:%M:%S')}] 🌐 Loading: {url[:80]}...")
 
-                try:
-                    response = await page.goto(url, wait_until='domcontentloaded', timeout=20000)
-                    print(f"[{time.strftime('%H:%M:%S')}] ✓ Page loaded (status: {response.status if response else 'unknown'})")
-
-                    if response and response.status == 403:
-                        print(f"[{time.strftime('%H:%M:%S')}] ⚠️  Got 403 - Akamai blocked")
-                        await browser.close()
-                        return None
-
-                except PlaywrightTimeout:
-                    print(f"[{time.strftime('%H:%M:%S')}] ⚠️  Timeout on goto, continuing...")
-
-                # Wait for content
-                print(f"[{time.strftime('%H:%M:%S')}] ⏳ Waiting for content...")
-                try:
-                    await page.wait_for_selector('h1', timeout=10000)
-                    print(f"[{time.strftime('%H:%M:%S')}] ✓ Title element found")
-                except PlaywrightTimeout:
-                    print(f"[{time.strftime('%H:%M:%S')}] ⚠️  Title element not found, continuing...")
-
-                await asyncio.sleep(2)
-
-                # Extract data
-                print(f"[{time.strftime('%H:%M:%S')}] 📊 Extracting data...")
-                data = await self._extract_data(page)
-
-                # Save screenshot
-                try:
-                    await page.screenshot(path='debug_screenshot.png')
-                    print(f"[{time.strftime('%H:%M:%S')}] 📸 Screenshot saved")
-                except Exception as e:
-                    print(f"[{time.strftime('%H:%M:%S')}] ⚠️  Screenshot failed: {e}")
-
-                await browser.close()
-                print(f"[{time.strftime('%H:%M:%S')}] ✓ Browser closed")
-
-                return data
+            try:
+                async with deadline.stage('goto'):
+                    response = await page.goto(url, wait_until='domcontentloaded', timeout=deadline.timeout_ms(20000))
+                print(f"[{time.strftime('%H:%M:%S')}] ✓ Page loaded (status: {response.status if response else 'unknown'})")
+
+                block = detect_block(response.status if response else None)
+                if block:
+                    print(f"[{time.strftime('%H:%M:%S')}] ⚠️  Got {response.status} - Akamai blocked")
+                    if lease:
+                        lease.outcome, lease.error = 'blocked', block
+                    await self.artifacts.capture(page, lot_id_from_url(url), self.job_id, 'blocked')
+                    return None
+
+            except PlaywrightTimeout:
+                print(f"[{time.strftime('%H:%M:%S')}] ⚠️  Timeout on goto, continuing...")
+
+            # Wait for content
+            print(f"[{time.strftime('%H:%M:%S')}] ⏳ Waiting for content...")
+            try:
+                async with deadline.stage('wait_h1'):
+                    await page.wait_for_selector('h1', timeout=deadline.timeout_ms(10000))
+                print(f"[{time.strftime('%H:%M:%S')}] ✓ Title element found")
+            except PlaywrightTimeout:
+                print(f"[{time.strftime('%H:%M:%S')}] ⚠️  Title element not found, continuing...")
+
+            # Price and bidding counter rendered (instead of a flat 2s sleep)
+            async with deadline.stage('ready'):
+                await wait_lot_ready(page, min(config.READY_LOT_MAX_WAIT, deadline.remaining()))
+
+            # Extract data
+            print(f"[{time.strftime('%H:%M:%S')}] 📊 Extracting data...")
+            # Selector hits only count once the page turned out to be a lot page (not a challenge/empty render)
+            with self.selector_stats.collect() as observations:
+                data = await deadline.run('extract', self._extract_data(page))
+            self.partial = data
+
+            # No title: challenge page (dropped) or an empty h1 - both are block signals,
+            # an empty h1 only counts after BREAKER_EMPTY_H1_THRESHOLD in a row (slow render)
+            failed = not data.get('title')
+            if failed:
+                block = detect_block(html=await page.content(), h1_text='')
+                print(f"[{time.strftime('%H:%M:%S')}] ⚠️  Block signal: {block}")
+                if lease:
+                    lease.outcome, lease.error = 'blocked', block
+                if block == 'challenge':
+                    await self.artifacts.capture(page, lot_id_from_url(url), self.job_id, 'blocked')
+                    return None
+            else:
+                observations.commit()
+                self.selector_stats.save()
+
+            # Debug artifacts - always for failed extractions, sampled otherwise
+            if self.artifacts.should_capture(failed):
+                async with deadline.stage('artifacts'):
+                    await self.artifacts.capture(page, lot_id_from_url(url), self.job_id,
+                                                 'failed' if failed else 'sample')
+
+            if session and not failed:
+                await self.sessions.save_state(session, context, generation)
+
+            print(f"[{time.strftime('%H:%M:%S')}] ✓ Lot done ({deadline.elapsed():.1f}s: {deadline.describe()})")
+
+            return data
+
+        except DeadlineExceeded as e:
+            # No artifact capture here - it would run past the budget too
+            overrun = e.stage
+            print(f"[{time.strftime('%H:%M:%S')}] ⏱️  {e}")
+            if lease:
+                lease.error = f"deadline:{e.stage}"
+            return None
+
+        except asyncio.CancelledError:
+            # Client gone / job cancelled: the browser is closed (finally) before giving up the slot
+            print(f"[{time.strftime('%H:%M:%S')}] 🛑 Cancelled during '{deadline.current or 'start'}'")
+            if lease:
+                lease.error = 'cancelled'
+            raise
 
-            except Exception as e:
-                print(f"[{time.strftime('%H:%M:%S')}] ❌ Error: {e}")
+        except Exception as e:
+            print(f"[{time.strftime('%H:%M:%S')}] ❌ Error: {e}")
+            if lease:
+                # Closed by the memory governor: not the site's or the proxy's doing
+                lease.error = 'memory_critical' if browser_slot and browser_slot.killed else str(e)[:200]
+            if page is not None:
+                await self.artifacts.capture(page, lot_id_from_url(url), self.job_id, 'error')
+            return None
+
+        finally:
+            DeadlineStats.shared().record(deadline, overrun)
+            await self._close_browser(playwright, browser, context, pooled, browser_slot, endpoint)
+
+    async def _close_browser(self, playwright, browser, context, pooled: Optional[PooledBrowser],
+                             browser_slot: Optional[BrowserSlot], endpoint: Optional[Endpoint] = None):
+        """Close what the lot launched; a pooled or external browser only loses the lot's context"""
+        if pooled or endpoint:
+            if context is not None:
                 try:
-                    await browser.close()
-                except:
+                    await context.close()
+                except Exception:
                     pass
-                return None
+            if endpoint:
+                self.remote.release(endpoint)
+            else:
+                self.browser_pool.release(pooled, recycle=bool(browser_slot and browser_slot.recycle),
+                                          killed=bool(browser_slot and browser_slot.killed))
+        elif browser is not None:
+            try:
+                await browser.close()
+            except Exception:
+                pass
+        if playwright is not None:
+            try:
+                await playwright.stop()
+            except Exception:
+                pass
 
     async def _extract_data(self, page) -> Dict:
         """Extract clean data from page"""
@@ -140,24 +302,21 @@ class CatawikiScraperPro:
         }
 
         # Get page text
-        try:
-            page_text = await page.inner_text('body')
-        except:
-            page_text = ""
+        with span('extract.body_text'):
+            try:
+                page_text = await page.inner_text('body')
+            except:
+                page_text = ""
 
         # Extract title
         title_selectors = ['h1', '[data-testid*="title"]', '.lot-title', 'main h1']
-        for selector in title_selectors:
-            try:
-                element = await page.query_selector(selector)
-                if element:
-                    text = await element.inner_text()
-                    if text and len(text) > 5:
-                        data['title'] = text.strip()
-                        print(f"[{time.strftime('%H:%M:%S')}] ✓ Title: {data['title'][:60]}...")
-                        break
-            except:
-                continue
+        with span('extract.title'):
+            data['title'] = await self._first_match(
+                page, 'title', title_selectors,
+                lambda text: text.strip() if text and len(text) > 5 else None
+            )
+        if data['title']:
+            print(f"[{time.strftime('%H:%M:%S')}] ✓ Title: {data['title'][:60]}...")
 
         # Extract product images only (filter out icons, flags, logos)
         image_selectors = [
@@ -167,15 +326,16 @@ class CatawikiScraperPro:
         ]
 
         all_images = []
-        for selector in image_selectors:
-            try:
-                images = await page.query_selector_all(selector)
-                for img in images:
-                    src = await img.get_attribute('src')
-                    if src and self._is_product_image(src):
-                        all_images.append(src)
-            except:
-                continue
+        with span('extract.images'):
+            for selector in image_selectors:
+                try:
+                    images = await page.query_selector_all(selector)
+                    for img in images:
+                        src = await img.get_attribute('src')
+                        if src and self._is_product_image(src):
+                            all_images.append(src)
+                except:
+                    continue
 
         # Remove duplicates and keep only unique product images
         data['images'] = list(dict.fromkeys(all_images))
@@ -197,27 +357,51 @@ class CatawikiScraperPro:
                 break
 
         # Extract seller name (clean version)
-        data['seller_name'] = await self._extract_seller_name(page)
+        with span('extract.seller_name'):
+            data['seller_name'] = await self._extract_seller_name(page, page_text)
         if data['seller_name']:
             print(f"[{time.strftime('%H:%M:%S')}] ✓ Seller: {data['seller_name']}")
 
         # Extract price
-        data['current_price'] = await self._extract_price(page, page_text)
+        with span('extract.current_price'):
+            data['current_price'] = await self._extract_price(page, page_text)
         if data['current_price']:
             print(f"[{time.strftime('%H:%M:%S')}] ✓ Price: {data['current_price']}")
 
         # Extract shipping cost
-        data['shipping_cost'] = await self._extract_shipping_cost(page, page_text)
+        with span('extract.shipping_cost'):
+            data['shipping_cost'] = await self._extract_shipping_cost(page, page_text)
         if data['shipping_cost']:
             print(f"[{time.strftime('%H:%M:%S')}] ✓ Shipping: {data['shipping_cost']}")
 
         # Extract end date
-        data['end_date'] = await self._extract_end_date(page, page_text)
+        with span('extract.end_date'):
+            data['end_date'] = await self._extract_end_date(page, page_text)
         if data['end_date']:
             print(f"[{time.strftime('%H:%M:%S')}] ✓ End date: {data['end_date']}")
 
         return data
 
+    async def _first_match(self, page, field: str, selectors: List[str],
+                           accept: Callable[[str], Optional[str]]) -> Optional[str]:
+        """
+        Try selectors best-first (see selector_stats.py) and return the first
+        accepted value. Every tried selector's hit and latency is recorded.
+        """
+        for selector in self.selector_stats.order(field, selectors):
+            started = time.perf_counter()
+            value = None
+            try:
+                element = await page.query_selector(selector)
+                if element:
+                    value = accept(await element.inner_text())
+            except Exception:
+                value = None
+            self.selector_stats.record(field, selector, bool(value), time.perf_counter() - started)
+            if value:
+                return value
+        return None
+
     def _is_product_image(self, url: str) -> bool:
         """Check if image is a product photo (not icon/logo/flag)"""
         if not url:
@@ -250,7 +434,7 @@ class CatawikiScraperPro:
 
         return False
 
-    async def _extract_seller_name(self, page) -> Optional[str]:
+    async def _extract_seller_name(self, page, page_text: Optional[str] = None) -> Optional[str]:
         """Extract clean seller name"""
 
         # Try different selectors
@@ -261,27 +445,27 @@ class CatawikiScraperPro:
             '.seller-name',
         ]
 
-        for selector in seller_selectors:
-            try:
-                element = await page.query_selector(selector)
-                if element:
-                    text = await element.inner_text()
-                    text = text.strip()
-                    # Clean up seller name
-                    if text and len(text) > 2 and len(text) < 100:
-                        # Remove common prefixes/suffixes
-                        text = text.replace('Sold by', '').strip()
-                        text = text.replace('Follow', '').strip()
-                        # Take first line only
-                        text = text.split('\n')[0].strip()
-                        if text:
-                            return text
-            except:
-                continue
+        def clean_seller(text: str) -> Optional[str]:
+            text = (text or '').strip()
+            # Clean up seller name
+            if text and len(text) > 2 and len(text) < 100:
+                # Remove common prefixes/suffixes
+                text = text.replace('Sold by', '').strip()
+                text = text.replace('Follow', '').strip()
+                # Take first line only
+                text = text.split('\n')[0].strip()
+                return text or None
+            return None
+
+        seller = await self._first_match(page, 'seller_name', seller_selectors, clean_seller)
+        if seller:
+            return seller
 
         # Fallback: try to find in page text
         try:
-            page_text = await page.inner_text('body')
+            if page_text is None:
+                with span('extract.seller_name.body_text'):
+                    page_text = await page.inner_text('body')
             # Look for "Sold by NAME"
             match = re.search(r'Sold by\s+([^\n]+)', page_text, re.IGNORECASE)
             if match:
@@ -307,18 +491,17 @@ class CatawikiScraperPro:
             'div[class*="bid"]',
         ]
 
-        for selector in price_selectors:
-            try:
-                element = await page.query_selector(selector)
-                if element:
-                    text = await element.inner_text()
-                    if text and ('€' in text or '$' in text or '£' in text):
-                        # Clean price
-                        price = re.search(r'[€$£]\s*[\d,]+(?:\.\d{2})?', text)
-                        if price:
-                            return price.group(0).strip()
-            except:
-                continue
+        def clean_price(text: str) -> Optional[str]:
+            if text and ('€' in text or '$' in text or '£' in text):
+                # Clean price
+                price = re.search(r'[€$£]\s*[\d,]+(?:\.\d{2})?', text)
+                if price:
+                    return price.group(0).strip()
+            return None
+
+        price = await self._first_match(page, 'current_price', price_selectors, clean_price)
+        if price:
+            return price
 
         # Fallback: regex in page text
         price_patterns = [
@@ -344,16 +527,15 @@ class CatawikiScraperPro:
             'span[class*="shipping"]',
         ]
 
-        for selector in shipping_selectors:
-            try:
-                element = await page.query_selector(selector)
-                if element:
-                    text = await element.inner_text()
-                    if text and ('€' in text or '$' in text or '£' in text or 'free' in text.lower()):
-                        # Extract only the number
-                        return self._extract_number_from_price(text)
-            except:
-                continue
+        def clean_shipping(text: str) -> Optional[str]:
+            if text and ('€' in text or '$' in text or '£' in text or 'free' in text.lower()):
+                # Extract only the number
+                return self._extract_number_from_price(text)
+            return None
+
+        shipping = await self._first_match(page, 'shipping_cost', shipping_selectors, clean_shipping)
+        if shipping:
+            return shipping
 
         # Fallback: regex patterns
         shipping_patterns = [
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Cross-run index of seen lot ids
+
+Numeric lot ids and their last-scraped time are kept as two parallel
+sorted uint32 arrays (8 bytes per lot) plus a Bloom filter for fast
+negative checks, all in one binary file that loads with a single read.
+Batch, category and API runs consult it to skip or defer lots scraped
+within the freshness window. Saving takes a file lock and merges with
+whatever another process saved in the meantime, so concurrent runs
+(e.g. batch workers) don't drop each other's lots.
+"""
+
+import sys
+import math
+import os
+import struct
+import time
+from array import array
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Dict, List, Tuple, Union
+
+import config
+from lot_fields import lot_id_from_url, unwrap_formula, parse_datetime
+from sinks import read_records
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, last save wins
+    fcntl = None
+
+
+MAGIC = b'SEEN1'
+HEADER = struct.Struct('<5sIQB')  # magic, count, bloom bits, bloom hashes
+SEEN_POLICIES = ('skip', 'defer', 'off')
+
+_MASK64 = (1 << 64) - 1
+
+
+class BloomFilter:
+    """Bit array with k hashes derived from the integer lot id (double hashing)"""
+
+    def __init__(self, capacity: int, error_rate: float = config.SEEN_BLOOM_ERROR_RATE):
+        capacity = max(1000, capacity)
+        self.bits = self.size_bits(capacity, error_rate)
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self.data = bytearray((self.bits + 7) // 8)
+
+    @staticmethod
+    def size_bits(capacity: int, error_rate: float = config.SEEN_BLOOM_ERROR_RATE) -> int:
+        """Bits needed for `capacity` keys at `error_rate`"""
+        return max(8, int(-max(1000, capacity) * math.log(error_rate) / (math.log(2) ** 2)))
+
+    @classmethod
+    def from_bytes(cls, bits: int, hashes: int, data: bytes) -> 'BloomFilter':
+        bloom = cls.__new__(cls)
+        bloom.bits, bloom.hashes, bloom.data = bits, hashes, bytearray(data)
+        return bloom
+
+    def _positions(self, key: int):
+        h1 = (key * 0x9E3779B97F4A7C15) & _MASK64
+        h2 = (((key ^ (key >> 31)) * 0xC2B2AE3D27D4EB4F) & _MASK64) | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.bits
+
+    def add(self, key: int):
+        for pos in self._positions(key):
+            self.data[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: int) -> bool:
+        return all(self.data[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+def _lot_key(lot: Union[int, str]) -> Optional[int]:
+    if isinstance(lot, int):
+        return lot
+    if lot.isdigit():
+        return int(lot)
+    lot_id = lot_id_from_url(lot)
+    return int(lot_id) if lot_id else None
+
+
+class SeenIndex:
+    """
+    Persistent lot id -> last scraped time index
+
+    Args:
+        path: Index file
+        freshness_hours: Lots scraped more recently than this are "fresh"
+    """
+
+    _shared = None
+
+    def __init__(self, path: str = config.SEEN_INDEX_FILE, freshness_hours: float = config.SEEN_FRESHNESS_HOURS):
+        self.path = path
+        self.freshness_hours = freshness_hours
+        self.ids = array('I')
+        self.times = array('I')
+        self.pending: Dict[int, int] = {}  # New ids, merged into the arrays on save
+        self.bloom = BloomFilter(config.SEEN_BLOOM_CAPACITY)
+        self._dirty = False
+        self._disk_stamp = None  # (mtime, size) of the file as last read or written
+        self.load()
+
+    @classmethod
+    def shared(cls) -> 'SeenIndex':
+        """Process-wide index (API server, RunSinks)"""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def load(self):
+        on_disk = self._read()
+        if on_disk:
+            self.ids, self.times, self.bloom = on_disk
+
+    def _read(self) -> Optional[Tuple[array, array, BloomFilter]]:
+        """(ids, times, bloom) from the index file, None if there is none"""
+        try:
+            with open(self.path, 'rb') as f:
+                raw = f.read()
+                stat = os.fstat(f.fileno())
+        except FileNotFoundError:
+            return None
+        self._disk_stamp = (stat.st_mtime_ns, stat.st_size)
+        magic, count, bits, hashes = HEADER.unpack_from(raw)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a seen index")
+        offset = HEADER.size
+        ids = array('I', raw[offset:offset + count * 4])
+        offset += count * 4
+        times = array('I', raw[offset:offset + count * 4])
+        offset += count * 4
+        return ids, times, BloomFilter.from_bytes(bits, hashes, raw[offset:])
+
+    def _disk_changed(self) -> bool:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        return (stat.st_mtime_ns, stat.st_size) != self._disk_stamp
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive lock on <index>.lock for the read-merge-replace of save()"""
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", 'a') as lock:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def __len__(self) -> int:
+        return len(self.ids) + len(self.pending)
+
+    def last_seen(self, lot: Union[int, str]) -> Optional[int]:
+        """Epoch seconds of the last scrape, None if never seen"""
+        key = _lot_key(lot)
+        if key is None or key not in self.bloom:
+            return None
+        if key in self.pending:
+            return self.pending[key]
+        i = bisect_left(self.ids, key)
+        if i < len(self.ids) and self.ids[i] == key:
+            return self.times[i]
+        return None
+
+    def is_fresh(self, lot: Union[int, str], hours: Optional[float] = None) -> bool:
+        seen = self.last_seen(lot)
+        window = (self.freshness_hours if hours is None else hours) * 3600
+        return seen is not None and time.time() - seen < window
+
+    def add(self, lot: Union[int, str], seen_at: Optional[float] = None):
+        key = _lot_key(lot)
+        if key is None:
+            return
+        if key > 0xFFFFFFFF:
+            # Not indexable - a warning, not a failed run (add() is called from sinks)
+            print(f"[{time.strftime('%H:%M:%S')}] ⚠️  Lot id {key} does not fit the uint32 seen index, not marked")
+            return
+        seen_at = int(seen_at if seen_at is not None else time.time())
+        self._dirty = True
+        i = bisect_left(self.ids, key)
+        if i < len(self.ids) and self.ids[i] == key:
+            self.times[i] = max(self.times[i], seen_at)
+            return
+        self.pending[key] = max(self.pending.get(key, 0), seen_at)
+        self.bloom.add(key)
+
+    def plan(self, urls: List[str], policy: str = config.SEEN_POLICY,
+             hours: Optional[float] = None) -> Tuple[List[str], List[str]]:
+        """
+        Order URLs for scraping
+
+        Returns (to_scrape, skipped): 'skip' drops fresh lots, 'defer'
+        moves them after the others, 'off' keeps the list as is.
+        """
+        if policy not in SEEN_POLICIES:
+            raise ValueError(f"Unknown seen policy '{policy}' (use {', '.join(SEEN_POLICIES)})")
+        if policy == 'off':
+            return list(urls), []
+        stale, fresh = [], []
+        for url in urls:
+            (fresh if self.is_fresh(url, hours) else stale).append(url)
+        if policy == 'defer':
+            return stale + fresh, []
+        return stale, fresh
+
+    def _merge_pending(self):
+        if not self.pending:
+            return
+        if len(self.pending) > len(self.ids) // 10:
+            # Bulk: rebuild both arrays in one sort
+            merged = dict(zip(self.ids, self.times))
+            for key, seen_at in self.pending.items():
+                merged[key] = max(merged.get(key, 0), seen_at)
+            keys = sorted(merged)
+            self.ids = array('I', keys)
+            self.times = array('I', (merged[key] for key in keys))
+        else:
+            for key in sorted(self.pending):
+                i = bisect_left(self.ids, key)
+                self.ids.insert(i, key)
+                self.times.insert(i, self.pending[key])
+        self.pending = {}
+
+    def _merge_disk(self):
+        """Take in lots another process saved since we last read or wrote the file"""
+        on_disk = self._read()
+        if not on_disk:
+            return
+        for key, seen_at in zip(on_disk[0], on_disk[1]):
+            i = bisect_left(self.ids, key)
+            if i < len(self.ids) and self.ids[i] == key:
+                self.times[i] = max(self.times[i], seen_at)
+            else:
+                self.pending[key] = max(self.pending.get(key, 0), seen_at)
+                self.bloom.add(key)
+
+    def save(self):
+        """Merge new ids (ours and other processes') and rewrite the index atomically under a file lock"""
+        if not self._dirty:
+            return
+        with self._locked():
+            if self._disk_changed():
+                self._merge_disk()
+            self._write()
+
+    def _write(self):
+        self._merge_pending()
+        # Grow the Bloom filter before its false positive rate degrades
+        capacity = max(config.SEEN_BLOOM_CAPACITY, len(self.ids) * 2)
+        if self.bloom.bits < BloomFilter.size_bits(capacity // 2):
+            self.bloom = BloomFilter(capacity)
+            for key in self.ids:
+                self.bloom.add(key)
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, len(self.ids), self.bloom.bits, self.bloom.hashes))
+            f.write(self.ids.tobytes())
+            f.write(self.times.tobytes())
+            f.write(self.bloom.data)
+            f.flush()
+            stat = os.fstat(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._disk_stamp = (stat.st_mtime_ns, stat.st_size)
+        self._dirty = False
+
+    def stats(self) -> Dict:
+        now = time.time()
+        window = self.freshness_hours * 3600
+        fresh = sum(1 for seen_at in self.times if now - seen_at < window)
+        fresh += sum(1 for seen_at in self.pending.values() if now - seen_at < window)
+        return {
+            'lots': len(self),
+            'fresh': fresh,
+            'freshness_hours': self.freshness_hours,
+            'bloom_kb': len(self.bloom.data) // 1024,
+            'path': self.path,
+        }
+
+
+class SeenIndexSink:
+    """RunSinks-compatible sink that marks written lots as seen"""
+
+    def __init__(self, index: Optional[SeenIndex] = None, save_every: int = config.SEEN_INDEX_SAVE_EVERY):
+        self.index = index or SeenIndex.shared()
+        self.save_every = max(1, save_every)
+        self._unsaved = 0
+
+    def write(self, record: Dict):
+        seen_at = parse_datetime(record.get('scraped_at'))
+        self.index.add(unwrap_formula(record.get('url') or ''), seen_at.timestamp() if seen_at else None)
+        self._unsaved += 1
+        if self._unsaved >= self.save_every:
+            self.index.save()
+            self._unsaved = 0
+
+    def close(self):
+        self.index.save()
+
+
+def mark_seen(records: List[Dict]):
+    """One-shot marking for single-lot paths (/scrape, /scrape-async)"""
+    if not config.SEEN_INDEX_ENABLED:
+        return
+    sink = SeenIndexSink()
+    for record in records:
+        sink.write(record)
+    sink.close()
+
+
+def main():
+    usage = (
+        "Usage:\n"
+        "  python seen_index.py stats\n"
+        "  python seen_index.py check <lot_url|lot_id> ...\n"
+        "  python seen_index.py import <results.ndjson|.csv|.json|lots.db>"
+    )
+    if len(sys.argv) < 2:
+        print(usage)
+        sys.exit(1)
+
+    started = time.perf_counter()
+    index = SeenIndex()
+    print(f"⏱️  Loaded {len(index)} lots in {(time.perf_counter() - started) * 1000:.1f} ms")
+    command = sys.argv[1]
+
+    if command == 'stats':
+        for key, value in index.stats().items():
+            print(f"  {key}: {value}")
+
+    elif command == 'check' and len(sys.argv) > 2:
+        for lot in sys.argv[2:]:
+            seen_at = index.last_seen(lot)
+            when = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(seen_at)) if seen_at else 'never'
+            print(f"{'🟢 fresh' if index.is_fresh(lot) else '⚪ stale'}  {lot}  (last scraped: {when})")
+
+    elif command == 'import' and len(sys.argv) > 2:
+        source = sys.argv[2]
+        before = len(index)
+        if source.endswith('.db'):
+            # Bootstrap from the lot history store
+            from lot_store import LotStore
+            store = LotStore(source)
+            for lot_id, scraped_at in store.conn.execute("SELECT lot_id, scraped_at FROM lots"):
+                index.add(lot_id, parse_datetime(scraped_at).timestamp())
+            store.close()
+        else:
+            sink = SeenIndexSink(index, save_every=10 ** 9)
+            for record in read_records(source):
+                sink.write(record)
+        index.save()
+        print(f"💾 {len(index) - before} new lots, {len(index)} total")
+
+    else:
+        print(usage)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Adaptive selector ordering - per-field hit rate and latency of CSS selectors
+
+Each extractor asks for its selector list in the historically best order,
+records whether every tried selector matched and how long it took, and
+the stats are persisted between runs. Selectors that keep missing are
+skipped, with an occasional probe so they can recover if the site changes;
+the best-ranked one is always tried. Observations made while extracting a
+page can be held (collect()) and only counted once the page turned out to
+be a real lot page, so challenge pages and empty renders don't kill selectors.
+"""
+
+import sys
+import contextvars
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Dict, List
+
+import config
+
+_collecting: contextvars.ContextVar[Optional['PageObservations']] = contextvars.ContextVar(
+    'selector_observations', default=None)
+
+
+class PageObservations:
+    """Selector results of one page, counted by commit() (dropped otherwise)"""
+
+    def __init__(self, stats: 'SelectorStats'):
+        self.stats = stats
+        self.items: List[tuple] = []
+
+    def commit(self):
+        items, self.items = self.items, []
+        for item in items:
+            self.stats._apply(*item)
+
+
+class SelectorStats:
+    """Hit/miss counters and latency per (field, selector)"""
+
+    _shared = None
+
+    def __init__(self, path: str = config.SELECTOR_STATS_FILE,
+                 dead_after: int = config.SELECTOR_DEAD_AFTER,
+                 dead_hit_rate: float = config.SELECTOR_DEAD_HIT_RATE,
+                 probe_every: int = config.SELECTOR_PROBE_EVERY,
+                 max_tries: int = config.SELECTOR_MAX_TRIES):
+        self.path = path
+        self.dead_after = dead_after
+        self.dead_hit_rate = dead_hit_rate
+        self.probe_every = probe_every
+        self.max_tries = max_tries
+        self.fields: Dict[str, Dict[str, Dict]] = {}
+        self._calls: Dict[str, int] = {}
+        self._dirty = False
+        self.load()
+
+    @classmethod
+    def shared(cls) -> 'SelectorStats':
+        """Process-wide instance used by scrapers that weren't given one"""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.fields = json.load(f).get('fields', {})
+        except (FileNotFoundError, ValueError):
+            self.fields = {}
+
+    def save(self):
+        """Persist stats atomically (write temp file, then rename)"""
+        if not self._dirty:
+            return
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'updated_at': time.time(), 'fields': self.fields}, f, indent=2)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def _entry(self, field: str, selector: str) -> Dict:
+        return self.fields.setdefault(field, {}).setdefault(
+            selector, {'tries': 0, 'hits': 0, 'total_ms': 0.0}
+        )
+
+    def hit_rate(self, field: str, selector: str) -> Optional[float]:
+        entry = self.fields.get(field, {}).get(selector)
+        if not entry or not entry['tries']:
+            return None
+        return entry['hits'] / entry['tries']
+
+    def is_dead(self, field: str, selector: str) -> bool:
+        entry = self.fields.get(field, {}).get(selector)
+        if not entry or entry['tries'] < self.dead_after:
+            return False
+        return entry['hits'] / entry['tries'] < self.dead_hit_rate
+
+    def order(self, field: str, selectors: List[str]) -> List[str]:
+        """
+        Return selectors best-first
+
+        Ranked by smoothed hit rate, then average latency; selectors without
+        data keep their original relative position. Dead selectors are
+        dropped except on every `probe_every`-th call, when they go last;
+        if all of them are dead the best-ranked one is still tried.
+        """
+        self._calls[field] = self._calls.get(field, 0) + 1
+        probe = self.probe_every and self._calls[field] % self.probe_every == 0
+
+        def rank(item):
+            index, selector = item
+            entry = self.fields.get(field, {}).get(selector)
+            if not entry or not entry['tries']:
+                return (-0.5, 0.0, index)
+            smoothed = (entry['hits'] + 1) / (entry['tries'] + 2)
+            return (-smoothed, entry['total_ms'] / entry['tries'], index)
+
+        ranked = [s for _, s in sorted(enumerate(selectors), key=rank)]
+        alive = [s for s in ranked if not self.is_dead(field, s)] or ranked[:1]
+        if probe:
+            return alive + [s for s in ranked if s not in alive]
+        return alive
+
+    @contextmanager
+    def collect(self):
+        """
+        with stats.collect() as observations: ... observations.commit()
+
+        Holds the record() calls made inside the block (same task or tasks
+        started from it) until commit() - skip it for blocked or untitled pages.
+        """
+        observations = PageObservations(self)
+        token = _collecting.set(observations)
+        try:
+            yield observations
+        finally:
+            _collecting.reset(token)
+
+    def record(self, field: str, selector: str, hit: bool, seconds: float):
+        observations = _collecting.get()
+        if observations is not None and observations.stats is self:
+            observations.items.append((field, selector, hit, seconds))
+            return
+        self._apply(field, selector, hit, seconds)
+
+    def _apply(self, field: str, selector: str, hit: bool, seconds: float):
+        entry = self._entry(field, selector)
+        entry['tries'] += 1
+        entry['hits'] += 1 if hit else 0
+        entry['total_ms'] += seconds * 1000
+
+        # Halve old counts so the ranking follows site changes
+        if entry['tries'] >= self.max_tries:
+            entry['tries'] //= 2
+            entry['hits'] //= 2
+            entry['total_ms'] /= 2
+        self._dirty = True
+
+    def report(self) -> List[Dict]:
+        """Flat list of per-selector stats, best-first within each field"""
+        rows = []
+        for field in sorted(self.fields):
+            selectors = self.fields[field]
+            ranked = sorted(
+                selectors,
+                key=lambda s: -(selectors[s]['hits'] / selectors[s]['tries']) if selectors[s]['tries'] else 0
+            )
+            for selector in ranked:
+                entry = selectors[selector]
+                tries = entry['tries']
+                rows.append({
+                    'field': field,
+                    'selector': selector,
+                    'tries': tries,
+                    'hits': entry['hits'],
+                    'hit_rate': entry['hits'] / tries if tries else 0.0,
+                    'avg_ms': entry['total_ms'] / tries if tries else 0.0,
+                    'dead': self.is_dead(field, selector),
+                })
+        return rows
+
+
+def print_report(stats: SelectorStats, dead_only: bool = False):
+    rows = stats.report()
+    if dead_only:
+        rows = [r for r in rows if r['dead']]
+
+    print("=" * 90)
+    print(f"🎯 Selector stats ({stats.path})")
+    print("=" * 90)
+    if not rows:
+        print("No data" if not dead_only else "✓ No dead selectors")
+        return
+
+    print(f"{'field':<16} {'selector':<42} {'tries':>6} {'hit %':>7} {'avg ms':>8}  status")
+    print("-" * 90)
+    for row in rows:
+        status = '💀 DEAD' if row['dead'] else ('✓' if row['hit_rate'] > 0 else '')
+        print(f"{row['field']:<16} {row['selector'][:42]:<42} {row['tries']:>6} "
+              f"{row['hit_rate'] * 100:>6.1f}% {row['avg_ms']:>8.1f}  {status}")
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ('report', 'dead', 'reset'):
+        print("Usage: python selector_stats.py report|dead|reset [stats.json]")
+        print("\n  report   Show hit rate and latency of every selector")
+        print("  dead     Show only selectors that keep missing")
+        print("  reset    Delete collected stats")
+        sys.exit(1)
+
+    path = sys.argv[2] if len(sys.argv) > 2 else config.SELECTOR_STATS_FILE
+
+    if sys.argv[1] == 'reset':
+        if os.path.exists(path):
+            os.remove(path)
+        print(f"🗑️  Removed {path}")
+        return
+
+    print_report(SelectorStats(path), dead_only=sys.argv[1] == 'dead')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Warm browser sessions with persisted storage_state
+
+A session is a consistent fingerprint (user agent, viewport, locale,
+timezone) plus the Playwright storage_state (Akamai and consent cookies)
+collected while using it. Lots reuse warm sessions instead of starting
+cookie-less, so the first-visit sensor/challenge cost is paid once per
+session, not once per lot. A session is rotated (new fingerprint, fresh
+cookies) when it gets blocked, keeps failing, or hits its age/use limit,
+and is re-warmed in the background.
+
+The pool has config.SESSION_POOL_SIZE slots; state lives in
+config.SESSION_DIR (index.json + one storage_state file per slot).
+"""
+
+import sys
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional, Dict, List
+
+import config
+from circuit_breaker import is_soft_block
+
+STEALTH_SCRIPT = """
+    Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
+    Object.defineProperty(navigator, 'plugins', {get: () => [1, 2, 3]});
+    Object.defineProperty(navigator, 'languages', {get: () => %s});
+    window.chrome = {runtime: {}};
+"""
+
+
+def _write_json(path: str, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class Session:
+    """One pool slot: fingerprint + storage_state + health"""
+
+    def __init__(self, session_id: str, directory: str, fingerprint: int = 0):
+        self.session_id = session_id
+        self.state_path = str(Path(directory) / f"{session_id}.json")
+        self.fingerprint = fingerprint  # Index into config.SESSION_FINGERPRINTS
+        self.proxy: Optional[str] = None  # Proxy the cookies were collected through
+        self.created_at = time.time()
+        self.last_used = 0.0
+        self.uses = 0
+        self.failures = 0  # Consecutive
+        self.rotations = 0
+        self.in_flight = 0
+        self.warming = False
+
+    @property
+    def profile(self) -> Dict:
+        fingerprints = config.SESSION_FINGERPRINTS
+        return fingerprints[self.fingerprint % len(fingerprints)]
+
+    @property
+    def languages(self) -> List[str]:
+        locale = self.profile['locale']
+        return [locale, locale.split('-')[0]]
+
+    @property
+    def warm(self) -> bool:
+        return os.path.exists(self.state_path)
+
+    @property
+    def expired(self) -> bool:
+        return (self.uses >= config.SESSION_MAX_USES
+                or (self.warm and time.time() - self.created_at > config.SESSION_MAX_AGE))
+
+    def context_options(self) -> Dict:
+        """browser.new_context(**options) for this fingerprint, with cookies if warm"""
+        locale = self.profile['locale']
+        options = {
+            'viewport': dict(self.profile['viewport']),
+            'user_agent': self.profile['user_agent'],
+            'locale': locale,
+            'timezone_id': self.profile['timezone_id'],
+            'extra_http_headers': {
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+                'Accept-Language': f"{locale},{self.languages[1]};q=0.9",
+                'Accept-Encoding': 'gzip, deflate, br',
+                'Connection': 'keep-alive',
+                'Upgrade-Insecure-Requests': '1',
+            },
+        }
+        if self.warm:
+            options['storage_state'] = self.state_path
+        return options
+
+    def stealth_script(self) -> str:
+        return STEALTH_SCRIPT % json.dumps(self.languages)
+
+    def rotate(self):
+        """Fresh cookies and the next fingerprint"""
+        if self.warm:
+            os.remove(self.state_path)
+        self.fingerprint = (self.fingerprint + 1) % len(config.SESSION_FINGERPRINTS)
+        self.proxy = None
+        self.created_at = time.time()
+        self.uses = self.failures = 0
+        self.rotations += 1
+
+    def to_dict(self) -> Dict:
+        return {key: getattr(self, key) for key in
+                ('fingerprint', 'proxy', 'created_at', 'last_used', 'uses', 'failures', 'rotations')}
+
+    def summary(self) -> Dict:
+        return {
+            'session': self.session_id,
+            'warm': self.warm,
+            'warming': self.warming,
+            'user_agent': self.profile['user_agent'][-40:],
+            'proxy': self.proxy,
+            'age_s': round(time.time() - self.created_at),
+            'uses': self.uses,
+            'failures': self.failures,
+            'rotations': self.rotations,
+            'in_flight': self.in_flight,
+        }
+
+
+class SessionPool:
+    """
+    Args:
+        size: Number of session slots
+        directory: Index and storage_state files
+        headless: Headless browsers for background warm-up
+    """
+
+    _shared = None
+
+    def __init__(self, size: int = config.SESSION_POOL_SIZE, directory: str = config.SESSION_DIR,
+                 headless: bool = config.HEADLESS):
+        self.directory = directory
+        self.headless = headless
+        self.index_path = str(Path(directory) / 'index.json')
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        # Spread fingerprints over the slots
+        self.sessions = [Session(f"s{n}", directory, n) for n in range(size)]
+        self._tasks = set()
+        self.load()
+
+    @classmethod
+    def shared(cls) -> Optional['SessionPool']:
+        """Process-wide pool (None when config.SESSION_POOL_SIZE is 0)"""
+        if cls._shared is None and config.SESSION_POOL_SIZE > 0:
+            cls._shared = cls()
+        return cls._shared
+
+    def load(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        for session in self.sessions:
+            for key, value in saved.get(session.session_id, {}).items():
+                setattr(session, key, value)
+
+    def save(self):
+        _write_json(self.index_path, {s.session_id: s.to_dict() for s in self.sessions})
+
+    def acquire(self, proxy: Optional[str] = None) -> Session:
+        """
+        Session for the next lot
+
+        Prefers warm sessions whose cookies came through the same proxy,
+        then the least busy and least recently used. Expired sessions are
+        rotated and re-warmed in the background first.
+        """
+        for session in self.sessions:
+            if session.expired and not session.in_flight and not session.warming:
+                print(f"[{time.strftime('%H:%M:%S')}] 🔄 Session {session.session_id} expired "
+                      f"({session.uses} uses), rotating")
+                session.rotate()
+                self._schedule_warm(session)
+
+        session = self.ranked(proxy)[0]
+        session.in_flight += 1
+        session.last_used = time.time()
+        if proxy and not session.proxy:
+            session.proxy = proxy
+        return session
+
+    def ranked(self, proxy: Optional[str] = None) -> List[Session]:
+        """Sessions in the order acquire() prefers them (no side effects)"""
+        candidates = [s for s in self.sessions if not s.warming] or self.sessions
+        return sorted(candidates, key=lambda s: (
+            bool(proxy and s.proxy and s.proxy != proxy),
+            not s.warm,
+            s.in_flight,
+            s.last_used,
+        ))
+
+    async def save_state(self, session: Session, context, generation: Optional[int] = None):
+        """
+        Persist the context's cookies/localStorage into the session (after a good lot)
+
+        generation: session.rotations when the lot started - skipped if the
+        session was rotated meanwhile, so old cookies don't come back
+        """
+        if generation is not None and generation != session.rotations:
+            return
+        try:
+            _write_json(session.state_path, await context.storage_state())
+        except Exception as e:
+            print(f"[{time.strftime('%H:%M:%S')}] ⚠️  Could not save session {session.session_id}: {e}")
+
+    def release(self, session: Session, outcome: str = 'ok', reason: Optional[str] = None):
+        """
+        Report the lot: 'ok', 'blocked' (rotate now), 'error' (rotate after repeats) or 'cancelled'
+
+        A block with a soft reason (empty h1, see circuit_breaker.SOFT_REASONS) counts like an error.
+        """
+        session.in_flight = max(0, session.in_flight - 1)
+        if outcome == 'cancelled':
+            return
+        if is_soft_block(outcome, reason):
+            outcome = 'error'
+        session.uses += 1
+        if outcome == 'ok':
+            session.failures = 0
+        else:
+            session.failures += 1
+            if outcome == 'blocked' or session.failures >= config.SESSION_MAX_FAILURES:
+                print(f"[{time.strftime('%H:%M:%S')}] 🔄 Session {session.session_id} degraded "
+                      f"({outcome}), rotating fingerprint and cookies")
+                session.rotate()
+                if not session.in_flight:
+                    self._schedule_warm(session)
+        self.save()
+
+    def _schedule_warm(self, session: Session):
+        """Re-warm in the background of the running event loop (next lot warms it otherwise)"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self.warm(session))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def warm(self, session: Session) -> bool:
+        """Visit config.SESSION_WARM_URL with the session's fingerprint and keep the cookies"""
+        from playwright.async_api import async_playwright
+        from memory_governor import MemoryGovernor
+        from proxy_pool import ProxyPool
+
+        session.warming = True
+        generation = session.rotations  # Rotated meanwhile (a block on another lot): keep none of this warm-up
+        try:
+            # Browser slot before the proxy, like a lot: warm-ups count against the memory budget too
+            async with MemoryGovernor.shared().slot(f"warm {session.session_id}") as browser_slot, \
+                    ProxyPool.shared().lease() as lease, async_playwright() as p:
+                launch_args = {'headless': self.headless, 'args': config.BROWSER_ARGS + [browser_slot.marker],
+                               'timeout': 30000}
+                if lease.proxy:
+                    launch_args['proxy'] = lease.playwright
+                browser = await p.chromium.launch(**launch_args)
+                browser_slot.attach(browser)
+                try:
+                    context = await browser.new_context(**session.context_options())
+                    await context.add_init_script(session.stealth_script())
+                    page = await context.new_page()
+                    response = await page.goto(config.SESSION_WARM_URL, wait_until='domcontentloaded', timeout=30000)
+                    if response and response.status in (403, 429):
+                        lease.outcome, lease.error = 'blocked', f"HTTP {response.status}"
+                        print(f"[{time.strftime('%H:%M:%S')}] ⚠️  Warm-up of {session.session_id} blocked "
+                              f"({response.status})")
+                        return False
+                    await page.mouse.wheel(0, 600)
+                    await asyncio.sleep(config.SESSION_WARM_DWELL)
+                    if generation != session.rotations:
+                        print(f"[{time.strftime('%H:%M:%S')}] ⚠️  Session {session.session_id} rotated during "
+                              f"warm-up, cookies dropped")
+                        return False
+                    await self.save_state(session, context, generation)
+                    session.proxy = lease.proxy.name if lease.proxy else None
+                    session.created_at = time.time()
+                finally:
+                    await browser.close()
+            print(f"[{time.strftime('%H:%M:%S')}] 🔥 Session {session.session_id} warmed")
+            return True
+        except Exception as e:
+            print(f"[{time.strftime('%H:%M:%S')}] ⚠️  Warm-up of {session.session_id} failed: {e}")
+            return False
+        finally:
+            session.warming = False
+            self.save()
+
+    async def warm_all(self) -> int:
+        """Warm every cold session (CLI / startup)"""
+        results = await asyncio.gather(*(self.warm(s) for s in self.sessions if not s.warm))
+        return sum(results)
+
+    def stats(self) -> List[Dict]:
+        return [session.summary() for session in self.sessions]
+
+    def clear(self):
+        for session in self.sessions:
+            session.rotate()
+        self.save()
+
+
+def main():
+    usage = (
+        "Usage:\n"
+        "  python session_pool.py stats                 # sessions, fingerprints, uses\n"
+        "  python session_pool.py warm [--show-browser]  # warm all cold sessions now\n"
+        "  python session_pool.py clear                 # drop cookies, rotate fingerprints"
+    )
+    if len(sys.argv) < 2:
+        print(usage)
+        sys.exit(1)
+
+    command = sys.argv[1]
+    pool = SessionPool(headless='--show-browser' not in sys.argv)
+
+    if command == 'stats':
+        for entry in pool.stats():
+            state = 'warm' if entry['warm'] else 'cold'
+            print(f"{entry['session']:<4} {state:<5} {entry['uses']:>5} uses  {entry['failures']} failures  "
+                  f"{entry['rotations']:>3} rotations  age {entry['age_s'] // 60}m  "
+                  f"proxy {entry['proxy'] or '-'}  ...{entry['user_agent']}")
+    elif command == 'warm':
+        warmed = asyncio.run(pool.warm_all())
+        print(f"🔥 Warmed {warmed} sessions")
+    elif command == 'clear':
+        pool.clear()
+        print(f"🧹 Cleared {len(pool.sessions)} sessions")
+    else:
+        print(usage)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,346 @@
+"""
+Streaming output sinks - results are appended as each lot completes
+
+NDJSON and CSV files are appended to and flushed according to a
+FlushPolicy; the summary JSON holds counters only and is rewritten
+atomically on every update, so a crash loses at most the lot in flight
+and memory does not grow with batch size.
+"""
+
+import csv
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Dict, List
+
+import config
+
+
+CSV_FIELDNAMES = [
+    'title',
+    'bottles_count',
+    'seller_name',
+    'current_price',
+    'shipping_cost',
+    'end_date',
+    'images_count',
+    'first_image',
+    'url',
+    'scraped_at',
+    'producer_rating',
+    'vintage_rating',
+    'region_rating',
+    'overall_appeal',
+    'investment_potential',
+]
+
+
+def sheets_end_date_formula(end_date: str) -> str:
+    """Live countdown formula for an exact "YYYY-MM-DD HH:MM:SS" end date"""
+    date_part = end_date[:10]
+    time_part = end_date[11:]
+    return f'=DAYS(DATEVALUE("{date_part}") + TIMEVALUE("{time_part}"); NOW()) & "d " & HOUR(DATEVALUE("{date_part}") + TIMEVALUE("{time_part}") - NOW()) & "h " & MINUTE(DATEVALUE("{date_part}") + TIMEVALUE("{time_part}") - NOW()) & "m"'
+
+
+def format_csv_row(item: Dict) -> Dict:
+    """Build a CSV row with Google Sheets formulas (skips values already formatted)"""
+    # Get first image URL
+    first_img_url = item.get('images', [''])[0] if item.get('images') else ''
+    # Create Google Sheets IMAGE formula for 100x100px preview
+    first_image_formula = f'=IMAGE("{first_img_url}"; 4; 100; 100)' if first_img_url else ''
+
+    # Get URL and format as clickable icon if not already formatted
+    url = item.get('url', '')
+    if url and not url.startswith('=HYPERLINK'):
+        url = f'=HYPERLINK("{url}"; "🔗 View")'
+
+    # Format end_date as live countdown formula if not already formatted
+    end_date = item.get('end_date', '')
+    if end_date and not end_date.startswith('=') and len(end_date) == 19:  # Format: "2025-11-17 21:00:00"
+        end_date = sheets_end_date_formula(end_date)
+
+    return {
+        'title': item.get('title', ''),
+        'bottles_count': item.get('bottles_count', ''),
+        'seller_name': item.get('seller_name', ''),
+        'current_price': item.get('current_price', ''),
+        'shipping_cost': item.get('shipping_cost', ''),
+        'end_date': end_date,
+        'images_count': len(item.get('images', [])),
+        'first_image': first_image_formula,
+        'url': url,
+        'scraped_at': item.get('scraped_at', ''),
+        'producer_rating': item.get('producer_rating', ''),
+        'vintage_rating': item.get('vintage_rating', ''),
+        'region_rating': item.get('region_rating', ''),
+        'overall_appeal': item.get('overall_appeal', ''),
+        'investment_potential': item.get('investment_potential', ''),
+    }
+
+
+def format_sheets_result(item: Dict) -> Dict:
+    """Copy of a result with first_image/url/end_date as Google Sheets formulas (n8n job output)"""
+    result = dict(item)
+
+    # Add first_image as Google Sheets formula for 100x100px preview
+    images = result.get('images', [])
+    result['first_image'] = f'=IMAGE("{images[0]}"; 4; 100; 100)' if images else ''
+
+    # Format URL as clickable icon with HYPERLINK formula
+    url = result.get('url', '')
+    if url and not url.startswith('=HYPERLINK'):
+        result['url'] = f'=HYPERLINK("{url}"; "🔗 View")'
+
+    # Format end_date as live countdown formula
+    end_date = result.get('end_date', '')
+    if end_date and not end_date.startswith('=') and len(end_date) == 19:
+        result['end_date'] = sheets_end_date_formula(end_date)
+
+    return result
+
+
+class FlushPolicy:
+    """
+    When appended data reaches the disk
+
+    Args:
+        every: Flush after this many records (1 = after every record)
+        fsync: Also fsync on flush (survives power loss, not just a crash)
+    """
+
+    def __init__(self, every: int = config.SINK_FLUSH_EVERY, fsync: bool = config.SINK_FSYNC):
+        self.every = max(1, every)
+        self.fsync = fsync
+
+
+class _FileSink:
+    """Append-only text file with flush policy"""
+
+    def __init__(self, path: str, policy: Optional[FlushPolicy] = None, encoding: str = 'utf-8'):
+        self.path = str(path)
+        self.policy = policy or FlushPolicy()
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(self.path, 'a', newline='', encoding=encoding)
+        self.count = 0
+        self._unflushed = 0
+
+    def _written(self):
+        self.count += 1
+        self._unflushed += 1
+        if self._unflushed >= self.policy.every:
+            self.flush()
+
+    def flush(self):
+        if self.file.closed:
+            return
+        self.file.flush()
+        if self.policy.fsync:
+            os.fsync(self.file.fileno())
+        self._unflushed = 0
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+class NDJSONSink(_FileSink):
+    """One JSON object per line"""
+
+    def write(self, record: Dict):
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._written()
+
+
+class CSVSink(_FileSink):
+    """CSV with Google Sheets formulas, header written once per file"""
+
+    def __init__(self, path: str, policy: Optional[FlushPolicy] = None, fieldnames: Optional[List[str]] = None):
+        super().__init__(path, policy, encoding='utf-8-sig')
+        self.writer = csv.DictWriter(self.file, fieldnames=fieldnames or CSV_FIELDNAMES, extrasaction='ignore')
+        if self.file.tell() == 0:
+            self.writer.writeheader()
+
+    def write(self, record: Dict):
+        self.writer.writerow(format_csv_row(record))
+        self._written()
+
+
+class SummarySink:
+    """Counters-only summary JSON, atomically rewritten on every update"""
+
+    def __init__(self, path: str, total: Optional[int] = None, meta: Optional[Dict] = None, resume: bool = False):
+        self.path = str(path)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.summary = {
+            'total': total,
+            'successful': 0,
+            'failed': 0,
+            'status': 'running',
+            'started_at': datetime.now().isoformat(),
+            'timestamp': None,
+            'last_error': None,
+            **(meta or {}),
+        }
+        if resume:
+            # Resumed run (checkpoint.py): keep counting from the previous summary
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    previous = json.load(f)
+                for key in ('successful', 'failed', 'started_at', 'last_error'):
+                    self.summary[key] = previous.get(key, self.summary[key])
+                self.summary['resumed_at'] = datetime.now().isoformat()
+            except (FileNotFoundError, ValueError):
+                pass
+        self._save()
+
+    def write(self, record: Dict):
+        self.summary['successful'] += 1
+        self._save()
+
+    def fail(self, url: str, error: Optional[str] = None):
+        self.summary['failed'] += 1
+        self.summary['last_error'] = {'url': url, 'error': error}
+        self._save()
+
+    def update(self, **fields):
+        self.summary.update(fields)
+        self._save()
+
+    def _save(self):
+        self.summary['timestamp'] = datetime.now().isoformat()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def close(self, status: str = 'completed'):
+        self.update(status=status)
+
+
+class ListSink:
+    """Keeps (optionally transformed) records in memory - for API job responses"""
+
+    def __init__(self, transform=None):
+        self.transform = transform
+        self.records: List = []
+
+    def write(self, record: Dict):
+        self.records.append(self.transform(record) if self.transform else record)
+
+    def close(self):
+        pass
+
+
+class RunSinks:
+    """
+    All streaming outputs of one batch/category/API run
+
+    Files (under output_dir):
+        {name}.ndjson          every successful result, raw
+        {name}.csv             same rows with Sheets formulas (optional)
+        {name}.parquet|.arrow  typed columns (optional, see parquet_sink.py)
+        {name}_summary.json    counters, updated as lots complete
+    and, unless lot_store=False, upserts into the lot history store (lot_store.py)
+    and marks lots in the seen-lot index (seen_index.py, unless seen_index=False).
+    A watch sink (watcher.WatchSink) runs ahead of the lot store, so it still
+    sees each lot's previous snapshot.
+    With resume=True an interrupted run's files are appended to and its counters kept;
+    the columnar file is not appendable, so the resumed rows go to a new part file.
+    """
+
+    def __init__(self, output_dir: str, name: str, save_csv: bool = True, total: Optional[int] = None,
+                 meta: Optional[Dict] = None, policy: Optional[FlushPolicy] = None, extra_sinks: Optional[List] = None,
+                 columnar: Optional[str] = None, lot_store: bool = config.LOT_STORE_ENABLED, resume: bool = False,
+                 seen_index: bool = config.SEEN_INDEX_ENABLED, watch=None):
+        output_path = Path(output_dir)
+        self.paths = {
+            'ndjson': str(output_path / f"{name}.ndjson"),
+            'csv': str(output_path / f"{name}.csv") if save_csv else None,
+            'summary': str(output_path / f"{name}_summary.json"),
+        }
+        self.sinks = [NDJSONSink(self.paths['ndjson'], policy)]
+        if save_csv:
+            self.sinks.append(CSVSink(self.paths['csv'], policy))
+        if columnar:
+            if columnar not in ('parquet', 'arrow'):
+                raise ValueError(f"Unknown columnar format '{columnar}' (use 'parquet' or 'arrow')")
+            from parquet_sink import ParquetSink, part_files
+            columnar_sink = ParquetSink(str(output_path / f"{name}.{columnar}"), resume=resume)
+            self.paths[columnar] = columnar_sink.path
+            if resume:
+                # Rows of the interrupted run stay in the earlier file(s)
+                self.paths[f'{columnar}_parts'] = part_files(str(output_path / f"{name}.{columnar}"))
+            self.sinks.append(columnar_sink)
+        if watch:
+            self.sinks.append(watch)
+        if lot_store:
+            from lot_store import LotStoreSink
+            self.sinks.append(LotStoreSink(job_id=(meta or {}).get('job_id')))
+        if seen_index:
+            from seen_index import SeenIndexSink
+            self.sinks.append(SeenIndexSink())
+        self.sinks.extend(extra_sinks or [])
+        self.summary = SummarySink(self.paths['summary'], total=total,
+                                   meta={**(meta or {}), 'output_files': self.paths}, resume=resume)
+
+    @property
+    def successful(self) -> int:
+        return self.summary.summary['successful']
+
+    @property
+    def failed(self) -> int:
+        return self.summary.summary['failed']
+
+    def write(self, record: Dict):
+        for sink in self.sinks:
+            sink.write(record)
+        # Summary last: its counter only moves once the record is on disk
+        self.summary.write(record)
+
+    def fail(self, url: str, error: Optional[str] = None):
+        self.summary.fail(url, error)
+
+    def close(self, status: str = 'completed'):
+        for sink in self.sinks:
+            sink.close()
+        self.summary.close(status)
+
+    def suspend(self):
+        """Close the output files but leave the run 'running' (shutdown - resumed at the next start)"""
+        for sink in self.sinks:
+            sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close('failed' if exc_type else 'completed')
+        return False
+
+
+def read_ndjson(path: str):
+    """Iterate records of an NDJSON file (skips a torn last line after a crash)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def read_records(path: str):
+    """Iterate results from an NDJSON, CSV (Sheets-formatted) or JSON results file"""
+    if path.endswith('.ndjson'):
+        yield from read_ndjson(path)
+    elif path.endswith('.csv'):
+        with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+            yield from csv.DictReader(f)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        yield from (data.get('results') or []) if isinstance(data, dict) else data
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Cost-ordered extraction strategy planner
+
+Runs extraction strategies from cheapest to most expensive (per field
+they actually fill) and stops as soon as every required field is filled.
+Optional fields (seller, bottles count) that are still empty are filled
+by the cheap strategies anyway - some fields only one strategy finds.
+Cost and yield of each run are persisted so the order follows real data.
+"""
+
+import sys
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional, Dict, List, Callable, Awaitable
+
+import config
+
+
+class Strategy:
+    """One extraction strategy: an async callable (page, data) that fills `data` in place"""
+
+    def __init__(self, name: str, func: Callable[..., Awaitable[None]], fills: List[str], prior_ms: float):
+        self.name = name
+        self.func = func
+        self.fills = fills
+        self.prior_ms = prior_ms
+
+
+def _is_filled(value) -> bool:
+    return value not in (None, '', [])
+
+
+class StrategyPlanner:
+    def __init__(self, strategies: List[Strategy],
+                 required_fields: Optional[List[str]] = None,
+                 optional_fields: Optional[List[str]] = None,
+                 stats_path: str = config.STRATEGY_STATS_FILE):
+        self.strategies = strategies
+        self.required_fields = required_fields or config.STRATEGY_REQUIRED_FIELDS
+        self.optional_fields = config.STRATEGY_OPTIONAL_FIELDS if optional_fields is None else optional_fields
+        self.stats_path = stats_path
+        self.stats = self._load_stats(stats_path)
+
+    @staticmethod
+    def _load_stats(path: str) -> Dict[str, Dict]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def save(self):
+        Path(self.stats_path).parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{self.stats_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.stats, f, indent=2)
+        os.replace(tmp_path, self.stats_path)
+
+    def expected_cost(self, strategy: Strategy) -> float:
+        """Average milliseconds per filled field (prior cost until there is data)"""
+        entry = self.stats.get(strategy.name)
+        if not entry or not entry['runs']:
+            return strategy.prior_ms
+        avg_ms = entry['total_ms'] / entry['runs']
+        avg_yield = entry['filled'] / entry['runs']
+        return avg_ms / max(avg_yield, 0.1)
+
+    def plan(self) -> List[Strategy]:
+        return sorted(self.strategies, key=self.expected_cost)
+
+    def missing(self, data: Dict) -> List[str]:
+        return [field for field in self.required_fields if not _is_filled(data.get(field))]
+
+    def missing_optional(self, data: Dict) -> List[str]:
+        return [field for field in self.optional_fields if not _is_filled(data.get(field))]
+
+    async def run(self, page, data: Dict) -> List[Dict]:
+        """
+        Run strategies cheapest-first until required fields are filled
+        (cheap ones also run for empty optional fields)
+
+        Returns:
+            Per-strategy log: name, milliseconds, fields filled (skipped
+            strategies are listed with skipped=True)
+        """
+        log = []
+        for strategy in self.plan():
+            missing = self.missing(data)
+            cheap = self.expected_cost(strategy) <= config.STRATEGY_OPTIONAL_MAX_MS
+            optional = self.missing_optional(data) if cheap else []
+            if not missing and not optional:
+                log.append({'strategy': strategy.name, 'skipped': True, 'reason': 'complete'})
+                continue
+
+            # Only worth running if it can fill something still missing
+            wanted = [f for f in strategy.fills if not _is_filled(data.get(f))]
+            if not set(wanted) & (set(missing) | set(optional)):
+                log.append({'strategy': strategy.name, 'skipped': True, 'reason': 'no missing fields'})
+                continue
+
+            before = {f for f in strategy.fills if _is_filled(data.get(f))}
+            started = time.perf_counter()
+            try:
+                await strategy.func(page, data)
+            except Exception as e:
+                print(f"⚠️  Strategy {strategy.name} failed: {e}")
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            filled = [f for f in strategy.fills if _is_filled(data.get(f)) and f not in before]
+
+            entry = self.stats.setdefault(strategy.name, {'runs': 0, 'total_ms': 0.0, 'filled': 0})
+            entry['runs'] += 1
+            entry['total_ms'] += elapsed_ms
+            entry['filled'] += len(filled)
+
+            log.append({'strategy': strategy.name, 'ms': round(elapsed_ms, 1), 'filled': filled})
+
+        return log
+
+
+def print_report(path: str = config.STRATEGY_STATS_FILE):
+    stats = StrategyPlanner._load_stats(path)
+    print("=" * 70)
+    print(f"🧭 Strategy stats ({path})")
+    print("=" * 70)
+    if not stats:
+        print("No data")
+        return
+
+    print(f"{'strategy':<20} {'runs':>6} {'avg ms':>9} {'avg filled':>11} {'ms/field':>9}")
+    print("-" * 70)
+    for name, entry in sorted(stats.items(), key=lambda kv: kv[1]['total_ms'] / max(kv[1]['filled'], 1)):
+        runs = entry['runs'] or 1
+        print(f"{name:<20} {entry['runs']:>6} {entry['total_ms'] / runs:>9.1f} "
+              f"{entry['filled'] / runs:>11.2f} {entry['total_ms'] / max(entry['filled'], 1):>9.1f}")
+
+
+if __name__ == '__main__':
+    print_report(sys.argv[1] if len(sys.argv) > 1 else config.STRATEGY_STATS_FILE)
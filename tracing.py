@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Per-lot tracing - where did the 45 seconds go
+
+Spans nest through a contextvar, so they work across await points and
+concurrent lots stay separate. lot_id and job_id set on a span are
+inherited by its children. Finished spans are appended to
+config.TRACE_FILE, one JSON object per line; with TRACE_FORMAT = 'otlp'
+each line is an OTLP/JSON ExportTraceServiceRequest (what the
+OpenTelemetry collector's file receiver reads).
+
+    with span('goto', url=url):
+        await page.goto(url)
+
+CLI:
+    python tracing.py slowest [--top 10] [--job JOB_ID]   # flame-style breakdown
+    python tracing.py stages                              # avg / p95 per span name
+"""
+
+import sys
+import contextvars
+import functools
+import inspect
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Dict, List
+
+import config
+
+LOT_SPAN = 'scrape_listing'
+INHERITED = ('lot_id', 'job_id')
+
+_current: contextvars.ContextVar[Optional['Span']] = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'start_ns', 'end_ns', 'attrs', 'status')
+
+    def __init__(self, name: str, parent: Optional['Span'], attrs: Dict):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        inherited = {key: parent.attrs[key] for key in INHERITED if parent and parent.attrs.get(key) is not None}
+        self.attrs = {**inherited, **{key: value for key, value in attrs.items() if value is not None}}
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = 'ok'
+
+    def set(self, **attrs):
+        self.attrs.update({key: value for key, value in attrs.items() if value is not None})
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict:
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start_ns': self.start_ns,
+            'duration_ms': round(self.duration_ms, 2),
+            'status': self.status,
+            'attrs': self.attrs,
+        }
+
+    def to_otlp(self) -> Dict:
+        def value(v):
+            if isinstance(v, bool):
+                return {'boolValue': v}
+            if isinstance(v, int):
+                return {'intValue': str(v)}
+            if isinstance(v, float):
+                return {'doubleValue': v}
+            return {'stringValue': str(v)}
+
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': 1,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [{'key': key, 'value': value(v)} for key, v in self.attrs.items()],
+            'status': {'code': 2 if self.status == 'error' else 1},
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return {'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': config.TRACE_SERVICE_NAME}}]},
+            'scopeSpans': [{'scope': {'name': 'tracing'}, 'spans': [span]}],
+        }]}
+
+
+class Exporter:
+    """Appends finished spans to the trace file; rotates to .1 past TRACE_MAX_BYTES"""
+
+    _shared = None
+
+    def __init__(self, path: str = config.TRACE_FILE, fmt: str = config.TRACE_FORMAT):
+        self.path = path
+        self.fmt = fmt
+        self._lock = threading.Lock()
+        self._file = None
+
+    @classmethod
+    def shared(cls) -> 'Exporter':
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_otlp() if self.fmt == 'otlp' else span.to_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            if self._file is None:
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(line + '\n')
+            self._file.flush()
+            if self._file.tell() > config.TRACE_MAX_BYTES:
+                self._file.close()
+                os.replace(self.path, f"{self.path}.1")
+                self._file = None
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time a block as a child of the current span (no-op when config.TRACING is off)"""
+    if not config.TRACING:
+        yield None
+        return
+    parent = _current.get()
+    current = Span(name, parent, attrs)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = 'error'
+        current.set(error=f"{type(e).__name__}: {e}"[:200])
+        raise
+    finally:
+        _current.reset(token)
+        current.end_ns = time.time_ns()
+        try:
+            Exporter.shared().export(current)
+        except OSError as e:
+            print(f"[{time.strftime('%H:%M:%S')}] ⚠️  Could not write trace: {e}")
+
+
+def traced(name: str, *attr_args: str):
+    """
+    Decorator: run an async function inside a span
+
+    attr_args: argument names copied onto the span (e.g. 'job_id')
+    """
+    def decorate(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            arguments = signature.bind_partial(*args, **kwargs).arguments
+            with span(name, **{key: arguments.get(key) for key in attr_args}):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def read_spans(path: str = config.TRACE_FILE) -> List[Dict]:
+    """Spans from a trace file in either format, as to_dict() records"""
+    spans = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if 'resourceSpans' not in record:
+                spans.append(record)
+                continue
+            for resource in record['resourceSpans']:
+                for scope in resource.get('scopeSpans', []):
+                    for s in scope.get('spans', []):
+                        attrs = {a['key']: next(iter(a['value'].values())) for a in s.get('attributes', [])}
+                        start, end = int(s['startTimeUnixNano']), int(s['endTimeUnixNano'])
+                        spans.append({
+                            'trace_id': s['traceId'], 'span_id': s['spanId'], 'parent_id': s.get('parentSpanId'),
+                            'name': s['name'], 'start_ns': start, 'duration_ms': (end - start) / 1e6,
+                            'status': 'error' if s.get('status', {}).get('code') == 2 else 'ok', 'attrs': attrs,
+                        })
+    return spans
+
+
+def print_flame(root: Dict, children: Dict[str, List[Dict]], width: int = 40):
+    total = root['duration_ms'] or 1
+
+    def walk(node: Dict, depth: int):
+        offset = int((node['start_ns'] - root['start_ns']) / 1e6 / total * width)
+        length = max(1, int(node['duration_ms'] / total * width))
+        bar = ' ' * min(offset, width - 1) + '█' * min(length, width - min(offset, width - 1))
+        mark = ' ❌' if node['status'] == 'error' else ''
+        print(f"  {'  ' * depth}{node['name']:<{30 - 2 * depth}} {bar:<{width}} {node['duration_ms'] / 1000:6.2f}s{mark}")
+        for child in sorted(children.get(node['span_id'], []), key=lambda c: c['start_ns']):
+            walk(child, depth + 1)
+
+    walk(root, 0)
+
+
+def main():
+    usage = (
+        "Usage:\n"
+        "  python tracing.py slowest [--top 10] [--job JOB_ID] [--file PATH]\n"
+        "  python tracing.py stages [--file PATH]"
+    )
+    if len(sys.argv) < 2:
+        print(usage)
+        sys.exit(1)
+
+    def option(name: str, default=None):
+        if name in sys.argv and sys.argv.index(name) + 1 < len(sys.argv):
+            return sys.argv[sys.argv.index(name) + 1]
+        return default
+
+    path = option('--file', config.TRACE_FILE)
+    if not os.path.exists(path):
+        print(f"No traces in {path} (config.TRACING = {config.TRACING})")
+        sys.exit(1)
+    spans = read_spans(path)
+    command = sys.argv[1]
+
+    if command == 'slowest':
+        top, job = int(option('--top', 10)), option('--job')
+        children: Dict[str, List[Dict]] = {}
+        for s in spans:
+            if s['parent_id']:
+                children.setdefault(s['parent_id'], []).append(s)
+        lots = [s for s in spans if s['name'] == LOT_SPAN and (not job or s['attrs'].get('job_id') == job)]
+        lots.sort(key=lambda s: -s['duration_ms'])
+        print(f"🐢 {min(top, len(lots))} slowest of {len(lots)} lots\n")
+        for root in lots[:top]:
+            attrs = root['attrs']
+            print(f"lot {attrs.get('lot_id')}  {root['duration_ms'] / 1000:.1f}s  job {attrs.get('job_id') or '-'}  "
+                  f"{attrs.get('outcome', '')}")
+            print_flame(root, children)
+            print()
+
+    elif command == 'stages':
+        durations: Dict[str, List[float]] = {}
+        for s in spans:
+            durations.setdefault(s['name'], []).append(s['duration_ms'])
+        print(f"{'span':<32} {'count':>7} {'avg s':>8} {'p95 s':>8} {'total s':>9}")
+        for name, values in sorted(durations.items(), key=lambda item: -sum(item[1])):
+            values.sort()
+            p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+            print(f"{name:<32} {len(values):>7} {sum(values) / len(values) / 1000:>8.2f} {p95 / 1000:>8.2f} "
+                  f"{sum(values) / 1000:>9.1f}")
+
+    else:
+        print(usage)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Watch mode - change events instead of full result sets
+
+Each fresh scrape is compared with the lot's previous snapshot in the lot
+history store (lot_store.py). Price changes, new bids, end time extensions
+and closed lots become compact events, which are collected per time window
+(config.WATCH_WINDOW_SECONDS) and POSTed as one JSON batch to the webhook.
+Unchanged lots produce no output.
+
+Local receiver for testing:
+    python watcher.py receive --port 8765
+    WATCH_WEBHOOK_URL=http://127.0.0.1:8765/ python scheduler.py run
+"""
+
+import sys
+import atexit
+import json
+import threading
+import time
+import urllib.request
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Optional, Dict, List
+from urllib.parse import urlsplit
+
+import config
+from lot import Lot
+from lot_store import LotStore, snapshot_row
+
+EVENT_TYPES = ('price_change', 'new_bid', 'end_extended', 'closed')
+SNAPSHOT_KEYS = ('lot_id', 'url', 'title', 'price', 'currency', 'end_date', 'scraped_at', 'closed_at')
+
+
+def _is_closed(snapshot: Dict) -> bool:
+    # Set once a scrape came clearly after the end date, and kept (lot_store.lot_closed)
+    return bool(snapshot.get('closed_at'))
+
+
+def allowed_webhook_url(url: str) -> str:
+    """
+    Check a webhook URL given in an API request (the server POSTs to it)
+
+    Only http(s) to a host in WATCH_WEBHOOK_HOSTS or the host of
+    WATCH_WEBHOOK_URL; raises ValueError otherwise.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ValueError("webhook_url must be an http(s) URL")
+    allowed = set(config.WATCH_WEBHOOK_HOSTS)
+    if config.WATCH_WEBHOOK_URL:
+        allowed.add((urlsplit(config.WATCH_WEBHOOK_URL).hostname or '').lower())
+    if parts.hostname.lower() not in allowed:
+        raise ValueError(f"webhook_url host '{parts.hostname}' is not allowed (see WATCH_WEBHOOK_HOSTS)")
+    return url
+
+
+def _seconds_later(old_end: str, new_end: str) -> float:
+    try:
+        return (datetime.fromisoformat(new_end) - datetime.fromisoformat(old_end)).total_seconds()
+    except ValueError:
+        return 0.0
+
+
+def diff_snapshots(previous: Optional[Dict], current: Dict) -> List[Dict]:
+    """
+    Change events between two lots-table snapshots (lot_store.snapshot_row)
+
+    A lot seen for the first time is the baseline and produces no event.
+    A higher price in the same currency is a new bid, any other price
+    difference a price change; an end date later by more than
+    config.WATCH_END_TOLERANCE is an extension (Catawiki extends lots on
+    late bids; countdown-derived end dates jitter by a minute or two).
+    """
+    if previous is None:
+        return []
+
+    changes = []
+    old_price, new_price = previous.get('price'), current.get('price')
+    if new_price is not None and old_price != new_price:
+        same_currency = previous.get('currency') == current.get('currency')
+        rising = old_price is None or (same_currency and new_price > old_price)
+        changes.append({'type': 'new_bid' if rising else 'price_change', 'old': old_price, 'new': new_price})
+
+    old_end, new_end = previous.get('end_date'), current.get('end_date')
+    if old_end and new_end and _seconds_later(old_end, new_end) > config.WATCH_END_TOLERANCE:
+        changes.append({'type': 'end_extended', 'old': old_end, 'new': new_end})
+
+    if _is_closed(current) and not _is_closed(previous):
+        changes.append({'type': 'closed', 'old': None, 'new': new_price})
+
+    for change in changes:
+        change.update(lot_id=current['lot_id'], url=current['url'], title=current['title'],
+                      currency=current['currency'], end_date=new_end, at=current['scraped_at'])
+    return changes
+
+
+class WebhookBatcher:
+    """
+    Collects events and POSTs them once per window from a background thread
+
+    Failed deliveries are kept for the next window (up to WATCH_MAX_BUFFERED
+    events, oldest dropped first); whatever is left is sent at exit.
+    """
+
+    _shared: Dict[str, 'WebhookBatcher'] = {}
+    _lock = threading.Lock()
+
+    def __init__(self, url: str, window: float = config.WATCH_WINDOW_SECONDS,
+                 max_buffered: int = config.WATCH_MAX_BUFFERED, timeout: float = config.WATCH_TIMEOUT):
+        self.url = url
+        self.window = window
+        self.max_buffered = max_buffered
+        self.timeout = timeout
+        self.events: List[Dict] = []
+        self.stats = {'events': 0, 'batches': 0, 'errors': 0, 'dropped': 0}
+        self._events_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._window_start = datetime.now()
+        self._thread = threading.Thread(target=self._loop, name='webhook-batcher', daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def shared(cls, url: str) -> 'WebhookBatcher':
+        """One batcher per webhook URL, so concurrent jobs share a window"""
+        with cls._lock:
+            if url not in cls._shared:
+                cls._shared[url] = cls(url)
+                atexit.register(cls._shared[url].close)
+            return cls._shared[url]
+
+    def emit(self, events: List[Dict]):
+        with self._events_lock:
+            self.events.extend(events)
+            self.stats['events'] += len(events)
+            overflow = len(self.events) - self.max_buffered
+            if overflow > 0:
+                del self.events[:overflow]
+                self.stats['dropped'] += overflow
+
+    def _loop(self):
+        while not self._stop.wait(self.window):
+            self.flush()
+
+    def flush(self) -> bool:
+        with self._events_lock:
+            events, self.events = self.events, []
+        window_start, self._window_start = self._window_start, datetime.now()
+        if not events:
+            return True
+
+        payload = {
+            'source': 'catawiki-scraper',
+            'window_start': window_start.isoformat(),
+            'window_end': self._window_start.isoformat(),
+            'count': len(events),
+            'events': events,
+        }
+        try:
+            self._post(payload)
+            self.stats['batches'] += 1
+            print(f"[{time.strftime('%H:%M:%S')}] 📤 Sent {len(events)} change events to webhook")
+            return True
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f"[{time.strftime('%H:%M:%S')}] ⚠️  Webhook failed ({e}), retrying {len(events)} events next window")
+            with self._events_lock:
+                self.events[:0] = events
+            return False
+
+    def _post(self, payload: Dict):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            method='POST',
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+
+
+class WatchSink:
+    """
+    RunSinks-compatible sink that turns scrapes into change events
+
+    Must run before the LotStoreSink (RunSinks(watch=...) takes care of
+    that), otherwise the previous snapshot is already overwritten.
+
+    Args:
+        webhook_url: Where event batches go (None: only collect)
+        changed: Sink that receives the full record of every changed lot (API job results)
+        keep_events: Also keep the events in memory (API job response)
+    """
+
+    def __init__(self, webhook_url: Optional[str] = config.WATCH_WEBHOOK_URL, changed=None, keep_events: bool = False,
+                 store: Optional[LotStore] = None):
+        self.batcher = WebhookBatcher.shared(webhook_url) if webhook_url else None
+        self.changed = changed
+        self.keep_events = keep_events
+        self.events: List[Dict] = []
+        self.store = store or LotStore()
+        self.latest: Dict[int, Dict] = {}  # Snapshots written in this run, not flushed to the store yet
+        self.counts = dict.fromkeys(EVENT_TYPES, 0)
+
+    def write(self, record: Dict):
+        current = snapshot_row(record if isinstance(record, Lot) else Lot.from_scraped(record))
+        if not current:
+            return
+        previous = self.latest.get(current['lot_id']) or self.store.get(current['lot_id'])
+        if previous and previous.get('closed_at'):
+            current['closed_at'] = previous['closed_at']  # Closed stays closed, like in the store
+        self.latest[current['lot_id']] = {key: current[key] for key in SNAPSHOT_KEYS}
+
+        events = diff_snapshots(previous, current)
+        if not events:
+            return
+        for event in events:
+            self.counts[event['type']] += 1
+        if self.keep_events:
+            self.events.extend(events)
+        if self.batcher:
+            self.batcher.emit(events)
+        if self.changed is not None:
+            self.changed.write(record)
+
+    def close(self):
+        self.store.close()
+
+
+class _Receiver(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        batch = json.loads(body or b'{}')
+        print(f"[{time.strftime('%H:%M:%S')}] 📥 Batch of {batch.get('count', 0)} events "
+              f"({batch.get('window_start')} - {batch.get('window_end')})")
+        for event in batch.get('events', []):
+            print(f"   {event['type']:<13} {event['lot_id']:<10} {event.get('old')} -> {event.get('new')}  "
+                  f"{(event.get('title') or '')[:50]}")
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    usage = (
+        "Usage:\n"
+        "  python watcher.py receive [--port 8765]   # local webhook receiver that prints batches\n"
+        "  python watcher.py diff <results.ndjson>    # events these results would produce (dry run)"
+    )
+    if len(sys.argv) < 2:
+        print(usage)
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == 'receive':
+        port = 8765
+        if '--port' in sys.argv and sys.argv.index('--port') + 1 < len(sys.argv):
+            port = int(sys.argv[sys.argv.index('--port') + 1])
+        print(f"👂 Listening on http://127.0.0.1:{port}/ (set WATCH_WEBHOOK_URL to this)")
+        try:
+            HTTPServer(('127.0.0.1', port), _Receiver).serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+    elif command == 'diff' and len(sys.argv) > 2:
+        from sinks import read_records
+        sink = WatchSink(webhook_url=None, keep_events=True)  # Dry run: nothing is sent
+        for record in read_records(sys.argv[2]):
+            sink.write(record)
+        sink.close()
+        for event in sink.events:
+            print(f"{event['type']:<13} {event['lot_id']:<10} {event['old']} -> {event['new']}  "
+                  f"{(event['title'] or '')[:60]}")
+        print(f"\n🔔 {len(sink.events)} events: " + ', '.join(f"{k} {v}" for k, v in sink.counts.items()))
+
+    else:
+        print(usage)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
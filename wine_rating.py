@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+AI wine rating stage - memoized and batched enrichment of scraped lots
+
+Lot titles are normalized into a producer/vintage/region key, ratings are
+cached per key in SQLite, and only cache misses are sent to the model,
+several wines per request.
+"""
+
+import sys
+import json
+import asyncio
+import hashlib
+import re
+import sqlite3
+import time
+import unicodedata
+import urllib.request
+from abc import ABC, abstractmethod
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Dict, List, Tuple, Callable
+
+import config
+from sinks import read_ndjson
+
+
+RATING_FIELDS = [
+    'producer_rating',
+    'vintage_rating',
+    'region_rating',
+    'overall_appeal',
+    'investment_potential',
+]
+
+SYSTEM_PROMPT = """You are a professional wine expert and investment advisor. Analyze wine auction listings and provide ratings on a scale of 1-10.
+
+Your task is to evaluate each wine based on:
+1. Producer reputation and quality
+2. Vintage quality and aging potential
+3. Region prestige and terroir
+4. Overall market appeal
+5. Investment potential
+
+You receive a JSON list of wines, each with a "key" and a "title".
+Return ONLY a JSON object mapping every key to its ratings in this exact format:
+{
+  "<key>": {
+    "producer_rating": "X/10",
+    "vintage_rating": "X/10",
+    "region_rating": "X/10",
+    "overall_appeal": "X/10",
+    "investment_potential": "X/10"
+  }
+}
+
+Do not include any explanations, only the JSON."""
+
+
+def _fold(text: str) -> str:
+    """Lowercase, strip accents and collapse whitespace"""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+def parse_wine_title(title: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """
+    Split a lot title into (producer, vintage, region)
+
+    Example:
+        "2022 Beaune 1 Cru Belissand, Domaine Françoise André - Burgundy - 6 bottles (0.75L)"
+        -> ("Domaine Françoise André", "2022", "Burgundy")
+    """
+    if not title:
+        return None, None, None
+
+    vintage_match = re.search(r'\b(1[89]\d{2}|20\d{2})\b', title)
+    vintage = vintage_match.group(1) if vintage_match else None
+
+    segments = [s.strip() for s in re.split(r'\s+-\s+', title) if s.strip()]
+    name = segments[0] if segments else title
+
+    # "Wine name, Producer" -> producer is the part after the last comma
+    if ',' in name:
+        producer = name.rsplit(',', 1)[1].strip()
+    else:
+        producer = name
+    if vintage:
+        producer = producer.replace(vintage, '').strip()
+    producer = producer or None
+
+    region = None
+    for segment in segments[1:]:
+        if re.search(r'\d+\s*(?:x\s*)?(?:bottle|magnum|0[.,]\d+\s*l)', segment, re.IGNORECASE):
+            continue
+        region = segment
+        break
+
+    return producer, vintage, region
+
+
+MIXED_LOT_PATTERN = re.compile(
+    # Keywords, or "& 2016 ..." / "+ 3 x ..." joining a second wine ("Moët & Chandon" is one producer)
+    r'\b(?:mixed|mix|selection|assortment|assorted|collection|various|vertical)\b|\s[&+]\s*\d',
+    re.IGNORECASE
+)
+
+
+def is_mixed_lot(title: str) -> bool:
+    """Several wines in one lot - parse_wine_title only sees the first one"""
+    name = re.split(r'\s+-\s+', title, maxsplit=1)[0]
+    vintages = set(re.findall(r'\b(1[89]\d{2}|20\d{2})\b', title))
+    return len(vintages) > 1 or bool(MIXED_LOT_PATTERN.search(name))
+
+
+def wine_key(title: str) -> Optional[str]:
+    """
+    Normalized cache key shared by all lots of the same wine and vintage
+
+    Mixed / multi-wine lots also carry their full normalized title, so two
+    different mixes that start with the same wine don't share a rating.
+    """
+    producer, vintage, region = parse_wine_title(title)
+    if not producer:
+        return None
+    parts = [_fold(producer), vintage or '', _fold(region) if region else '']
+    if is_mixed_lot(title):
+        parts.append(_fold(title))
+    return '|'.join(parts)
+
+
+class RatingCache:
+    """SQLite cache of ratings keyed by wine_key"""
+
+    def __init__(self, db_path: str = config.AI_RATING_CACHE_DB):
+        self.db_path = db_path
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS ratings (
+                wine_key TEXT PRIMARY KEY,
+                ratings TEXT NOT NULL,
+                backend TEXT,
+                rated_at TEXT
+            )
+        """)
+        self.conn.commit()
+
+    def get_many(self, keys: List[str]) -> Dict[str, Dict]:
+        """Return cached ratings for the given keys (missing keys are omitted)"""
+        found = {}
+        keys = list(keys)
+        # Stay well below SQLite's bound parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT wine_key, ratings FROM ratings WHERE wine_key IN ({placeholders})",
+                chunk
+            )
+            for key, ratings in rows:
+                found[key] = json.loads(ratings)
+        return found
+
+    def put_many(self, ratings: Dict[str, Dict], backend: str):
+        """Store ratings for several keys in one transaction"""
+        now = datetime.now().isoformat()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO ratings (wine_key, ratings, backend, rated_at) VALUES (?, ?, ?, ?)",
+                [(key, json.dumps(value, ensure_ascii=False), backend, now) for key, value in ratings.items()]
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+class RatingBackend(ABC):
+    """Base class for rating backends - rates several wines per call"""
+
+    name = 'base'
+
+    @abstractmethod
+    async def rate_batch(self, wines: List[Dict]) -> Dict[str, Dict]:
+        """
+        Rate a batch of wines
+
+        Args:
+            wines: List of {"key": wine_key, "title": lot title}
+
+        Returns:
+            Dictionary mapping wine_key to ratings (RATING_FIELDS -> "X/10")
+        """
+
+
+class StubRatingBackend(RatingBackend):
+    """Offline backend - deterministic pseudo-ratings derived from the key"""
+
+    name = 'stub'
+
+    async def rate_batch(self, wines: List[Dict]) -> Dict[str, Dict]:
+        ratings = {}
+        for wine in wines:
+            digest = hashlib.sha256(wine['key'].encode('utf-8')).digest()
+            ratings[wine['key']] = {
+                field: f"{digest[i] % 6 + 4}/10" for i, field in enumerate(RATING_FIELDS)
+            }
+        return ratings
+
+
+class OpenAIRatingBackend(RatingBackend):
+    """OpenAI-compatible chat completions backend"""
+
+    name = 'openai'
+
+    def __init__(self, api_key: Optional[str] = config.AI_RATING_API_KEY,
+                 model: str = config.AI_RATING_MODEL,
+                 api_url: str = config.AI_RATING_API_URL,
+                 timeout: int = config.AI_RATING_TIMEOUT):
+        if not api_key:
+            raise ValueError("OpenAI backend requires an API key (OPENAI_API_KEY)")
+        self.api_key = api_key
+        self.model = model
+        self.api_url = api_url
+        self.timeout = timeout
+
+    async def rate_batch(self, wines: List[Dict]) -> Dict[str, Dict]:
+        payload = {
+            'model': self.model,
+            'temperature': 0.3,
+            'response_format': {'type': 'json_object'},
+            'messages': [
+                {'role': 'system', 'content': SYSTEM_PROMPT},
+                {'role': 'user', 'content': json.dumps(wines, ensure_ascii=False)},
+            ],
+        }
+        response = await asyncio.to_thread(self._post, payload)
+        content = response['choices'][0]['message']['content']
+        parsed = json.loads(content)
+
+        ratings = {}
+        for wine in wines:
+            value = parsed.get(wine['key'])
+            if isinstance(value, dict):
+                ratings[wine['key']] = {field: str(value.get(field, 'N/A')) for field in RATING_FIELDS}
+        return ratings
+
+    def _post(self, payload: Dict) -> Dict:
+        request = urllib.request.Request(
+            self.api_url,
+            data=json.dumps(payload).encode('utf-8'),
+            headers={
+                'Content-Type': 'application/json',
+                'Authorization': f'Bearer {self.api_key}',
+            },
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read().decode('utf-8'))
+
+
+BACKENDS = {
+    'stub': StubRatingBackend,
+    'openai': OpenAIRatingBackend,
+}
+
+
+def get_backend(name: str = config.AI_RATING_BACKEND) -> RatingBackend:
+    """Create a rating backend by name"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown rating backend '{name}' (available: {', '.join(BACKENDS)})")
+    return BACKENDS[name]()
+
+
+class WineRatingEnricher:
+    """Fill RATING_FIELDS on lot dicts, asking the model only for unseen wines"""
+
+    def __init__(self, backend: Optional[RatingBackend] = None,
+                 cache: Optional[RatingCache] = None,
+                 batch_size: int = config.AI_RATING_BATCH_SIZE,
+                 concurrency: int = config.AI_RATING_CONCURRENCY):
+        self.backend = backend or get_backend()
+        self.cache = cache or RatingCache()
+        self.batch_size = max(1, batch_size)
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.stats = {'lots': 0, 'cache_hits': 0, 'rated': 0, 'requests': 0, 'errors': 0}
+
+    async def enrich(self, lots: List[Dict]) -> List[Dict]:
+        """Add ratings to lots in place and return them"""
+        keyed = {}
+        for lot in lots:
+            key = wine_key(lot.get('title') or '')
+            if key:
+                keyed.setdefault(key, []).append(lot)
+        self.stats['lots'] += len(lots)
+
+        ratings = self.cache.get_many(keyed.keys())
+        self.stats['cache_hits'] += len(ratings)
+
+        misses = [{'key': key, 'title': group[0]['title']} for key, group in keyed.items() if key not in ratings]
+        if misses:
+            print(f"[{time.strftime('%H:%M:%S')}] 🤖 Rating {len(misses)} new wines "
+                  f"({len(ratings)} cached, backend: {self.backend.name})")
+            batches = [misses[i:i + self.batch_size] for i in range(0, len(misses), self.batch_size)]
+            for fresh in await asyncio.gather(*(self._rate(batch) for batch in batches)):
+                ratings.update(fresh)
+
+        for key, group in keyed.items():
+            if key in ratings:
+                for lot in group:
+                    for field in RATING_FIELDS:
+                        if not lot.get(field):
+                            lot[field] = ratings[key].get(field, '')
+
+        return lots
+
+    async def _rate(self, batch: List[Dict]) -> Dict[str, Dict]:
+        async with self.semaphore:
+            self.stats['requests'] += 1
+            try:
+                ratings = await self.backend.rate_batch(batch)
+            except Exception as e:
+                # Leave fields empty and don't cache - the next run retries these wines
+                self.stats['errors'] += 1
+                print(f"[{time.strftime('%H:%M:%S')}] ⚠️  Rating request failed: {e}")
+                return {}
+
+        if ratings:
+            self.cache.put_many(ratings, self.backend.name)
+            self.stats['rated'] += len(ratings)
+        return ratings
+
+
+class RatingBuffer:
+    """
+    Buffers streamed lots so new wines are still rated several per request
+
+    Lots are forwarded to `sink` (anything with write/close, e.g.
+    sinks.RunSinks) once a batch of them has been rated; `on_flush` is
+    called after each flush (checkpoint.Checkpoint.release).
+    """
+
+    def __init__(self, sink, enricher: Optional[WineRatingEnricher] = None,
+                 size: int = config.AI_RATING_BATCH_SIZE, on_flush: Optional[Callable[[], None]] = None):
+        self.sink = sink
+        self.enricher = enricher or WineRatingEnricher()
+        self.size = max(1, size)
+        self.on_flush = on_flush
+        self.pending: List[Dict] = []
+
+    async def write(self, lot: Dict):
+        self.pending.append(lot)
+        if len(self.pending) >= self.size:
+            await self.flush()
+
+    async def flush(self):
+        if self.pending:
+            lots, self.pending = self.pending, []
+            try:
+                await self.enricher.enrich(lots)
+            except BaseException:
+                self.pending = lots + self.pending  # Kept for abort()
+                raise
+            for lot in lots:
+                self.sink.write(lot)
+        if self.on_flush:
+            self.on_flush()
+
+    async def close(self):
+        """Rate and write what is left; if rating fails the lots are still written, unrated"""
+        try:
+            await self.flush()
+        finally:
+            self.abort()
+        print(f"[{time.strftime('%H:%M:%S')}] 🍷 Ratings: {self.enricher.stats}")
+
+    def abort(self):
+        """Write the pending lots unrated (no model call) and close - the job stopped early"""
+        lots, self.pending = self.pending, []
+        for lot in lots:
+            self.sink.write(lot)
+        if lots and self.on_flush:
+            self.on_flush()
+        self.enricher.cache.close()
+        if lots:
+            print(f"[{time.strftime('%H:%M:%S')}] 🍷 {len(lots)} lots written without rating")
+
+
+async def enrich_lots(lots: List[Dict], backend: Optional[str] = None) -> List[Dict]:
+    """Convenience wrapper used by the batch/category pipelines"""
+    enricher = WineRatingEnricher(backend=get_backend(backend or config.AI_RATING_BACKEND))
+    try:
+        await enricher.enrich(lots)
+        print(f"[{time.strftime('%H:%M:%S')}] 🍷 Ratings: {enricher.stats}")
+    finally:
+        enricher.cache.close()
+    return lots
+
+
+async def main():
+    if len(sys.argv) < 2:
+        print("Usage: python wine_rating.py <results.json|results.ndjson> [--backend stub|openai]")
+        print("\nAdds AI ratings to a file of scraped lots (file is updated in place)")
+        sys.exit(1)
+
+    path = sys.argv[1]
+    backend = None
+    if '--backend' in sys.argv:
+        backend_index = sys.argv.index('--backend')
+        if backend_index + 1 < len(sys.argv):
+            backend = sys.argv[backend_index + 1]
+
+    if path.endswith('.ndjson'):
+        data = lots = list(read_ndjson(path))
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        # Accept both a plain list and a job result with "results"
+        lots = data.get('results', []) if isinstance(data, dict) else data
+
+    await enrich_lots(lots, backend=backend)
+
+    with open(path, 'w', encoding='utf-8') as f:
+        if path.endswith('.ndjson'):
+            for lot in lots:
+                f.write(json.dumps(lot, ensure_ascii=False) + '\n')
+        else:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+    print(f"💾 Saved ratings to {path}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
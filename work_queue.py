@@ -0,0 +1,696 @@
+#!/usr/bin/env python3
+"""
+Shared work queue - fan lot URLs out across scraper nodes
+
+Lot URLs are put on a named queue (one per job), claimed by workers with a
+time-limited lease and then completed (with the scraped result) or
+released. A lease is just an "available again at" time: when a worker
+dies, its lots become claimable once the lease runs out, no separate
+reaper needed. A live worker renews the lease while its lot is running
+(a lot can sit behind an open breaker or the memory governor for longer
+than one lease). Results travel back through the queue, so the job that
+pushed the URLs writes them into its own sinks (one NDJSON, one lot store).
+
+Backends (config.WORK_QUEUE_URL):
+    sqlite:///output/work_queue.db   single host, any number of worker processes
+    redis://host:6379/0              many hosts; any RESP server works, e.g. the
+                                     in-memory stand-in `python resp_server.py`
+
+Usage:
+    python work_queue.py work [--queue NAME ...] [--concurrency N]
+    python work_queue.py push <queue> <urls.txt|url ...>
+    python work_queue.py collect <queue> [--wait]
+    python work_queue.py stats [queue]
+    python work_queue.py purge <queue>
+"""
+
+import sys
+import asyncio
+import inspect
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional, Dict, List, Tuple, Callable
+from urllib.parse import urlsplit
+
+import config
+
+# stats(): queued (claimable), retrying (released, waiting out WORK_RETRY_DELAY),
+# leased (claimed, lease running), expired (claimed, lease ran out), done, failed
+STAT_KEYS = ('queued', 'retrying', 'leased', 'expired', 'done', 'failed')
+
+
+class WorkQueue(ABC):
+    """
+    Backend interface
+
+    Item states: queued (claimable once available_at has passed; a claimed
+    item is queued with available_at = lease expiry), done (with result)
+    and failed (with error, after config.WORK_MAX_ATTEMPTS claims).
+    """
+
+    _shared = None
+
+    def __init__(self, lease_seconds: float = config.WORK_LEASE_SECONDS,
+                 max_attempts: int = config.WORK_MAX_ATTEMPTS):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    @classmethod
+    def shared(cls) -> 'WorkQueue':
+        """Process-wide queue for config.WORK_QUEUE_URL"""
+        if WorkQueue._shared is None:
+            WorkQueue._shared = open_queue(config.WORK_QUEUE_URL)
+        return WorkQueue._shared
+
+    @abstractmethod
+    def put(self, queue: str, items: List[str], force: bool = False) -> int:
+        """Enqueue items not seen on this queue before (force: also re-queue done/failed ones)"""
+
+    @abstractmethod
+    def claim(self, queue: str, worker: str, count: int = 1) -> List[str]:
+        """Lease up to `count` available items"""
+
+    @abstractmethod
+    def complete(self, queue: str, item: str, worker: str, result: Optional[Dict] = None) -> bool:
+        """Store the result; False if the lease was lost to another worker"""
+
+    @abstractmethod
+    def release(self, queue: str, item: str, worker: str, error: Optional[str] = None) -> bool:
+        """Give the item back (retried after WORK_RETRY_DELAY, failed after max attempts)"""
+
+    @abstractmethod
+    def renew(self, queue: str, item: str, worker: str) -> bool:
+        """Extend the lease to a full lease_seconds from now; False if it was lost to another worker"""
+
+    @abstractmethod
+    def finished(self, queue: str, items: List[str]) -> Dict[str, Tuple[str, Optional[object]]]:
+        """item -> ('done', result) / ('failed', error) for the finished ones among items"""
+
+    @abstractmethod
+    def items(self, queue: str) -> List[str]:
+        """Every item ever put on the queue"""
+
+    @abstractmethod
+    def queues(self) -> List[str]:
+        """Queues that have items"""
+
+    @abstractmethod
+    def stats(self, queue: str) -> Dict:
+        """Item counts by state (STAT_KEYS)"""
+
+    @abstractmethod
+    def purge(self, queue: str):
+        """Delete the queue and everything on it"""
+
+    def close(self):
+        pass
+
+    async def wait_for(self, queue: str, items: List[str], on_result: Callable, on_failure: Callable,
+                       timeout: Optional[float] = None, poll: float = config.WORK_POLL_SECONDS) -> List[str]:
+        """
+        Hand each item's outcome to on_result(item, result) / on_failure(item, error) as workers finish
+
+        Callbacks may be coroutines. Returns the items still unfinished at timeout
+        (None: wait for all, 0: a single pass over what is already finished).
+        Backend calls run in a thread, so a remote queue doesn't block the event loop.
+        """
+        pending = list(dict.fromkeys(items))
+        deadline = time.time() + timeout if timeout is not None else None
+        while pending:
+            finished = await asyncio.to_thread(self.finished, queue, pending)
+            for item, (status, payload) in finished.items():
+                outcome = on_result(item, payload) if status == 'done' else on_failure(item, payload)
+                if inspect.isawaitable(outcome):
+                    await outcome
+            if finished:
+                pending = [item for item in pending if item not in finished]
+            if not pending or (deadline is not None and time.time() >= deadline):
+                break
+            await asyncio.sleep(poll)
+        return pending
+
+    async def fetch(self, queue: str, item: str, timeout: float = config.WORK_RESULT_TIMEOUT) -> Optional[Dict]:
+        """Scrape one item on whichever node claims it (re-queued even if done before)"""
+        await asyncio.to_thread(self.put, queue, [item], True)
+        outcome = {}
+        await self.wait_for(queue, [item], lambda _, result: outcome.update(result=result),
+                            lambda _, error: None, timeout=timeout)
+        return outcome.get('result')
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """Single-host backend; claims run in an IMMEDIATE transaction so two workers never share a lease"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS work (
+        queue TEXT NOT NULL,
+        item TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'queued',
+        available_at REAL NOT NULL,
+        owner TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        error TEXT,
+        result TEXT,
+        updated_at REAL,
+        PRIMARY KEY (queue, item)
+    );
+    CREATE INDEX IF NOT EXISTS idx_work_claim ON work(queue, status, available_at);
+    """
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path, isolation_level=None, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(self.SCHEMA)
+        self._lock = threading.Lock()
+
+    def _transaction(self, fn):
+        with self._lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                value = fn()
+                self.conn.execute('COMMIT')
+                return value
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+
+    def put(self, queue: str, items: List[str], force: bool = False) -> int:
+        now = time.time()
+        rows = [(queue, item, now, now) for item in dict.fromkeys(items)]
+
+        def insert():
+            before = self.conn.total_changes
+            if force:
+                self.conn.executemany("""
+                    INSERT INTO work (queue, item, available_at, updated_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(queue, item) DO UPDATE SET status = 'queued', available_at = excluded.available_at,
+                        owner = NULL, attempts = 0, error = NULL, result = NULL, updated_at = excluded.updated_at
+                    WHERE work.status != 'queued'
+                """, rows)
+            else:
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO work (queue, item, available_at, updated_at) VALUES (?, ?, ?, ?)", rows
+                )
+            return self.conn.total_changes - before
+
+        return self._transaction(insert)
+
+    def claim(self, queue: str, worker: str, count: int = 1) -> List[str]:
+        def take():
+            now = time.time()
+            rows = self.conn.execute(
+                "SELECT item, attempts FROM work WHERE queue = ? AND status = 'queued' AND available_at <= ? "
+                "ORDER BY available_at LIMIT ?", (queue, now, count)
+            ).fetchall()
+            claimed = []
+            for item, attempts in rows:
+                if attempts >= self.max_attempts:
+                    # Lease ran out max_attempts times (worker died or hung on this lot)
+                    self.conn.execute(
+                        "UPDATE work SET status = 'failed', owner = NULL, error = COALESCE(error, ?), updated_at = ? "
+                        "WHERE queue = ? AND item = ?", ('Lease expired too often', now, queue, item)
+                    )
+                    continue
+                self.conn.execute(
+                    "UPDATE work SET owner = ?, available_at = ?, attempts = attempts + 1, updated_at = ? "
+                    "WHERE queue = ? AND item = ?", (worker, now + self.lease_seconds, now, queue, item)
+                )
+                claimed.append(item)
+            return claimed
+
+        return self._transaction(take)
+
+    def complete(self, queue: str, item: str, worker: str, result: Optional[Dict] = None) -> bool:
+        with self._lock:
+            cursor = self.conn.execute(
+                "UPDATE work SET status = 'done', owner = NULL, result = ?, error = NULL, updated_at = ? "
+                "WHERE queue = ? AND item = ? AND status = 'queued' AND owner = ?",
+                (json.dumps(result, ensure_ascii=False, default=str), time.time(), queue, item, worker)
+            )
+        return cursor.rowcount == 1
+
+    def release(self, queue: str, item: str, worker: str, error: Optional[str] = None) -> bool:
+        now = time.time()
+        with self._lock:
+            cursor = self.conn.execute("""
+                UPDATE work SET owner = NULL, error = ?, updated_at = ?,
+                    status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,
+                    available_at = ?
+                WHERE queue = ? AND item = ? AND status = 'queued' AND owner = ?
+            """, (error, now, self.max_attempts, now + config.WORK_RETRY_DELAY, queue, item, worker))
+        return cursor.rowcount == 1
+
+    def renew(self, queue: str, item: str, worker: str) -> bool:
+        now = time.time()
+        with self._lock:
+            cursor = self.conn.execute(
+                "UPDATE work SET available_at = ?, updated_at = ? "
+                "WHERE queue = ? AND item = ? AND status = 'queued' AND owner = ?",
+                (now + self.lease_seconds, now, queue, item, worker)
+            )
+        return cursor.rowcount == 1
+
+    def finished(self, queue: str, items: List[str]) -> Dict[str, Tuple[str, Optional[object]]]:
+        finished = {}
+        with self._lock:
+            for start in range(0, len(items), 500):
+                chunk = items[start:start + 500]
+                rows = self.conn.execute(
+                    f"SELECT item, status, result, error FROM work WHERE queue = ? AND status != 'queued' "
+                    f"AND item IN ({','.join('?' * len(chunk))})", [queue, *chunk]
+                )
+                for item, status, result, error in rows:
+                    finished[item] = (status, json.loads(result) if status == 'done' and result else error)
+        return finished
+
+    def items(self, queue: str) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self.conn.execute("SELECT item FROM work WHERE queue = ?", (queue,))]
+
+    def queues(self) -> List[str]:
+        with self._lock:
+            rows = self.conn.execute("SELECT DISTINCT queue FROM work WHERE status = 'queued'")
+            return [row[0] for row in rows]
+
+    def stats(self, queue: str) -> Dict:
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute("""
+                SELECT
+                    SUM(status = 'queued' AND owner IS NULL AND available_at <= ?),
+                    SUM(status = 'queued' AND owner IS NULL AND available_at > ?),
+                    SUM(status = 'queued' AND owner IS NOT NULL AND available_at > ?),
+                    SUM(status = 'queued' AND owner IS NOT NULL AND available_at <= ?),
+                    SUM(status = 'done'),
+                    SUM(status = 'failed')
+                FROM work WHERE queue = ?
+            """, (now, now, now, now, queue)).fetchone()
+        return dict(zip(STAT_KEYS, (value or 0 for value in row)))
+
+    def purge(self, queue: str):
+        with self._lock:
+            self.conn.execute("DELETE FROM work WHERE queue = ?", (queue,))
+
+    def close(self):
+        self.conn.close()
+
+
+class RespError(Exception):
+    pass
+
+
+class RespClient:
+    """Minimal blocking RESP2 client (only what RedisWorkQueue needs, no redis package)"""
+
+    def __init__(self, host: str = 'localhost', port: int = 6379, db: int = 0, password: Optional[str] = None,
+                 timeout: float = 10):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.reader = self.sock.makefile('rb')
+        self.lock = threading.RLock()
+        if password:
+            self.execute('AUTH', password)
+        if db:
+            self.execute('SELECT', db)
+
+    def execute(self, *args):
+        with self.lock:
+            parts = [f"*{len(args)}\r\n".encode()]
+            for arg in args:
+                data = arg if isinstance(arg, bytes) else str(arg).encode('utf-8')
+                parts.append(f"${len(data)}\r\n".encode() + data + b"\r\n")
+            self.sock.sendall(b''.join(parts))
+            return self._read()
+
+    def _read(self):
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("RESP server closed the connection")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode()
+        if kind == b'-':
+            raise RespError(rest.decode())
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self.reader.read(length + 2)[:-2]
+            return data.decode('utf-8')
+        if kind == b'*':
+            length = int(rest)
+            return None if length < 0 else [self._read() for _ in range(length)]
+        raise RespError(f"Unexpected RESP reply: {line!r}")
+
+    def close(self):
+        self.sock.close()
+
+
+class RedisWorkQueue(WorkQueue):
+    """
+    Multi-host backend on any RESP server
+
+    Per queue: a sorted set item -> available_at (claimable when <= now) and
+    hashes for owner, attempts, status, result and error. Claims are
+    optimistic WATCH/MULTI/EXEC transactions, retried on conflict.
+    """
+
+    def __init__(self, client: RespClient, prefix: str = 'wq', **kwargs):
+        super().__init__(**kwargs)
+        self.r = client
+        self.prefix = prefix
+
+    def _key(self, queue: str, part: str) -> str:
+        return f"{self.prefix}:{queue}:{part}"
+
+    def _transaction(self, commands: List[Tuple]) -> Optional[List]:
+        self.r.execute('MULTI')
+        for command in commands:
+            self.r.execute(*command)
+        return self.r.execute('EXEC')
+
+    def put(self, queue: str, items: List[str], force: bool = False) -> int:
+        now = time.time()
+        added = 0
+        with self.r.lock:
+            self.r.execute('SADD', f"{self.prefix}:queues", queue)
+            for item in dict.fromkeys(items):
+                if force:
+                    if self.r.execute('ZSCORE', self._key(queue, 'queue'), item) is not None:
+                        continue  # Already queued or leased
+                    self._transaction([
+                        ('SADD', self._key(queue, 'all'), item),
+                        ('HDEL', self._key(queue, 'status'), item),
+                        ('HDEL', self._key(queue, 'result'), item),
+                        ('HDEL', self._key(queue, 'error'), item),
+                        ('HSET', self._key(queue, 'attempts'), item, 0),
+                        ('ZADD', self._key(queue, 'queue'), now, item),
+                    ])
+                    added += 1
+                elif self.r.execute('SADD', self._key(queue, 'all'), item):
+                    self.r.execute('ZADD', self._key(queue, 'queue'), now, item)
+                    added += 1
+        return added
+
+    def claim(self, queue: str, worker: str, count: int = 1) -> List[str]:
+        key = self._key(queue, 'queue')
+        with self.r.lock:
+            for _ in range(config.WORK_CLAIM_RETRIES):
+                now = time.time()
+                self.r.execute('WATCH', key)
+                items = self.r.execute('ZRANGEBYSCORE', key, '-inf', now, 'LIMIT', 0, count)
+                if not items:
+                    self.r.execute('UNWATCH')
+                    return []
+                commands = []
+                for item in items:
+                    commands += [
+                        ('ZADD', key, now + self.lease_seconds, item),
+                        ('HSET', self._key(queue, 'owner'), item, worker),
+                        ('HINCRBY', self._key(queue, 'attempts'), item, 1),
+                    ]
+                replies = self._transaction(commands)
+                if replies is None:
+                    continue  # Another worker claimed first, try again
+
+                claimed = []
+                for n, item in enumerate(items):
+                    if replies[n * 3 + 2] > self.max_attempts:
+                        # Lease ran out max_attempts times (worker died or hung on this lot)
+                        self._finish(queue, item, 'failed', error='Lease expired too often')
+                    else:
+                        claimed.append(item)
+                return claimed
+        return []
+
+    def _finish(self, queue: str, item: str, status: str, result: Optional[Dict] = None,
+                error: Optional[str] = None):
+        commands = [
+            ('ZREM', self._key(queue, 'queue'), item),
+            ('HDEL', self._key(queue, 'owner'), item),
+            ('HSET', self._key(queue, 'status'), item, status),
+        ]
+        if result is not None:
+            commands.append(('HSET', self._key(queue, 'result'), item, json.dumps(result, ensure_ascii=False, default=str)))
+        if error is not None:
+            commands.append(('HSET', self._key(queue, 'error'), item, error))
+        self._transaction(commands)
+
+    def _owns(self, queue: str, item: str, worker: str) -> bool:
+        return self.r.execute('HGET', self._key(queue, 'owner'), item) == worker
+
+    def complete(self, queue: str, item: str, worker: str, result: Optional[Dict] = None) -> bool:
+        with self.r.lock:
+            if not self._owns(queue, item, worker):
+                return False
+            self._finish(queue, item, 'done', result=result or {})
+            return True
+
+    def release(self, queue: str, item: str, worker: str, error: Optional[str] = None) -> bool:
+        with self.r.lock:
+            if not self._owns(queue, item, worker):
+                return False
+            attempts = int(self.r.execute('HGET', self._key(queue, 'attempts'), item) or 0)
+            if attempts >= self.max_attempts:
+                self._finish(queue, item, 'failed', error=error or 'Released')
+            else:
+                self._transaction([
+                    ('HDEL', self._key(queue, 'owner'), item),
+                    ('ZADD', self._key(queue, 'queue'), time.time() + config.WORK_RETRY_DELAY, item),
+                ] + ([('HSET', self._key(queue, 'error'), item, error)] if error else []))
+            return True
+
+    def renew(self, queue: str, item: str, worker: str) -> bool:
+        with self.r.lock:
+            if not self._owns(queue, item, worker):
+                return False
+            # XX: only while still queued/leased (not completed by a faster worker meanwhile)
+            self.r.execute('ZADD', self._key(queue, 'queue'), 'XX', time.time() + self.lease_seconds, item)
+            return True
+
+    def finished(self, queue: str, items: List[str]) -> Dict[str, Tuple[str, Optional[object]]]:
+        finished = {}
+        with self.r.lock:
+            for start in range(0, len(items), 500):
+                chunk = items[start:start + 500]
+                statuses = self.r.execute('HMGET', self._key(queue, 'status'), *chunk)
+                done = [item for item, status in zip(chunk, statuses) if status == 'done']
+                failed = [item for item, status in zip(chunk, statuses) if status == 'failed']
+                if done:
+                    results = self.r.execute('HMGET', self._key(queue, 'result'), *done)
+                    finished.update((item, ('done', json.loads(result) if result else {}))
+                                    for item, result in zip(done, results))
+                if failed:
+                    errors = self.r.execute('HMGET', self._key(queue, 'error'), *failed)
+                    finished.update((item, ('failed', error)) for item, error in zip(failed, errors))
+        return finished
+
+    def items(self, queue: str) -> List[str]:
+        return self.r.execute('SMEMBERS', self._key(queue, 'all')) or []
+
+    def queues(self) -> List[str]:
+        with self.r.lock:
+            names = self.r.execute('SMEMBERS', f"{self.prefix}:queues") or []
+            return [name for name in names if self.r.execute('ZCARD', self._key(name, 'queue'))]
+
+    def stats(self, queue: str) -> Dict:
+        now = time.time()
+        with self.r.lock:
+            key = self._key(queue, 'queue')
+            total = self.r.execute('ZCARD', key)
+            owned = self.r.execute('HLEN', self._key(queue, 'owner'))
+            # Future score: a lease (has an owner) or a released item waiting out WORK_RETRY_DELAY (none)
+            waiting = self.r.execute('ZRANGEBYSCORE', key, now, '+inf') or []
+            available = total - len(waiting)
+            leased = 0
+            for start in range(0, len(waiting), 500):
+                owners = self.r.execute('HMGET', self._key(queue, 'owner'), *waiting[start:start + 500])
+                leased += sum(1 for owner in owners if owner is not None)
+            statuses = self.r.execute('HVALS', self._key(queue, 'status')) or []
+        expired = max(0, owned - leased)
+        return {
+            'queued': available - expired,
+            'retrying': len(waiting) - leased,
+            'leased': leased,
+            'expired': expired,
+            'done': statuses.count('done'),
+            'failed': statuses.count('failed'),
+        }
+
+    def purge(self, queue: str):
+        with self.r.lock:
+            self.r.execute('DEL', *(self._key(queue, part) for part in
+                                    ('queue', 'all', 'owner', 'attempts', 'status', 'result', 'error')))
+            self.r.execute('SREM', f"{self.prefix}:queues", queue)
+
+    def close(self):
+        self.r.close()
+
+
+def open_queue(url: str = config.WORK_QUEUE_URL) -> WorkQueue:
+    """sqlite:///path/to.db or redis://[:password@]host:port/db"""
+    parts = urlsplit(url)
+    if parts.scheme == 'sqlite':
+        # sqlite:///relative/path.db, sqlite:////absolute/path.db
+        return SQLiteWorkQueue(url[len('sqlite:///'):])
+    if parts.scheme == 'redis':
+        db = int(parts.path.lstrip('/') or 0)
+        return RedisWorkQueue(RespClient(parts.hostname or 'localhost', parts.port or 6379, db, parts.password))
+    raise ValueError(f"Unknown work queue URL '{url}' (use sqlite:///... or redis://...)")
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+async def work(queue: WorkQueue, names: Optional[List[str]] = None, concurrency: int = 1, headless: bool = True,
+               worker: Optional[str] = None, stop: Optional[asyncio.Event] = None):
+    """
+    Worker loop: claim lots from the given queues (default: all queues with work), scrape, complete
+
+    Each slot claims one lot at a time, so a crashed node holds at most
+    `concurrency` leases. The lease is renewed every third of
+    lease_seconds while the lot runs; queue calls run in a thread.
+    """
+    from scraper_pro import CatawikiScraperPro
+
+    worker = worker or worker_name()
+    stop = stop or asyncio.Event()
+    stats = {'done': 0, 'released': 0, 'lost': 0}
+
+    async def keep_leased(name: str, url: str, slot_name: str):
+        while True:
+            await asyncio.sleep(queue.lease_seconds / 3)
+            if not await asyncio.to_thread(queue.renew, name, url, slot_name):
+                print(f"[{time.strftime('%H:%M:%S')}] ⚠️  Lease on {url} lost, another worker may take it")
+                return
+
+    async def slot(n: int):
+        slot_name = f"{worker}/{n}"
+        while not stop.is_set():
+            claimed = None
+            for name in names or await asyncio.to_thread(queue.queues):
+                items = await asyncio.to_thread(queue.claim, name, slot_name)
+                if items:
+                    claimed = (name, items[0])
+                    break
+            if not claimed:
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=config.WORK_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            name, url = claimed
+            print(f"[{time.strftime('%H:%M:%S')}] 🛠️  {slot_name} claimed {url} ({name})")
+            renewer = asyncio.create_task(keep_leased(name, url, slot_name))
+            try:
+                scraper = CatawikiScraperPro(headless=headless, job_id=name)
+                data = await scraper.scrape_listing(url)
+            except Exception as e:
+                data, error = None, str(e)
+            else:
+                error = "No data extracted"
+            finally:
+                renewer.cancel()
+
+            if data and data.get('title'):
+                ok = await asyncio.to_thread(queue.complete, name, url, slot_name, data)
+                stats['done' if ok else 'lost'] += 1
+            else:
+                ok = await asyncio.to_thread(queue.release, name, url, slot_name, error)
+                stats['released' if ok else 'lost'] += 1
+            if not ok:
+                print(f"[{time.strftime('%H:%M:%S')}] ⚠️  Lease on {url} expired before it finished, result dropped")
+
+    print(f"[{time.strftime('%H:%M:%S')}] 👷 Worker {worker}: {concurrency} slots, "
+          f"queues: {', '.join(names) if names else 'all'}")
+    await asyncio.gather(*(slot(n) for n in range(max(1, concurrency))))
+    print(f"[{time.strftime('%H:%M:%S')}] 👋 Worker {worker} stopped: {stats}")
+    return stats
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__[__doc__.index('Usage:'):])
+        sys.exit(1)
+
+    command = sys.argv[1]
+    queue = WorkQueue.shared()
+
+    if command == 'work':
+        import signal
+        names = [sys.argv[i + 1] for i, arg in enumerate(sys.argv[:-1]) if arg == '--queue']
+        concurrency = 1
+        if '--concurrency' in sys.argv and sys.argv.index('--concurrency') + 1 < len(sys.argv):
+            concurrency = int(sys.argv[sys.argv.index('--concurrency') + 1])
+
+        async def run():
+            stop = asyncio.Event()
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    loop.add_signal_handler(sig, stop.set)
+                except (NotImplementedError, RuntimeError):
+                    pass
+            try:
+                await work(queue, names or None, concurrency, headless='--show-browser' not in sys.argv, stop=stop)
+            finally:
+                from remote_browsers import RemoteBrowsers
+                await RemoteBrowsers.close_shared()
+
+        asyncio.run(run())
+
+    elif command == 'push' and len(sys.argv) > 3:
+        name = sys.argv[2]
+        if len(sys.argv) == 4 and Path(sys.argv[3]).exists():
+            with open(sys.argv[3], 'r') as f:
+                urls = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+        else:
+            urls = sys.argv[3:]
+        print(f"📤 {queue.put(name, urls)} of {len(urls)} URLs queued on '{name}'")
+
+    elif command == 'collect' and len(sys.argv) > 2:
+        # Merge finished results of a pushed queue into one run (NDJSON, CSV, lot store, seen index)
+        from sinks import RunSinks
+        name = sys.argv[2]
+        sinks = RunSinks('output', f"queue_{name}", save_csv=True, meta={'job_id': name}, resume=True)
+        items = queue.items(name)
+
+        async def collect():
+            return await queue.wait_for(name, items, lambda _, result: sinks.write(result), sinks.fail,
+                                        timeout=None if '--wait' in sys.argv else 0)
+
+        left = asyncio.run(collect())
+        sinks.close('completed' if not left else 'running')
+        print(f"💾 {sinks.successful} results, {sinks.failed} failed -> {sinks.paths['ndjson']}"
+              + (f" ({len(left)} still queued)" if left else ""))
+
+    elif command == 'stats':
+        for name in sys.argv[2:] or queue.queues():
+            print(f"{name:<40} " + "  ".join(f"{k} {v}" for k, v in queue.stats(name).items()))
+
+    elif command == 'purge' and len(sys.argv) > 2:
+        queue.purge(sys.argv[2])
+        print(f"🗑️  Queue '{sys.argv[2]}' removed")
+
+    else:
+        print(__doc__[__doc__.index('Usage:'):])
+        sys.exit(1)
+
+    queue.close()
+
+
+if __name__ == '__main__':
+    main()